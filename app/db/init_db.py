@@ -18,6 +18,10 @@ def init_db():
         # Create all tables
         Base.metadata.create_all(bind=engine)
         logger.info("Database tables created successfully")
+        
+        # Promocode change trigger and default promocodes
+        from db.migrate_add_promocodes import migrate as migrate_promocodes
+        migrate_promocodes()
     except Exception as e:
         logger.error(f"Error initializing database: {e}", exc_info=True)
         raise
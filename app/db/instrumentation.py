@@ -0,0 +1,105 @@
+"""
+SQL query instrumentation.
+
+Every statement run by an instrumented engine is timed with cursor
+execute events:
+- statements slower than SLOW_QUERY_MS are logged with the name of the
+  update handler or job they ran for
+- queries are counted per query scope (one update or one job run, see
+  query_scope); when the scope ends its query count and total DB time go
+  to metrics and, with LOG_QUERY_SUMMARY, to the log
+
+The current scope is kept in a contextvar. Background tasks started by
+an update (write-behind flushes) inherit it, but their queries are only
+counted while the update is still running.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import env
+from shared.utils.metrics import DB_QUERY_DURATION, DB_QUERIES_PER_SCOPE, DB_TIME_PER_SCOPE
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_STATEMENT_LENGTH = 500  # Longer statements are truncated in the slow query log
+
+
+@dataclass
+class QueryStats:
+    """Queries run within one query scope"""
+    name: str
+    count: int = 0
+    total_time: float = 0.0
+    closed: bool = False
+
+
+_current_scope: ContextVar[Optional[QueryStats]] = ContextVar("query_scope", default=None)
+
+
+@contextmanager
+def query_scope(name: str):
+    """Attribute queries run in this block (and tasks it awaits) to name"""
+    stats = QueryStats(name=name)
+    token = _current_scope.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_scope.reset(token)
+        stats.closed = True
+        if stats.count:
+            DB_QUERIES_PER_SCOPE.labels(stats.name).observe(stats.count)
+            DB_TIME_PER_SCOPE.labels(stats.name).observe(stats.total_time)
+            if env.LOG_QUERY_SUMMARY:
+                logger.info(f"{stats.name}: {stats.count} queries, {stats.total_time * 1000:.1f} ms in database")
+
+
+def set_query_scope_name(name: str):
+    """Name current query scope (handlers name the scope their update opened)"""
+    stats = _current_scope.get()
+    if stats is not None:
+        stats.name = name
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """Get stats of current query scope, None outside of a scope"""
+    return _current_scope.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+
+    stats = _current_scope.get()
+    if stats is not None and not stats.closed:
+        stats.count += 1
+        stats.total_time += elapsed
+
+    if env.SLOW_QUERY_MS and elapsed * 1000 >= env.SLOW_QUERY_MS:
+        scope = stats.name if stats is not None else "no scope"
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms, {scope}): "
+            f"{' '.join(statement.split())[:SLOW_QUERY_STATEMENT_LENGTH]}"
+        )
+
+
+def _handle_error(exception_context):
+    # Failed statements don't reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+def instrument_engine(engine: Engine):
+    """Time statements of engine (pass sync_engine of async engines)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
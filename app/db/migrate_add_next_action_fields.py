@@ -0,0 +1,78 @@
+"""
+Migration script to add next action fields to offers table
+Run this once to add new columns to existing database and backfill them
+"""
+import sys
+import os
+
+# Add app directory to path
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, app_dir)
+
+from sqlalchemy import text, update
+from db.session import get_engine
+from db.models import Offer
+from db.repository import next_action_values
+import logging
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Add next_action_at / next_action_kind to offers table"""
+    try:
+        engine = get_engine()
+        if engine is None:
+            raise RuntimeError("Database engine is not available. Cannot run migration.")
+        
+        with engine.connect() as conn:
+            # Check if columns already exist
+            check_query = text("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_name='offers' AND column_name='next_action_at'
+            """)
+            result = conn.execute(check_query)
+            if result.fetchone():
+                logger.info("Migration already applied - columns exist")
+                return
+            
+            # Add new columns
+            logger.info("Adding next action columns to offers table...")
+            
+            conn.execute(text("""
+                ALTER TABLE offers 
+                ADD COLUMN next_action_at TIMESTAMP WITH TIME ZONE,
+                ADD COLUMN next_action_kind VARCHAR(50)
+            """))
+            
+            # Backfill next action for active offers (same expressions as repository uses)
+            result = conn.execute(
+                update(Offer)
+                .where(Offer.is_active == True)
+                .values(**next_action_values())
+            )
+            logger.info(f"Backfilled next action for {result.rowcount} active offers")
+            
+            # Partial index used by reminder processor
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_offers_next_action_at_active 
+                ON offers(next_action_at) 
+                WHERE is_active AND next_action_at IS NOT NULL
+            """))
+            
+            conn.commit()
+            logger.info("✅ Migration completed successfully!")
+            
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,52 @@
+"""
+Migration script to add revenue query indexes to payments table
+Run this once on databases where payments table was created before the indexes
+"""
+import sys
+import os
+
+# Add app directory to path
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, app_dir)
+
+from sqlalchemy import text
+from db.session import get_engine
+import logging
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Add revenue indexes to payments table"""
+    try:
+        engine = get_engine()
+        if engine is None:
+            raise RuntimeError("Database engine is not available. Cannot run migration.")
+
+        with engine.connect() as conn:
+            logger.info("Adding revenue indexes to payments table...")
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_payments_created_at_currency
+                ON payments(created_at, currency)
+            """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_payments_promocode_created_at
+                ON payments(promocode, created_at)
+                WHERE promocode IS NOT NULL
+            """))
+
+            conn.commit()
+            logger.info("✅ Migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,85 @@
+"""
+Migration script to move promocodes from code to the promocodes table
+Creates the promocodes tables, the change notification trigger and the default promocodes.
+Safe to run more than once (init_db runs it on every start).
+"""
+import sys
+import os
+
+# Add app directory to path
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, app_dir)
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from db.base import Base
+from db.session import get_engine
+import logging
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+logger = logging.getLogger(__name__)
+
+# Channel notified on every change of promocodes (see repository/promocodes.py)
+PROMOCODES_CHANNEL = "promocodes_changed"
+
+# Promocodes that used to be hard-coded in modules/payment/promocodes.py
+DEFAULT_PROMOCODES = [
+    {"code": "МАРАФОН", "discount_value": "6000", "requires_active_offer": False},  # 60 BYN fixed discount
+    {"code": "МАРАФОН20", "discount_value": "20%", "requires_active_offer": False},  # 20% discount
+    {"code": "МАРАФОН15", "discount_value": "15%", "requires_active_offer": False},  # 15% discount
+    # 60 BYN fixed discount (290 instead of 350 BYN) while special offer is active
+    {"code": "УРОК", "discount_value": "6000", "requires_active_offer": True},
+]
+
+
+def migrate():
+    """Create promocodes tables and trigger, add default promocodes"""
+    try:
+        engine = get_engine()
+        if engine is None:
+            raise RuntimeError("Database engine is not available. Cannot run migration.")
+
+        from db.models import Promocode, PromocodeRedemption
+        Base.metadata.create_all(bind=engine, tables=[Promocode.__table__, PromocodeRedemption.__table__])
+
+        with engine.connect() as conn:
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION notify_promocodes_changed() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('{PROMOCODES_CHANNEL}', '');
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            conn.execute(text("DROP TRIGGER IF EXISTS promocodes_changed ON promocodes"))
+            conn.execute(text("""
+                CREATE TRIGGER promocodes_changed
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON promocodes
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_promocodes_changed()
+            """))
+
+            # Existing codes are left as they are (they may have been edited)
+            result = conn.execute(
+                insert(Promocode)
+                .values(DEFAULT_PROMOCODES)
+                .on_conflict_do_nothing(index_elements=[Promocode.code])
+                .returning(Promocode.code)
+            )
+            added = result.scalars().all()
+            if added:
+                logger.info(f"Added default promocodes: {', '.join(added)}")
+
+            conn.commit()
+            logger.info("✅ Promocodes migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
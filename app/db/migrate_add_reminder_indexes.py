@@ -0,0 +1,48 @@
+"""
+Migration script to add pending reminders by user index to scheduled_reminders table
+Run this once on databases where scheduled_reminders table was created before the index
+"""
+import sys
+import os
+
+# Add app directory to path
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, app_dir)
+
+from sqlalchemy import text
+from db.session import get_engine
+import logging
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Add pending reminders by user index to scheduled_reminders table"""
+    try:
+        engine = get_engine()
+        if engine is None:
+            raise RuntimeError("Database engine is not available. Cannot run migration.")
+
+        with engine.connect() as conn:
+            logger.info("Adding pending reminders by user index to scheduled_reminders table...")
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_scheduled_reminders_pending_telegram_id
+                ON scheduled_reminders(telegram_id)
+                WHERE status = 'pending'
+            """))
+
+            conn.commit()
+            logger.info("✅ Migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
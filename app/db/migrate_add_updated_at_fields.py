@@ -0,0 +1,66 @@
+"""
+Migration script to add updated_at fields to users and offers tables
+Run this once to add new columns to existing database
+"""
+import sys
+import os
+
+# Add app directory to path
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, app_dir)
+
+from sqlalchemy import text
+from db.session import get_engine
+import logging
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+logger = logging.getLogger(__name__)
+
+TABLES = ["users", "offers"]
+
+
+def migrate():
+    """Add updated_at to users and offers tables"""
+    try:
+        engine = get_engine()
+        if engine is None:
+            raise RuntimeError("Database engine is not available. Cannot run migration.")
+
+        with engine.connect() as conn:
+            for table in TABLES:
+                # Check if column already exists
+                check_query = text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name=:table AND column_name='updated_at'
+                """)
+                result = conn.execute(check_query, {"table": table})
+                if result.fetchone():
+                    logger.info(f"Migration already applied to {table} - column exists")
+                    continue
+
+                # Existing rows get the time of the migration, which is enough for a high-water mark
+                logger.info(f"Adding updated_at column to {table} table...")
+                conn.execute(text(f"""
+                    ALTER TABLE {table}
+                    ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+                """))
+                conn.execute(text(f"""
+                    CREATE INDEX IF NOT EXISTS ix_{table}_updated_at
+                    ON {table}(updated_at)
+                """))
+
+            conn.commit()
+            logger.info("✅ Migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
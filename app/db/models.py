@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
@@ -16,6 +17,8 @@ class User(Base):
     last_name = Column(String(255), nullable=True)
     is_premium_tg_user = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Bumped on every change, used as high-water mark of cached exports
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
 
     # Relationship to offers
     offers = relationship("Offer", back_populates="user", cascade="all, delete-orphan")
@@ -33,15 +36,30 @@ class Offer(Base):
     is_active = Column(Boolean, default=True, nullable=False, index=True)
     reminder_type = Column(String(50), nullable=True)  # 'last_call' or None for regular reminders
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Bumped on every change, used as high-water mark of cached exports
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
     
     # Lead magnet tracking
     lesson_clicked_at = Column(DateTime(timezone=True), nullable=True, index=True)  # When user clicked "забрать урок"
     first_reminder_sent = Column(DateTime(timezone=True), nullable=True)  # First reminder sent (1 hour after click)
     second_reminder_sent = Column(DateTime(timezone=True), nullable=True)  # Second reminder sent (12 hours after click)
 
+    # Next reminder due for this offer, recomputed on every state change (see db.repository.next_action_values)
+    next_action_at = Column(DateTime(timezone=True), nullable=True)
+    next_action_kind = Column(String(50), nullable=True)  # 'first_lead', 'regular' or 'last_call'
+
     # Relationship to user
     user = relationship("User", back_populates="offers")
 
+    __table_args__ = (
+        # Reminder processor only ever scans active offers with a pending action by due time
+        Index(
+            "ix_offers_next_action_at_active",
+            "next_action_at",
+            postgresql_where=text("is_active AND next_action_at IS NOT NULL")
+        ),
+    )
+
 
 class PayClick(Base):
     """Analytics: store pay button click events"""
@@ -54,3 +72,131 @@ class PayClick(Base):
 
     user = relationship("User", back_populates="pay_clicks")
 
+
+class FunnelEvent(Base):
+    """Analytics: funnel events (/start, lesson click, invoice sent, payment)"""
+    __tablename__ = "funnel_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
+    event = Column(String(50), nullable=False, index=True)
+    source = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class DeadLetter(Base):
+    """Reminder sends that failed after all retry attempts"""
+    __tablename__ = "dead_letters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
+    reminder_type = Column(String(100), nullable=False)
+    attempts = Column(Integer, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class ScheduledReminder(Base):
+    """Durable reminder job - due reminders are claimed by the scheduled reminder poller"""
+    __tablename__ = "scheduled_reminders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
+    offer_id = Column(Integer, ForeignKey("offers.id"), nullable=True)
+    kind = Column(String(50), nullable=False)  # e.g. 'special_offer', 'second_lead'
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, processing, sent, failed, cancelled
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Poller only ever scans pending rows by due time
+        Index("ix_scheduled_reminders_pending_due_at", "due_at", postgresql_where=text("status = 'pending'")),
+        # Cancelling user's reminders only touches user's pending rows
+        Index("ix_scheduled_reminders_pending_telegram_id", "telegram_id", postgresql_where=text("status = 'pending'")),
+    )
+
+
+class MediaAsset(Base):
+    """Local media file uploaded to Telegram - file_id is reused instead of uploading the file again"""
+    __tablename__ = "media_assets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of file content
+    media_type = Column(String(20), nullable=False)  # 'video', 'photo', 'document', ...
+    file_id = Column(String(255), nullable=False)
+    file_unique_id = Column(String(255), nullable=True)
+    file_name = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # file_id depends on how the file was sent (same video sent as document gets another file_id)
+        Index("ux_media_assets_content_hash_media_type", "content_hash", "media_type", unique=True),
+    )
+
+
+class Payment(Base):
+    """Successful Telegram payment"""
+    __tablename__ = "payments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
+    invoice_payload = Column(String(128), nullable=False)
+    currency = Column(String(3), nullable=False)
+    total_amount = Column(Integer, nullable=False)  # In smallest currency units (cents)
+    promocode = Column(String(50), nullable=True)
+    telegram_payment_charge_id = Column(String(255), nullable=False, unique=True)
+    provider_payment_charge_id = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Revenue by period (and currency)
+        Index("ix_payments_created_at_currency", "created_at", "currency"),
+        # Revenue by promocode
+        Index("ix_payments_promocode_created_at", "promocode", "created_at", postgresql_where=text("promocode IS NOT NULL")),
+    )
+
+
+class Promocode(Base):
+    """Intensive promocode - loaded into memory by repository.promocodes"""
+    __tablename__ = "promocodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String(50), nullable=False, unique=True)  # Stored uppercase
+    # "20%" - percentage discount, "6000" - fixed discount in cents
+    discount_value = Column(String(20), nullable=False)
+    is_active = Column(Boolean, default=True, server_default=text("true"), nullable=False)
+    requires_active_offer = Column(Boolean, default=False, server_default=text("false"), nullable=False)  # Only valid while user's offer is active
+    valid_from = Column(DateTime(timezone=True), nullable=True)
+    valid_until = Column(DateTime(timezone=True), nullable=True)
+    max_redemptions = Column(Integer, nullable=True)  # NULL - unlimited
+    max_redemptions_per_user = Column(Integer, nullable=True)  # NULL - unlimited
+    redemptions_count = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class PromocodeRedemption(Base):
+    """How many times a user redeemed a promocode"""
+    __tablename__ = "promocode_redemptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    promocode_id = Column(Integer, ForeignKey("promocodes.id"), nullable=False)
+    telegram_id = Column(BigInteger, nullable=False)
+    count = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ux_promocode_redemptions_promocode_id_telegram_id", "promocode_id", "telegram_id", unique=True),
+    )
+
+
+class PersistenceEntry(Base):
+    """Bot state persisted by repository.bot_persistence (user_data, conversation states)"""
+    __tablename__ = "bot_persistence"
+
+    kind = Column(String(64), primary_key=True)  # 'user_data' or 'conversation:<name>'
+    key = Column(String(255), primary_key=True)  # telegram_id or JSON of conversation key
+    data = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,78 +1,173 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, insert, update, delete, case, func, literal, null, any_, bindparam, exists, tuple_, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
-from db.models import User, Offer, PayClick
+from db.models import User, Offer, PayClick, FunnelEvent, DeadLetter, ScheduledReminder, MediaAsset, Payment, Promocode, PromocodeRedemption, PersistenceEntry
+from modules.lead_magnet.config import FIRST_REMINDER_HOURS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Offer next action kinds
+NEXT_ACTION_FIRST_LEAD = "first_lead"
+NEXT_ACTION_REGULAR = "regular"
+NEXT_ACTION_LAST_CALL = "last_call"
+
+# Offer columns (plus user's telegram_id) needed to decide on and send reminders.
+# Loaded as lightweight rows with a single join instead of Offer + User objects
+REMINDER_OFFER_COLUMNS = (
+    Offer.id,
+    Offer.offer_expiration_date,
+    Offer.last_reminder_sent,
+    Offer.is_active,
+    Offer.reminder_type,
+    Offer.lesson_clicked_at,
+    Offer.first_reminder_sent,
+    Offer.next_action_kind,
+    User.telegram_id,
+)
+
+# Offer column set when a reminder of given kind is sent. Other kinds set
+# last_reminder_sent and are stored in reminder_type
+REMINDER_SENT_COLUMNS = {
+    "first_lead": "first_reminder_sent",
+    "second_lead": "second_reminder_sent",
+    "regular": "last_reminder_sent",
+}
+
+# Offer expiration reminder windows
+REGULAR_REMINDER_INTERVAL = timedelta(hours=48)  # Between regular reminders
+LAST_CALL_WINDOW_START = timedelta(hours=48)  # Before expiration
+LAST_CALL_WINDOW_END = timedelta(hours=24)  # Before expiration
+
+# Scheduled reminder statuses
+REMINDER_STATUS_PENDING = "pending"
+REMINDER_STATUS_PROCESSING = "processing"
+REMINDER_STATUS_SENT = "sent"
+REMINDER_STATUS_FAILED = "failed"
+REMINDER_STATUS_CANCELLED = "cancelled"
+
+
+def next_action_values(**overrides) -> dict:
+    """
+    Build SET values recomputing offer next_action_at / next_action_kind in SQL.
+    
+    Rules (same as the reminder conditions they replace):
+    - first_lead: lesson clicked, first reminder not sent -> click time + FIRST_REMINDER_HOURS
+    - regular: reminder_type set and not 'last_call' -> last reminder + 48h
+      (or now if no reminder sent yet), while more than 48h before expiration
+    - last_call: same reminder_type condition -> 48h before expiration
+    - nothing once less than 24h are left before expiration
+    
+    UPDATE expressions see the row as it was before the update, so columns
+    changed by the same statement must be passed as overrides.
+    
+    Args:
+        **overrides: New values of offer columns set by the same UPDATE
+    
+    Returns:
+        Dict with next_action_at and next_action_kind SQL expressions
+    """
+    def column(name):
+        if name not in overrides:
+            return getattr(Offer, name)
+        # Typed bind parameter, so that NULL still has the column type
+        return literal(overrides[name], type_=Offer.__table__.c[name].type)
+    
+    lesson_clicked_at = column("lesson_clicked_at")
+    first_reminder_sent = column("first_reminder_sent")
+    last_reminder_sent = column("last_reminder_sent")
+    reminder_type = column("reminder_type")
+    expiration_date = column("offer_expiration_date")
+    
+    first_lead_pending = and_(lesson_clicked_at.is_not(None), first_reminder_sent.is_(None))
+    expiration_chain_pending = and_(
+        reminder_type.is_not(None),
+        reminder_type != NEXT_ACTION_LAST_CALL,
+        expiration_date - LAST_CALL_WINDOW_END > func.now()
+    )
+    regular_due_at = func.coalesce(last_reminder_sent + REGULAR_REMINDER_INTERVAL, func.now())
+    last_call_due_at = expiration_date - LAST_CALL_WINDOW_START
+    
+    return {
+        "next_action_at": case(
+            (first_lead_pending, lesson_clicked_at + timedelta(hours=FIRST_REMINDER_HOURS)),
+            (expiration_chain_pending, func.least(regular_due_at, last_call_due_at)),
+            else_=null()
+        ),
+        "next_action_kind": case(
+            (first_lead_pending, NEXT_ACTION_FIRST_LEAD),
+            (
+                expiration_chain_pending,
+                case((regular_due_at < last_call_due_at, NEXT_ACTION_REGULAR), else_=NEXT_ACTION_LAST_CALL)
+            ),
+            else_=null()
+        ),
+    }
 
-def get_or_create_user(
-    db: Session,
-    telegram_id: int,
-    nickname: str = None,
-    first_name: str = None,
-    last_name: str = None,
-    is_premium: bool = False
-) -> User:
-    """Get existing user or create new one"""
-    # Ensure is_premium is always a boolean, never None
-    is_premium = bool(is_premium) if is_premium is not None else False
-    
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    
-    if user:
-        # Update user info if provided
-        if nickname is not None:
-            user.nickname = nickname
-        if first_name is not None:
-            user.first_name = first_name
-        if last_name is not None:
-            user.last_name = last_name
-        user.is_premium_tg_user = is_premium
-        db.commit()
-        db.refresh(user)
-        return user
-    
-    # Create new user
-    user = User(
-        telegram_id=telegram_id,
-        nickname=nickname,
-        first_name=first_name,
-        last_name=last_name,
-        is_premium_tg_user=is_premium
+
+def get_offer_due_action(offer, now: datetime) -> str | None:
+    """
+    Get reminder kind to send for offer returned by get_due_offers.
+    
+    next_action_at is computed at write time, so the stored kind is re-checked
+    against the current time (e.g. a regular reminder delayed past the
+    last call window start becomes a last call).
+    
+    Returns:
+        Next action kind, or None if nothing should be sent now
+    """
+    if offer.next_action_kind == NEXT_ACTION_FIRST_LEAD:
+        if offer.lesson_clicked_at is not None and offer.first_reminder_sent is None:
+            return NEXT_ACTION_FIRST_LEAD
+        return None
+    
+    if offer.reminder_type is None or offer.reminder_type == NEXT_ACTION_LAST_CALL:
+        return None
+    if offer.offer_expiration_date - LAST_CALL_WINDOW_END < now:
+        return None
+    if offer.offer_expiration_date - LAST_CALL_WINDOW_START <= now:
+        return NEXT_ACTION_LAST_CALL
+    if offer.last_reminder_sent is None or offer.last_reminder_sent + REGULAR_REMINDER_INTERVAL <= now:
+        return NEXT_ACTION_REGULAR
+    return None
+
+
+async def _update_offer(db: AsyncSession, offer_id: int, **values) -> Offer | None:
+    """Update offer columns and recompute its next action in one statement"""
+    result = await db.execute(
+        update(Offer)
+        .where(Offer.id == offer_id)
+        .values(**values, **next_action_values(**values))
+        .returning(Offer)
+        .execution_options(synchronize_session=False, populate_existing=True)
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    logger.info(f"Created new user: telegram_id={telegram_id}")
-    return user
+    offer = result.scalars().first()
+    await db.commit()
+    return offer
 
 
-def create_or_update_offer(
-    db: Session,
+async def create_or_update_offer(
+    db: AsyncSession,
     user_id: int,
     expiration_days: int = 7
 ) -> Offer:
     """Create new offer or update existing active offer for user"""
     # Check if user has active offer
-    active_offer = db.query(Offer).filter(
-        and_(
-            Offer.user_id == user_id,
-            Offer.is_active == True
-        )
-    ).first()
-    
+    active_offer = await get_active_offer_for_user(db, user_id)
+
     if active_offer:
         # Update existing offer expiration date
-        active_offer.offer_expiration_date = datetime.now(timezone.utc) + timedelta(days=expiration_days)
-        active_offer.last_reminder_sent = None  # Reset reminder
-        active_offer.reminder_type = None
-        db.commit()
-        db.refresh(active_offer)
+        offer = await _update_offer(
+            db,
+            active_offer.id,
+            offer_expiration_date=datetime.now(timezone.utc) + timedelta(days=expiration_days),
+            last_reminder_sent=None,  # Reset reminder
+            reminder_type=None
+        )
         logger.info(f"Updated offer for user_id={user_id}")
-        return active_offer
-    
+        return offer
+
     # Create new offer
     offer = Offer(
         user_id=user_id,
@@ -82,76 +177,103 @@ def create_or_update_offer(
         reminder_type=None
     )
     db.add(offer)
-    db.commit()
-    db.refresh(offer)
+    await db.commit()
     logger.info(f"Created new offer for user_id={user_id}, expires in {expiration_days} days")
     return offer
 
 
-def get_users_for_last_call_reminder(db: Session) -> list[Offer]:
-    """Get users who need 'last call' reminder (24-48 hours before expiration)"""
-    now = datetime.now(timezone.utc)
-    tomorrow = now + timedelta(hours=24)
-    day_after_tomorrow = now + timedelta(hours=48)
-    
-    offers = db.query(Offer).filter(
-        and_(
-            Offer.offer_expiration_date >= tomorrow,
-            Offer.offer_expiration_date <= day_after_tomorrow,
-            Offer.is_active == True,
-            Offer.reminder_type != 'last_call'  # Not already sent
-        )
-    ).all()
+async def get_due_offers(db: AsyncSession, limit: int = None) -> list:
+    """Get active offers whose next action is due
     
-    return offers
+    Uses ix_offers_next_action_at_active partial index, so the cost depends
+    on the number of due offers rather than on the size of the table.
+    
+    Returns:
+        List of rows with REMINDER_OFFER_COLUMNS (single query, no ORM objects)
+    """
+    query = (
+        select(*REMINDER_OFFER_COLUMNS)
+        .join(User, Offer.user_id == User.id)
+        .where(
+            and_(
+                Offer.is_active == True,
+                Offer.next_action_at != None,
+                Offer.next_action_at <= func.now()
+            )
+        )
+        .order_by(Offer.next_action_at)
+    )
+    if limit is not None:
+        query = query.limit(limit)
 
+    result = await db.execute(query)
+    return list(result.all())
 
-def get_users_for_regular_reminder(db: Session, reminder_interval_hours: int = 48) -> list[Offer]:
-    """Get users who need regular reminder (more than 48 hours before expiration, last reminder was more than interval ago)"""
-    now = datetime.now(timezone.utc)
-    future_threshold = now + timedelta(hours=48)  # More than 48 hours before expiration
-    last_reminder_threshold = now - timedelta(hours=reminder_interval_hours)
-    
-    offers = db.query(Offer).filter(
-        and_(
-            Offer.offer_expiration_date > future_threshold,
-            Offer.is_active == True,
-            # Either no reminder sent, or last reminder was more than interval ago
-            or_(
-                Offer.last_reminder_sent == None,
-                Offer.last_reminder_sent < last_reminder_threshold
-            ),
-            Offer.reminder_type != 'last_call'  # Not a last call reminder
-        )
-    ).all()
+
+async def get_reminder_offers(db: AsyncSession, offer_ids) -> dict:
+    """Get offers by IDs in one query
     
-    return offers
+    Returns:
+        Dict offer_id -> row with REMINDER_OFFER_COLUMNS
+    """
+    if not offer_ids:
+        return {}
+    result = await db.execute(
+        select(*REMINDER_OFFER_COLUMNS)
+        .join(User, Offer.user_id == User.id)
+        .where(Offer.id.in_(offer_ids))
+    )
+    return {row.id: row for row in result.all()}
+
+
+async def refresh_next_action(db: AsyncSession, offer_ids: list[int]):
+    """Recompute next action for offers (e.g. stale ones whose reminder window has passed)"""
+    if not offer_ids:
+        return
+    await db.execute(
+        update(Offer)
+        .where(Offer.id.in_(offer_ids))
+        .values(**next_action_values())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
 
 
-def update_reminder_sent(db: Session, offer_id: int, reminder_type: str = None):
-    """Update last_reminder_sent timestamp for offer"""
-    offer = db.query(Offer).filter(Offer.id == offer_id).first()
-    if offer:
-        offer.last_reminder_sent = datetime.now(timezone.utc)
-        if reminder_type:
-            offer.reminder_type = reminder_type
-        db.commit()
-        logger.info(f"Updated reminder_sent for offer_id={offer_id}, type={reminder_type}")
+async def mark_reminders_sent(db: AsyncSession, kind: str, offer_ids: list[int]):
+    """
+    Mark reminder of given kind as sent for offers in one statement.
+    
+    Args:
+        kind: Reminder kind ('first_lead', 'second_lead', 'regular', or a kind
+            stored in reminder_type: 'special_offer', 'third_lead', 'fourth_lead', 'last_call')
+        offer_ids: IDs of offers the reminder was sent for
+    """
+    if not offer_ids:
+        return
+    now = datetime.now(timezone.utc)
+    column = REMINDER_SENT_COLUMNS.get(kind)
+    if column:
+        values = {column: now}
+    else:
+        values = {"last_reminder_sent": now, "reminder_type": kind}
+    
+    await db.execute(
+        update(Offer)
+        .where(Offer.id == any_(bindparam("offer_ids", offer_ids, type_=ARRAY(Integer))))
+        .values(**values, **next_action_values(**values))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    logger.info(f"Marked {kind} reminder sent for {len(offer_ids)} offers")
 
 
-def mark_lesson_clicked(db: Session, user_id: int):
+async def mark_lesson_clicked(db: AsyncSession, user_id: int):
     """Mark that user clicked 'забрать урок' button"""
     # Get user's active offer
-    offer = db.query(Offer).filter(
-        and_(
-            Offer.user_id == user_id,
-            Offer.is_active == True
-        )
-    ).first()
-    
+    offer = await get_active_offer_for_user(db, user_id)
+
     if offer:
-        offer.lesson_clicked_at = datetime.now(timezone.utc)
-        db.commit()
+        offer = await _update_offer(db, offer.id, lesson_clicked_at=datetime.now(timezone.utc))
         logger.info(f"Marked lesson clicked for user_id={user_id}, offer_id={offer.id}")
         return offer
     else:
@@ -159,150 +281,471 @@ def mark_lesson_clicked(db: Session, user_id: int):
         return None
 
 
-def get_offer_by_id(db: Session, offer_id: int) -> Offer:
-    """Get offer by ID"""
-    return db.query(Offer).filter(Offer.id == offer_id).first()
-
-
-def get_active_offer_for_user(db: Session, user_id: int) -> Offer:
+async def get_active_offer_for_user(db: AsyncSession, user_id: int) -> Offer:
     """Get active offer for user by user_id (not telegram_id)"""
-    return db.query(Offer).filter(
-        and_(
-            Offer.user_id == user_id,
-            Offer.is_active == True
+    result = await db.execute(
+        select(Offer).where(
+            and_(
+                Offer.user_id == user_id,
+                Offer.is_active == True
+            )
         )
-    ).first()
+    )
+    return result.scalars().first()
+
 
+async def get_user_entitlements(db: AsyncSession, telegram_id: int):
+    """
+    Get what user is entitled to, in one query.
+    
+    Returns:
+        Row with has_paid and active_offer_expires_at (None without active offer),
+        or None if user doesn't exist
+    """
+    has_paid = exists().where(Payment.user_id == User.id)
+    active_offer_expires_at = (
+        select(func.max(Offer.offer_expiration_date))
+        .where(and_(Offer.user_id == User.id, Offer.is_active == True))
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            has_paid.label("has_paid"),
+            active_offer_expires_at.label("active_offer_expires_at")
+        ).where(User.telegram_id == telegram_id)
+    )
+    return result.one_or_none()
 
-def get_users_for_first_lead_reminder(db: Session, hours_after_click: int = 1, minutes_after_click: int = None) -> list[Offer]:
-    """Get users who need first lead magnet reminder (1 hour after clicking lesson)
+
+async def record_payment(db: AsyncSession, promocode_id: int | None = None, **values) -> bool:
+    """
+    Record successful payment, deactivate user's offer and cancel pending reminders.
+    
+    Everything is done by one statement (data-modifying CTEs), so it is atomic and
+    a duplicate delivery of the same payment costs a single no-op INSERT. A newly
+    recorded payment with a promocode counts its redemption in the same transaction.
     
     Args:
-        hours_after_click: Hours after click (default: 1)
-        minutes_after_click: Minutes after click (for testing, overrides hours_after_click if provided)
+        promocode_id: Promocode the payment was discounted with
+        **values: Payment columns (user_id, telegram_id, invoice_payload, currency,
+            total_amount, promocode, telegram_payment_charge_id, provider_payment_charge_id)
+    
+    Returns:
+        True if recorded, False if payment with this telegram_payment_charge_id already exists
     """
-    now = datetime.now(timezone.utc)
-    if minutes_after_click is not None:
-        threshold = now - timedelta(minutes=minutes_after_click)
-    else:
-        threshold = now - timedelta(hours=hours_after_click)
-    
-    offers = db.query(Offer).filter(
-        and_(
-            Offer.lesson_clicked_at != None,
-            Offer.lesson_clicked_at <= threshold,
-            Offer.first_reminder_sent == None,  # Not sent yet
-            Offer.is_active == True
+    payment = (
+        pg_insert(Payment)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[Payment.telegram_payment_charge_id])
+        .returning(Payment.user_id, Payment.telegram_id)
+        .cte("payment")
+    )
+    deactivated_offers = (
+        update(Offer)
+        .where(and_(Offer.user_id.in_(select(payment.c.user_id)), Offer.is_active == True))
+        .values(is_active=False)
+        .returning(Offer.id)
+        .cte("deactivated_offers")
+    )
+    cancelled_reminders = (
+        update(ScheduledReminder)
+        .where(
+            and_(
+                ScheduledReminder.telegram_id.in_(select(payment.c.telegram_id)),
+                ScheduledReminder.status == REMINDER_STATUS_PENDING
+            )
+        )
+        .values(status=REMINDER_STATUS_CANCELLED)
+        .returning(ScheduledReminder.id)
+        .cte("cancelled_reminders")
+    )
+    try:
+        result = await db.execute(
+            select(
+                select(func.count()).select_from(payment).scalar_subquery().label("recorded"),
+                select(func.count()).select_from(deactivated_offers).scalar_subquery().label("offers"),
+                select(func.count()).select_from(cancelled_reminders).scalar_subquery().label("reminders")
+            )
         )
-    ).all()
+        row = result.one()
+        if row.recorded and promocode_id is not None:
+            if not await _redeem_promocode(db, promocode_id, values["telegram_id"]):
+                # The payment went through anyway: the code became unavailable after pre-checkout
+                logger.warning(
+                    f"Payment {values.get('telegram_payment_charge_id')} used promocode_id={promocode_id} "
+                    f"that can no longer be redeemed, redemption not counted"
+                )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
     
-    return offers
+    if row.recorded:
+        logger.info(
+            f"Recorded payment {values.get('telegram_payment_charge_id')}: "
+            f"deactivated {row.offers} offer(s), cancelled {row.reminders} reminder(s)"
+        )
+    return bool(row.recorded)
 
 
-def get_users_for_second_lead_reminder(db: Session, hours_after_click: int = 12, minutes_after_click: int = None) -> list[Offer]:
-    """Get users who need second lead magnet reminder (12 hours after clicking lesson)
+async def log_pay_clicks(db: AsyncSession, pay_clicks: list[dict]):
+    """
+    Create pay click analytics records (one multi-row INSERT).
     
     Args:
-        hours_after_click: Hours after click (default: 12)
-        minutes_after_click: Minutes after click (for testing, overrides hours_after_click if provided)
+        pay_clicks: Dicts with user_id, source and created_at
     """
-    now = datetime.now(timezone.utc)
-    if minutes_after_click is not None:
-        threshold = now - timedelta(minutes=minutes_after_click)
-    else:
-        threshold = now - timedelta(hours=hours_after_click)
-    
-    offers = db.query(Offer).filter(
-        and_(
-            Offer.lesson_clicked_at != None,
-            Offer.lesson_clicked_at <= threshold,
-            Offer.first_reminder_sent != None,  # First reminder already sent
-            Offer.second_reminder_sent == None,  # Second not sent yet
-            Offer.is_active == True
-        )
-    ).all()
+    if not pay_clicks:
+        return
+    await db.execute(insert(PayClick), pay_clicks)
+    await db.commit()
+
+
+async def log_funnel_events(db: AsyncSession, events: list[dict]):
+    """
+    Create funnel event analytics records (one multi-row INSERT).
+    
+    Args:
+        events: Dicts with telegram_id, event, source and created_at
+    """
+    if not events:
+        return
+    await db.execute(insert(FunnelEvent), events)
+    await db.commit()
+
+
+async def get_table_version(db: AsyncSession, model) -> tuple:
+    """
+    Get high-water mark of a table: changes whenever rows are added, removed or updated.
     
-    return offers
+    Returns:
+        (row count, max id) plus max updated_at for models that have it
+    """
+    columns = [func.count(), func.max(model.id)]
+    if hasattr(model, "updated_at"):
+        columns.append(func.max(model.updated_at))
+    result = await db.execute(select(*columns).select_from(model))
+    return tuple(result.one())
 
 
-def get_users_for_third_lead_reminder(db: Session, hours_after_second: int = 3, minutes_after_second: int = None) -> list[Offer]:
-    """Get users who need third lead magnet reminder (hours after second reminder)
+async def record_dead_letter(
+    db: AsyncSession,
+    telegram_id: int,
+    reminder_type: str,
+    attempts: int,
+    error: str | None = None
+) -> DeadLetter:
+    """Record reminder send that failed after all retry attempts"""
+    dead_letter = DeadLetter(
+        telegram_id=telegram_id,
+        reminder_type=reminder_type,
+        attempts=attempts,
+        error=error
+    )
+    db.add(dead_letter)
+    await db.commit()
+    logger.warning(f"Dead-lettered {reminder_type} for telegram_id={telegram_id} after {attempts} attempts: {error}")
+    return dead_letter
+
+
+async def schedule_reminders(db: AsyncSession, reminders: list[dict]):
+    """
+    Persist reminders to be sent later (one multi-row INSERT).
     
     Args:
-        hours_after_second: Hours after second reminder (default: 3)
-        minutes_after_second: Minutes after second reminder (for testing, overrides hours_after_second if provided)
+        reminders: Dicts with telegram_id, kind, delay_seconds and optional offer_id
     """
+    if not reminders:
+        return
     now = datetime.now(timezone.utc)
-    if minutes_after_second is not None:
-        threshold = now - timedelta(minutes=minutes_after_second)
-    else:
-        threshold = now - timedelta(hours=hours_after_second)
-    
-    offers = db.query(Offer).filter(
-        and_(
-            Offer.lesson_clicked_at != None,
-            Offer.second_reminder_sent != None,
-            Offer.second_reminder_sent <= threshold,
-            Offer.reminder_type != "third_lead",
-            Offer.is_active == True
+    await db.execute(
+        insert(ScheduledReminder),
+        [
+            {
+                "telegram_id": reminder["telegram_id"],
+                "offer_id": reminder.get("offer_id"),
+                "kind": reminder["kind"],
+                "due_at": now + timedelta(seconds=reminder["delay_seconds"]),
+                "status": REMINDER_STATUS_PENDING
+            }
+            for reminder in reminders
+        ]
+    )
+    await db.commit()
+    logger.info(f"Scheduled {len(reminders)} reminders")
+
+
+async def claim_due_reminders(db: AsyncSession, limit: int = 500) -> list:
+    """
+    Claim due pending reminders for sending.
+    
+    Rows are locked with FOR UPDATE SKIP LOCKED and flipped to 'processing'
+    in one statement, so concurrent pollers never claim the same reminder.
+    
+    Returns:
+        List of rows (id, telegram_id, offer_id, kind)
+    """
+    due_ids = (
+        select(ScheduledReminder.id)
+        .where(
+            and_(
+                ScheduledReminder.status == REMINDER_STATUS_PENDING,
+                ScheduledReminder.due_at <= datetime.now(timezone.utc)
+            )
+        )
+        .order_by(ScheduledReminder.due_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(ScheduledReminder)
+        .where(ScheduledReminder.id.in_(due_ids))
+        .values(status=REMINDER_STATUS_PROCESSING, claimed_at=datetime.now(timezone.utc))
+        .returning(
+            ScheduledReminder.id,
+            ScheduledReminder.telegram_id,
+            ScheduledReminder.offer_id,
+            ScheduledReminder.kind
         )
-    ).all()
+    )
+    reminders = result.all()
+    await db.commit()
+    return reminders
+
+
+async def complete_scheduled_reminders(db: AsyncSession, reminder_ids: list[int], status: str):
+    """Set final status (sent, failed or cancelled) for claimed reminders"""
+    if not reminder_ids:
+        return
+    await db.execute(
+        update(ScheduledReminder)
+        .where(ScheduledReminder.id.in_(reminder_ids))
+        .values(status=status)
+    )
+    await db.commit()
+
+
+async def release_claimed_reminders(db: AsyncSession) -> int:
+    """
+    Return reminders left in 'processing' by a stopped process to the pending queue.
     
-    return offers
+    Called on startup: with a single poller, any claimed row belongs to a
+    previous process that died before finishing the send.
+    """
+    result = await db.execute(
+        update(ScheduledReminder)
+        .where(ScheduledReminder.status == REMINDER_STATUS_PROCESSING)
+        .values(status=REMINDER_STATUS_PENDING, claimed_at=None)
+    )
+    await db.commit()
+    if result.rowcount:
+        logger.info(f"Released {result.rowcount} claimed reminder(s) back to pending")
+    return result.rowcount
+
+
+async def cancel_scheduled_reminders(db: AsyncSession, telegram_id: int) -> int:
+    """Cancel all pending reminders for user"""
+    result = await db.execute(
+        update(ScheduledReminder)
+        .where(
+            and_(
+                ScheduledReminder.telegram_id == telegram_id,
+                ScheduledReminder.status == REMINDER_STATUS_PENDING
+            )
+        )
+        .values(status=REMINDER_STATUS_CANCELLED)
+    )
+    await db.commit()
+    return result.rowcount
 
 
-def mark_first_reminder_sent(db: Session, offer_id: int):
-    """Mark first lead magnet reminder as sent"""
-    offer = db.query(Offer).filter(Offer.id == offer_id).first()
-    if offer:
-        offer.first_reminder_sent = datetime.now(timezone.utc)
-        db.commit()
-        logger.info(f"Marked first reminder sent for offer_id={offer_id}")
+async def purge_finished_reminders(db: AsyncSession, created_before: datetime, limit: int = 5000) -> int:
+    """
+    Delete sent, failed and cancelled reminders created before created_before.
+    
+    At most limit rows are deleted per call, so each call holds row locks briefly.
+    
+    Returns:
+        Number of deleted rows
+    """
+    finished_ids = (
+        select(ScheduledReminder.id)
+        .where(
+            and_(
+                ScheduledReminder.status.in_(
+                    [REMINDER_STATUS_SENT, REMINDER_STATUS_FAILED, REMINDER_STATUS_CANCELLED]
+                ),
+                ScheduledReminder.created_at < created_before
+            )
+        )
+        .limit(limit)
+        .scalar_subquery()
+    )
+    result = await db.execute(delete(ScheduledReminder).where(ScheduledReminder.id.in_(finished_ids)))
+    await db.commit()
+    return result.rowcount
 
 
-def mark_second_reminder_sent(db: Session, offer_id: int):
-    """Mark second lead magnet reminder as sent"""
-    offer = db.query(Offer).filter(Offer.id == offer_id).first()
-    if offer:
-        offer.second_reminder_sent = datetime.now(timezone.utc)
-        db.commit()
-        logger.info(f"Marked second reminder sent for offer_id={offer_id}")
+async def get_media_asset(db: AsyncSession, content_hash: str, media_type: str) -> MediaAsset | None:
+    """Get uploaded media asset by file content hash"""
+    result = await db.execute(
+        select(MediaAsset).where(
+            and_(MediaAsset.content_hash == content_hash, MediaAsset.media_type == media_type)
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_media_asset(
+    db: AsyncSession,
+    content_hash: str,
+    media_type: str,
+    file_id: str,
+    file_unique_id: str | None = None,
+    file_name: str | None = None
+):
+    """Store file_id of uploaded media (replaces file_id stored for the same content before)"""
+    statement = pg_insert(MediaAsset).values(
+        content_hash=content_hash,
+        media_type=media_type,
+        file_id=file_id,
+        file_unique_id=file_unique_id,
+        file_name=file_name
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[MediaAsset.content_hash, MediaAsset.media_type],
+        set_={
+            "file_id": statement.excluded.file_id,
+            "file_unique_id": statement.excluded.file_unique_id,
+            "file_name": statement.excluded.file_name,
+        }
+    )
+    await db.execute(statement)
+    await db.commit()
+
+
+async def get_promocodes(db: AsyncSession) -> list[Promocode]:
+    """Get all promocodes"""
+    result = await db.execute(select(Promocode).order_by(Promocode.id))
+    return list(result.scalars().all())
+
+
+def _promocode_is_redeemable():
+    """Promocode is active, within its validity window and below max_redemptions"""
+    return and_(
+        Promocode.is_active == True,
+        or_(Promocode.valid_from == None, Promocode.valid_from <= func.now()),
+        or_(Promocode.valid_until == None, Promocode.valid_until >= func.now()),
+        or_(Promocode.max_redemptions == None, Promocode.redemptions_count < Promocode.max_redemptions)
+    )
+
+
+async def can_redeem_promocode(db: AsyncSession, promocode_id: int, telegram_id: int) -> bool:
+    """Check (without counting) that user can redeem promocode"""
+    result = await db.execute(
+        select(Promocode.id)
+        .outerjoin(
+            PromocodeRedemption,
+            and_(PromocodeRedemption.promocode_id == Promocode.id, PromocodeRedemption.telegram_id == telegram_id)
+        )
+        .where(
+            and_(
+                Promocode.id == promocode_id,
+                _promocode_is_redeemable(),
+                or_(
+                    Promocode.max_redemptions_per_user == None,
+                    func.coalesce(PromocodeRedemption.count, 0) < Promocode.max_redemptions_per_user
+                )
+            )
+        )
+    )
+    return result.scalar_one_or_none() is not None
 
 
-def get_users_for_special_offer_reminder(db: Session, hours_after_click: int = 24, minutes_after_click: int = None) -> list[Offer]:
-    """Get users who need special offer reminder (24 hours after lesson click)
+async def _redeem_promocode(db: AsyncSession, promocode_id: int, telegram_id: int) -> bool:
+    """
+    Count promocode redemption by user, atomically checking redemption limits.
     
-    Args:
-        hours_after_click: Hours after lesson click (default: 24)
-        minutes_after_click: Minutes after lesson click (for testing, overrides hours_after_click if provided)
+    Both counters are incremented by conditional statements in a savepoint of the
+    caller's transaction, so concurrent redemptions can't exceed max_redemptions or
+    max_redemptions_per_user. The caller commits.
+    
+    Returns:
+        True if redeemed, False if promocode doesn't exist, is inactive, outside of its
+        validity window or a limit is reached (nothing is changed then)
     """
-    now = datetime.now(timezone.utc)
-    if minutes_after_click is not None:
-        threshold = now - timedelta(minutes=minutes_after_click)
-    else:
-        threshold = now - timedelta(hours=hours_after_click)
-    
-    offers = db.query(Offer).filter(
-        and_(
-            Offer.lesson_clicked_at != None,
-            Offer.lesson_clicked_at <= threshold,
-            Offer.reminder_type != "special_offer",  # Not already sent
-            Offer.is_active == True
-        )
-    ).all()
+    max_per_user = (
+        select(Promocode.max_redemptions_per_user)
+        .where(Promocode.id == promocode_id)
+        .scalar_subquery()
+    )
+    statement = pg_insert(PromocodeRedemption).values(
+        promocode_id=promocode_id,
+        telegram_id=telegram_id,
+        count=1
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[PromocodeRedemption.promocode_id, PromocodeRedemption.telegram_id],
+        set_={"count": PromocodeRedemption.count + 1, "updated_at": func.now()},
+        where=or_(max_per_user == None, PromocodeRedemption.count < max_per_user)
+    ).returning(PromocodeRedemption.id)
+    
+    savepoint = await db.begin_nested()
+    if (await db.execute(statement)).scalar_one_or_none() is None:
+        await savepoint.rollback()
+        return False
     
-    return offers
+    result = await db.execute(
+        update(Promocode)
+        .where(and_(Promocode.id == promocode_id, _promocode_is_redeemable()))
+        .values(redemptions_count=Promocode.redemptions_count + 1)
+        .returning(Promocode.id)
+    )
+    if result.scalar_one_or_none() is None:
+        await savepoint.rollback()
+        return False
+    
+    await savepoint.commit()
+    return True
 
 
-def log_pay_click(db: Session, user_id: int, source: str | None = None) -> PayClick:
-    """Create pay click analytics record"""
-    pay_click = PayClick(
-        user_id=user_id,
-        source=source
+async def get_persistence_entry(db: AsyncSession, kind: str, key: str):
+    """Get data of persisted bot state entry, None if there is no entry"""
+    result = await db.execute(
+        select(PersistenceEntry.data).where(
+            and_(PersistenceEntry.kind == kind, PersistenceEntry.key == key)
+        )
     )
-    db.add(pay_click)
-    db.commit()
-    db.refresh(pay_click)
-    logger.info(f"Logged pay click: user_id={user_id}, source={source}")
-    return pay_click
+    return result.scalar_one_or_none()
+
+
+async def get_persistence_entries(db: AsyncSession, kind: str, updated_after: datetime | None = None) -> list:
+    """Get (key, data) of all persisted bot state entries of kind"""
+    query = select(PersistenceEntry.key, PersistenceEntry.data).where(PersistenceEntry.kind == kind)
+    if updated_after is not None:
+        query = query.where(PersistenceEntry.updated_at > updated_after)
+    result = await db.execute(query)
+    return result.all()
 
+
+async def write_persistence_entries(db: AsyncSession, upserts: list[dict], deletes: list[tuple[str, str]]):
+    """
+    Write persisted bot state in one transaction.
+    
+    Args:
+        upserts: Entries (kind, key, data) to insert or replace
+        deletes: (kind, key) of entries to delete
+    """
+    if upserts:
+        statement = pg_insert(PersistenceEntry).values(upserts)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PersistenceEntry.kind, PersistenceEntry.key],
+            set_={"data": statement.excluded.data, "updated_at": func.now()}
+        )
+        await db.execute(statement)
+    if deletes:
+        await db.execute(
+            delete(PersistenceEntry).where(tuple_(PersistenceEntry.kind, PersistenceEntry.key).in_(deletes))
+        )
+    await db.commit()
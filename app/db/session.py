@@ -1,8 +1,15 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from shared.utils.metrics import DB_POOL_CHECKOUT_WAIT
+from db.instrumentation import instrument_engine
 import env
 import logging
+import psycopg
+import time
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -11,6 +18,11 @@ logger = logging.getLogger(__name__)
 _engine: Optional[Engine] = None
 _SessionLocal: Optional[sessionmaker] = None
 
+# Global async engine and session factory (lazy initialization)
+# Used by bot handlers and jobs so queries don't block the event loop
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker] = None
+
 
 def _get_database_url() -> str:
     """
@@ -51,6 +63,7 @@ def _initialize_engine():
             pool_pre_ping=True,  # Verify connections before using
             echo=False  # Set to True for SQL query logging
         )
+        instrument_engine(_engine)
         
         # Create session factory
         _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
@@ -127,3 +140,89 @@ def get_db_session() -> Session:
     
     return _SessionLocal()
 
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async engine pool recording how long checkouts wait for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def _initialize_async_engine():
+    """Lazy initialization of async database engine"""
+    global _async_engine, _AsyncSessionLocal
+    
+    if _async_engine is not None:
+        return
+    
+    try:
+        database_url = _get_database_url()
+        
+        # postgresql+psycopg:// resolves to psycopg3 async driver for async engines
+        _async_engine = create_async_engine(
+            database_url,
+            poolclass=TimedAsyncQueuePool,
+            pool_pre_ping=True,  # Verify connections before using
+            echo=False  # Set to True for SQL query logging
+        )
+        # Cursor events are emitted by the sync engine the async engine wraps
+        instrument_engine(_async_engine.sync_engine)
+        
+        # expire_on_commit=False: objects stay readable after commit without
+        # triggering implicit (blocking) refresh queries
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=_async_engine,
+            autoflush=False,
+            expire_on_commit=False
+        )
+        
+        logger.info("Async database engine initialized successfully with psycopg3")
+        
+    except Exception as e:
+        logger.error(f"Failed to initialize async database engine: {e}", exc_info=True)
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+
+def get_async_engine() -> Optional[AsyncEngine]:
+    """Get async database engine (lazy initialization)"""
+    if _async_engine is None:
+        _initialize_async_engine()
+    return _async_engine
+
+
+def get_async_db_session() -> AsyncSession:
+    """Get async database session (caller must `await db.close()`)"""
+    if _AsyncSessionLocal is None:
+        _initialize_async_engine()
+    
+    if _AsyncSessionLocal is None:
+        raise RuntimeError("Async database session factory is not available. Database may not be initialized.")
+    
+    return _AsyncSessionLocal()
+
+
+async def dispose_async_engine():
+    """Close all pooled async connections (call on application shutdown)"""
+    global _async_engine, _AsyncSessionLocal
+    
+    if _async_engine is None:
+        return
+    
+    await _async_engine.dispose()
+    _async_engine = None
+    _AsyncSessionLocal = None
+    logger.info("Async database engine disposed")
+
+
+async def connect_async_unpooled() -> psycopg.AsyncConnection:
+    """
+    Open autocommit psycopg connection outside the async engine pool (caller must close it).
+    For connections held for the process lifetime (LISTEN), which would shrink the pool.
+    """
+    conninfo = make_url(_get_database_url()).set(drivername="postgresql").render_as_string(hide_password=False)
+    return await psycopg.AsyncConnection.connect(conninfo, autocommit=True)
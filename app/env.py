@@ -22,6 +22,10 @@ else:
 # Telegram Bot Token
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN', '')
 
+# Bot API base URL, the token is appended (e.g. http://127.0.0.1:8081/bot for app/fake_bot_api.py).
+# Empty - https://api.telegram.org/bot
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', '')
+
 # Payment Provider Token
 PAYMENT_PROVIDER_TOKEN = os.getenv('PAYMENT_PROVIDER_TOKEN', '')
 
@@ -42,6 +46,34 @@ BEPAID_PAYMENT_URL_WITH_PROMO = os.getenv(
     'https://api.bepaid.by/products/prd_e96afb3851f78d9d/pay'
 )
 
+# Admin Telegram user IDs (comma-separated), overrides the defaults in shared/constants/callback_register.py
+ADMIN_USER_IDS = [int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()]
+
+# Webhook mode
+# When WEBHOOK_URL is set, the bot receives updates through a local web server
+# instead of long polling. WEBHOOK_URL is the public HTTPS base URL Telegram
+# posts to (e.g. https://bot.example.com), the update path is appended to it.
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+# Sent by Telegram in X-Telegram-Bot-Api-Secret-Token header, requests without it are rejected.
+# Required in webhook mode.
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+
+# Number of updates processed concurrently (1 processes updates one by one).
+# Updates of the same user are always processed in order.
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+
+# Prometheus metrics endpoint (http://METRICS_LISTEN:METRICS_PORT/metrics), 0 disables it
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+
+# SQL statements slower than this (milliseconds) are logged with the handler or job that ran them, 0 disables it
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+# Log number of queries and total DB time of every update and job run
+LOG_QUERY_SUMMARY = os.getenv('LOG_QUERY_SUMMARY', '').lower() in ('1', 'true', 'yes')
+
 # Validate required variables
 if not TELEGRAM_TOKEN:
     raise ValueError(
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API, for benchmarking reminder delivery.
+
+Serves /bot<token>/<method> like api.telegram.org and behaves like Telegram
+under load:
+- every request takes --latency ms (plus up to --jitter ms)
+- sends above --chat-limit messages per second to one chat or
+  --global-limit messages per second in total are rejected with 429 and
+  retry_after (python-telegram-bot raises RetryAfter)
+- sends to --blocked-ratio of chats (the same chats every time) are
+  rejected with 403 "bot was blocked by the user" (Forbidden)
+- --timeout-ratio of requests hang for --hang seconds, longer than the
+  bot's read timeout (TimedOut); the message still counts as sent
+- getUpdates long polls updates posted to /_updates (JSON update or list)
+
+Point the bot at it with TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot, then
+e.g. insert due offers and run the bot to benchmark process_reminders and
+the reminder chains. Messages/s, 429s, 403s and timeouts are printed
+every --report-interval seconds and served as JSON on /_stats.
+
+Usage:
+    python app/fake_bot_api.py --port 8081 --latency 50 --jitter 50 --blocked-ratio 0.05 --timeout-ratio 0.001
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from collections import defaultdict, deque
+from typing import Optional
+from tornado.web import Application, RequestHandler
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake bot", "username": "fake_bot"}
+MAX_LONG_POLL_SECONDS = 50
+
+
+def is_send_method(api_method: str) -> bool:
+    """Method sends a message (counts towards flood limits)"""
+    return api_method.startswith("send") or api_method in ("copyMessage", "forwardMessage")
+
+
+def build_sent_message(api_method: str, parameters: dict, message_id: int) -> dict:
+    """Message as returned by Telegram for a send/copy/edit method"""
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": int(parameters["chat_id"]), "type": "private"},
+        "from": BOT_USER,
+        "text": parameters.get("text", "")
+    }
+    # Sent media, so file_id caching (repository.media) works as with Telegram
+    for media_type in ("video", "document", "photo", "audio"):
+        if api_method == f"send{media_type.capitalize()}":
+            media = {"file_id": f"{media_type}_{message_id}", "file_unique_id": f"{media_type}_{message_id}"}
+            message[media_type] = [dict(media, width=1, height=1)] if media_type == "photo" else media
+    return message
+
+
+class FloodLimiter:
+    """Sliding one-second windows of sends per chat and in total"""
+
+    def __init__(self, chat_limit: int, global_limit: int):
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        self._global: deque[float] = deque()
+        self._chats: dict[int, deque[float]] = defaultdict(deque)
+
+    @staticmethod
+    def _retry_after(window: deque[float], limit: int, now: float) -> Optional[int]:
+        while window and window[0] <= now - 1:
+            window.popleft()
+        if len(window) < limit:
+            return None
+        return max(1, math.ceil(window[0] + 1 - now))
+
+    def acquire(self, chat_id: int) -> Optional[int]:
+        """
+        Count a send to chat.
+
+        Returns:
+            None if allowed, otherwise seconds to wait (retry_after)
+        """
+        now = time.monotonic()
+        chat = self._chats[chat_id]
+        retry_after = self._retry_after(chat, self.chat_limit, now)
+        if retry_after is None:
+            retry_after = self._retry_after(self._global, self.global_limit, now)
+        if retry_after is not None:
+            return retry_after
+        chat.append(now)
+        self._global.append(now)
+        if len(self._chats) > 10 * self.global_limit:
+            # Drop windows of chats nobody sent to within the last second
+            for idle_chat_id in [key for key, window in self._chats.items() if not window or window[-1] <= now - 1]:
+                del self._chats[idle_chat_id]
+        return None
+
+
+class FakeBotAPI:
+    """State and behavior of the fake Bot API"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.limiter = FloodLimiter(args.chat_limit, args.global_limit)
+        self.message_id = 0
+        self.webhook_url = ""
+        self.updates: list[dict] = []
+        self.next_update_id = 1
+        self.updates_posted = asyncio.Event()
+        # method -> outcome (ok, 429, 403, timeout) -> count
+        self.stats: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.started_at = time.monotonic()
+
+    def is_blocked(self, chat_id: int) -> bool:
+        """Chat blocked the bot (deterministic, so retries fail the same way)"""
+        return random.Random(chat_id).random() < self.args.blocked_ratio
+
+    def post_updates(self, updates: list[dict]):
+        """Queue updates for getUpdates"""
+        for update in updates:
+            self.updates.append(dict(update, update_id=self.next_update_id))
+            self.next_update_id += 1
+        self.updates_posted.set()
+
+    async def get_updates(self, parameters: dict) -> tuple[int, dict]:
+        if self.webhook_url:
+            return 409, error(409, "Conflict: can't use getUpdates method while webhook is active")
+        offset = int(parameters.get("offset") or 0)
+        limit = int(parameters.get("limit") or 100)
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates:
+            self.updates_posted.clear()
+            try:
+                timeout = min(MAX_LONG_POLL_SECONDS, float(parameters.get("timeout") or 0))
+                await asyncio.wait_for(self.updates_posted.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return 200, ok(self.updates[:limit])
+
+    async def call(self, api_method: str, parameters: dict) -> tuple[int, dict]:
+        """Handle Bot API call, returns HTTP status and response body"""
+        if api_method == "getUpdates":
+            return await self.get_updates(parameters)
+
+        delay = (self.args.latency + random.uniform(0, self.args.jitter)) / 1000
+        if random.random() < self.args.timeout_ratio:
+            self.stats[api_method]["timeout"] += 1
+            delay = self.args.hang
+        if delay:
+            await asyncio.sleep(delay)
+
+        if api_method == "getMe":
+            return 200, ok(BOT_USER)
+        if api_method == "setWebhook":
+            self.webhook_url = parameters.get("url", "")
+            return 200, ok(True)
+        if api_method == "deleteWebhook":
+            self.webhook_url = ""
+            return 200, ok(True)
+        if api_method == "getWebhookInfo":
+            return 200, ok({"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0})
+
+        if "chat_id" in parameters and is_send_method(api_method):
+            chat_id = int(parameters["chat_id"])
+            if self.is_blocked(chat_id):
+                self.stats[api_method]["403"] += 1
+                return 403, error(403, "Forbidden: bot was blocked by the user")
+            retry_after = self.limiter.acquire(chat_id)
+            if retry_after is not None:
+                self.stats[api_method]["429"] += 1
+                return 429, error(429, f"Too Many Requests: retry after {retry_after}", {"retry_after": retry_after})
+
+        self.stats[api_method]["ok"] += 1
+        if "chat_id" in parameters and api_method.startswith(("send", "copy", "edit")):
+            self.message_id += 1
+            return 200, ok(build_sent_message(api_method, parameters, self.message_id))
+        # answerCallbackQuery, answerPreCheckoutQuery, deleteMessage, ...
+        return 200, ok(True)
+
+    def summary(self) -> dict:
+        """Counters since start"""
+        elapsed = time.monotonic() - self.started_at
+        sent = sum(outcomes["ok"] for method, outcomes in self.stats.items() if is_send_method(method))
+        return {
+            "elapsed_s": elapsed,
+            "messages_sent": sent,
+            "messages_per_s": sent / elapsed if elapsed else 0.0,
+            "methods": {method: dict(outcomes) for method, outcomes in sorted(self.stats.items())},
+        }
+
+
+def ok(result) -> dict:
+    return {"ok": True, "result": result}
+
+
+def error(code: int, description: str, parameters: dict = None) -> dict:
+    body = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return body
+
+
+class BotAPIHandler(RequestHandler):
+    """/bot<token>/<method>"""
+
+    def initialize(self, api: FakeBotAPI):
+        self.api = api
+
+    def _parameters(self) -> dict:
+        if self.request.headers.get("Content-Type", "").startswith("application/json") and self.request.body:
+            return json.loads(self.request.body)
+        # Form and multipart bodies (file uploads are accepted and ignored)
+        parameters = {name: values[-1].decode() for name, values in self.request.body_arguments.items()}
+        parameters.update({name: values[-1].decode() for name, values in self.request.query_arguments.items()})
+        return parameters
+
+    async def _handle(self, token: str, api_method: str):
+        status, body = await self.api.call(api_method, self._parameters())
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(body))
+
+    async def get(self, token: str, api_method: str):
+        await self._handle(token, api_method)
+
+    async def post(self, token: str, api_method: str):
+        await self._handle(token, api_method)
+
+
+class UpdatesHandler(RequestHandler):
+    """POST /_updates - queue updates for getUpdates"""
+
+    def initialize(self, api: FakeBotAPI):
+        self.api = api
+
+    def post(self):
+        updates = json.loads(self.request.body)
+        self.api.post_updates(updates if isinstance(updates, list) else [updates])
+        self.finish(ok(len(self.api.updates)))
+
+
+class StatsHandler(RequestHandler):
+    """GET /_stats - counters since start"""
+
+    def initialize(self, api: FakeBotAPI):
+        self.api = api
+
+    def get(self):
+        self.finish(self.api.summary())
+
+
+async def report(api: FakeBotAPI, interval: float):
+    """Log messages/s and errors of every interval"""
+    previous: dict[tuple[str, str], int] = {}
+    while True:
+        await asyncio.sleep(interval)
+        current = {
+            (method, outcome): count
+            for method, outcomes in api.stats.items() for outcome, count in outcomes.items()
+        }
+        delta = defaultdict(int)
+        for (method, outcome), count in current.items():
+            if outcome == "ok" and not is_send_method(method):
+                continue
+            delta[outcome] += count - previous.get((method, outcome), 0)
+        previous = current
+        if any(delta.values()):
+            logger.info(
+                f"{delta['ok'] / interval:.1f} messages/s, "
+                f"429: {delta['429']}, 403: {delta['403']}, timeouts: {delta['timeout']}"
+            )
+
+
+async def serve(args: argparse.Namespace):
+    api = FakeBotAPI(args)
+    application = Application([
+        (r"/bot([^/]+)/(\w+)", BotAPIHandler, {"api": api}),
+        (r"/_updates", UpdatesHandler, {"api": api}),
+        (r"/_stats", StatsHandler, {"api": api}),
+    ])
+    # Uploads of sendDocument/sendVideo are read into memory
+    application.listen(args.port, address=args.host, max_body_size=50 * 1024 * 1024)
+    logger.info(f"Fake Bot API listening on http://{args.host}:{args.port}/bot")
+
+    reporter = asyncio.create_task(report(api, args.report_interval))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        reporter.cancel()
+        logger.info(f"Totals: {json.dumps(api.summary())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API server for load tests")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8081, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=50, help="Latency of every request in milliseconds")
+    parser.add_argument("--jitter", type=float, default=50, help="Random extra latency up to this many milliseconds")
+    parser.add_argument("--chat-limit", type=int, default=1, help="Messages per second to one chat before 429")
+    parser.add_argument("--global-limit", type=int, default=30, help="Messages per second in total before 429")
+    parser.add_argument("--blocked-ratio", type=float, default=0.0, help="Share of chats that blocked the bot (403)")
+    parser.add_argument("--timeout-ratio", type=float, default=0.0, help="Share of requests that hang for --hang seconds")
+    parser.add_argument("--hang", type=float, default=60, help="Seconds a hanging request takes")
+    parser.add_argument("--report-interval", type=float, default=5, help="Seconds between stats lines")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    # A line per request (and per 429) would drown the stats lines
+    logging.getLogger("tornado.access").setLevel(logging.ERROR)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
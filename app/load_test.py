@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Load test: replay updates through the real application and report handler latency.
+
+Updates are fed straight into the Application built by main.build_application
+(same handlers, update processor and persistence as in production), Bot API
+calls are answered by FakeBotRequest without network access (see
+fake_bot_api.py for a Bot API server with flood limits and errors). By default
+every synthetic user walks the payment funnel:
+    /start, lesson:get, promocode:enter, promocode text, payment:intensive,
+    pre_checkout, successful_payment
+Recorded updates (JSON list or one update per line, see post_updates.py)
+can be replayed instead with --updates.
+
+Reported per handler: p50/p95/p99 handler time, DB queries and DB time per
+update. Save a run with --save and pass it as --baseline to a later run to
+see the change of every handler.
+
+The handlers write users, offers and payments to DATABASE_URL - point it at
+a scratch database, not production.
+
+Usage:
+    python app/load_test.py --users 500 --concurrency 64 --rate 200 --api-latency 50 --save before.json
+    python app/load_test.py --users 500 --concurrency 64 --rate 200 --api-latency 50 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from collections import defaultdict
+import env
+from telegram import Update
+from telegram.request import BaseRequest, RequestData
+from db.instrumentation import get_query_stats
+from shared.constants.callback_register import (
+    COMMAND_START,
+    CALLBACK_GET_LESSON,
+    CALLBACK_PROMOCODE,
+    CALLBACK_PAYMENT_INTENSIVE
+)
+from modules.payment.index import INTENSIVE_PRICE, INTENSIVE_CURRENCY, INTENSIVE_PAYLOAD
+from post_updates import load_updates
+from fake_bot_api import BOT_USER, build_sent_message
+from main import build_application
+
+logger = logging.getLogger(__name__)
+
+FIRST_USER_ID = 2_000_000_000  # Synthetic user ids, below 2**31 (users.telegram_id is INTEGER)
+BENCHMARK_PROMOCODE = "МАРАФОН20"
+PERCENTILES = (50, 95, 99)
+
+
+class FakeBotRequest(BaseRequest):
+    """Bot API answering every method locally after a fixed latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: dict[str, int] = defaultdict(int)
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: RequestData = None, *args, **kwargs) -> tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parameters = request_data.parameters if request_data is not None else {}
+        return 200, json.dumps({"ok": True, "result": self._result(api_method, parameters)}).encode()
+
+    def _result(self, api_method: str, parameters: dict):
+        if api_method == "getMe":
+            return BOT_USER
+        if api_method == "getUpdates":
+            return []
+        if not api_method.startswith(("send", "copy", "edit")) or "chat_id" not in parameters:
+            return True
+        self._message_id += 1
+        return build_sent_message(api_method, parameters, self._message_id)
+
+
+def build_funnel(telegram_id: int) -> list[dict]:
+    """Updates of one synthetic user walking the payment funnel"""
+    user = {"id": telegram_id, "is_bot": False, "first_name": "Load", "last_name": "Test", "username": f"load_{telegram_id}"}
+    chat = {"id": telegram_id, "type": "private"}
+
+    def message(**fields) -> dict:
+        return {"message": {"message_id": 1, "date": int(time.time()), "chat": chat, "from": user, **fields}}
+
+    def callback(data: str) -> dict:
+        bot_message = {"message_id": 1, "date": int(time.time()), "chat": chat, "from": BOT_USER, "text": "..."}
+        return {"callback_query": {"id": f"{telegram_id}:{data}", "from": user, "chat_instance": str(telegram_id), "message": bot_message, "data": data}}
+
+    return [
+        message(text=f"/{COMMAND_START}", entities=[{"type": "bot_command", "offset": 0, "length": len(COMMAND_START) + 1}]),
+        callback(CALLBACK_GET_LESSON),
+        callback(CALLBACK_PROMOCODE),
+        message(text=BENCHMARK_PROMOCODE),
+        callback(CALLBACK_PAYMENT_INTENSIVE),
+        {"pre_checkout_query": {
+            "id": f"{telegram_id}:pre_checkout",
+            "from": user,
+            "currency": INTENSIVE_CURRENCY,
+            "total_amount": INTENSIVE_PRICE,
+            "invoice_payload": INTENSIVE_PAYLOAD
+        }},
+        message(successful_payment={
+            "currency": INTENSIVE_CURRENCY,
+            "total_amount": INTENSIVE_PRICE,
+            "invoice_payload": INTENSIVE_PAYLOAD,
+            "telegram_payment_charge_id": f"load_test_{telegram_id}_{time.time_ns()}",
+            "provider_payment_charge_id": f"load_test_{telegram_id}"
+        }),
+    ]
+
+
+def build_synthetic_updates(users: int, seed: int) -> list[dict]:
+    """Funnels of users interleaved at random, each user's updates in order"""
+    rng = random.Random(seed)
+    funnels = [build_funnel(FIRST_USER_ID + index) for index in range(users)]
+    positions = [0] * users
+    active = list(range(users))
+    updates = []
+    while active:
+        slot = rng.randrange(len(active))
+        user = active[slot]
+        updates.append(funnels[user][positions[user]])
+        positions[user] += 1
+        if positions[user] == len(funnels[user]):
+            active[slot] = active[-1]
+            active.pop()
+    return updates
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+class LoadTest:
+    """Feeds updates into the application and collects per-handler results"""
+
+    def __init__(self, application, rate: float):
+        self.application = application
+        self.rate = rate
+        # handler -> [(handler time, DB queries, DB time)]
+        self.results: dict[str, list[tuple[float, int, float]]] = defaultdict(list)
+        self.latencies: list[float] = []  # From dispatch, including waiting for a free slot and the user's lock
+        self.errors = 0
+
+    async def count_error(self, update, context):
+        self.errors += 1
+
+    async def _measure(self, update: Update):
+        started = time.perf_counter()
+        await self.application.process_update(update)
+        elapsed = time.perf_counter() - started
+        # Still inside the query scope the update processor opened for this update
+        stats = get_query_stats()
+        if stats is not None:
+            self.results[stats.name].append((elapsed, stats.count, stats.total_time))
+        else:
+            self.results["update"].append((elapsed, 0, 0.0))
+
+    async def _process(self, update: Update, dispatched_at: float):
+        processor = self.application.update_processor
+        await processor.process_update(update, self._measure(update))
+        self.latencies.append(time.perf_counter() - dispatched_at)
+
+    async def run(self, updates: list[dict]) -> float:
+        """
+        Dispatch updates at rate per second (0 - all at once) and wait for them.
+
+        Returns:
+            Elapsed time in seconds
+        """
+        tasks = []
+        started = time.perf_counter()
+        for index, data in enumerate(updates):
+            if self.rate:
+                delay = started + index / self.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            update = Update.de_json(dict(data, update_id=index + 1), self.application.bot)
+            tasks.append(asyncio.create_task(self._process(update, time.perf_counter())))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    def summary(self, elapsed: float) -> dict:
+        """Results as a JSON-serializable dict"""
+        handlers = {}
+        for name, results in sorted(self.results.items()):
+            times = sorted(result[0] for result in results)
+            handlers[name] = {
+                "updates": len(results),
+                **{f"p{percent}_ms": percentile(times, percent) * 1000 for percent in PERCENTILES},
+                "queries_per_update": sum(result[1] for result in results) / len(results),
+                "db_ms_per_update": sum(result[2] for result in results) / len(results) * 1000,
+            }
+        latencies = sorted(self.latencies)
+        return {
+            "updates": len(latencies),
+            "errors": self.errors,
+            "elapsed_s": elapsed,
+            "updates_per_s": len(latencies) / elapsed if elapsed else 0.0,
+            **{f"latency_p{percent}_ms": percentile(latencies, percent) * 1000 for percent in PERCENTILES if latencies},
+            "handlers": handlers,
+        }
+
+
+def _change(value: float, baseline: float) -> str:
+    if not baseline:
+        return ""
+    return f" ({(value - baseline) / baseline * 100:+.0f}%)"
+
+
+def print_summary(summary: dict, baseline: dict = None):
+    """Print results, with change against baseline results if given"""
+    baseline = baseline or {}
+    print(
+        f"✅ {summary['updates']} updates in {summary['elapsed_s']:.2f}s: "
+        f"{summary['updates_per_s']:.0f} updates/s{_change(summary['updates_per_s'], baseline.get('updates_per_s'))}, "
+        f"{summary['errors']} errors"
+    )
+    if "latency_p50_ms" in summary:
+        print("Latency from dispatch: " + ", ".join(
+            f"p{percent} {summary[f'latency_p{percent}_ms']:.1f}ms"
+            f"{_change(summary[f'latency_p{percent}_ms'], baseline.get(f'latency_p{percent}_ms'))}"
+            for percent in PERCENTILES
+        ))
+
+    print(f"\n{'handler':<28}{'updates':>8}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}{'queries':>16}{'db ms':>16}")
+    baseline_handlers = baseline.get("handlers", {})
+    for name, result in summary["handlers"].items():
+        previous = baseline_handlers.get(name, {})
+        columns = [
+            f"{result[key]:.1f}{_change(result[key], previous.get(key))}"
+            for key in ("p50_ms", "p95_ms", "p99_ms", "queries_per_update", "db_ms_per_update")
+        ]
+        print(f"{name:<28}{result['updates']:>8}" + "".join(f"{column:>16}" for column in columns))
+
+
+async def run_load_test(updates: list[dict], rate: float, api_latency: float) -> dict:
+    """Run updates through a freshly built application, return summary"""
+    request = FakeBotRequest(latency=api_latency)
+    application = build_application(request=request, get_updates_request=FakeBotRequest())
+    load_test = LoadTest(application, rate)
+    application.add_error_handler(load_test.count_error)
+
+    async with application:
+        await application.post_init(application)
+        # Starts persistence updates; no jobs are scheduled and no updates are fetched
+        await application.start()
+        try:
+            elapsed = await load_test.run(updates)
+        finally:
+            await application.stop()
+    await application.post_shutdown(application)
+
+    logger.info("Bot API calls: " + ", ".join(f"{method} {count}" for method, count in sorted(request.calls.items())))
+    return load_test.summary(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay updates through the bot application and report handler latency")
+    parser.add_argument("--updates", default=None, help="JSON file with recorded updates (list or one update per line)")
+    parser.add_argument("--users", type=int, default=200, help="Number of synthetic users walking the payment funnel")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the updates this many times")
+    parser.add_argument("--rate", type=float, default=0, help="Updates dispatched per second (0 - all at once)")
+    parser.add_argument("--concurrency", type=int, default=env.CONCURRENT_UPDATES, help="Updates processed concurrently")
+    parser.add_argument("--api-latency", type=float, default=0, help="Simulated Bot API latency in milliseconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic update order")
+    parser.add_argument("--save", default=None, help="Save results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="Compare with results saved by an earlier run")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Handler logs would dominate the output and the run time
+        logging.getLogger().setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+    if args.updates:
+        updates = load_updates(args.updates)
+        if not updates:
+            print("❌ No updates found")
+            sys.exit(1)
+    else:
+        updates = build_synthetic_updates(args.users, args.seed)
+    updates = updates * args.repeat
+
+    env.CONCURRENT_UPDATES = args.concurrency
+    print(f"Replaying {len(updates)} updates ({args.concurrency} concurrent, "
+          f"{f'{args.rate:g}/s' if args.rate else 'all at once'}, Bot API latency {args.api_latency:g}ms)...")
+    summary = asyncio.run(run_load_test(updates, args.rate, args.api_latency / 1000))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_summary(summary, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+        print(f"\nResults saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
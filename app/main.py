@@ -13,6 +13,7 @@ except Exception as e:
 
 from telegram import Update
 from telegram.error import NetworkError, TimedOut, RetryAfter
+from telegram.request import BaseRequest, HTTPXRequest
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -26,18 +27,24 @@ from telegram.ext import (
 # Import scheduler only if database is available
 if DB_AVAILABLE:
     try:
-        from scheduler.reminders import process_reminders
+        from scheduler.reminders import process_reminders, process_scheduled_reminders, purge_scheduled_reminders
         REMINDERS_AVAILABLE = True
     except Exception as e:
         logging.warning(f"Database-based reminders not available: {e}. Will use JobQueue fallback only.")
         REMINDERS_AVAILABLE = False
         process_reminders = None
+        process_scheduled_reminders = None
+        purge_scheduled_reminders = None
 else:
     REMINDERS_AVAILABLE = False
     process_reminders = None
+    process_scheduled_reminders = None
+    purge_scheduled_reminders = None
 
 from modules.init.start import start_view
 from shared.routers.callback_router import route_callback
+from shared.utils.update_processor import PerUserUpdateProcessor
+from shared.utils.metrics import timed_handler, start_metrics_server, InstrumentedHTTPXRequest
 from shared.constants.callback_register import COMMAND_START
 from modules.payment.index import (
     pre_checkout_handler,
@@ -90,17 +97,20 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
 def setup_handlers(application):
     """Register all handlers for the bot"""
     # Command handlers
-    application.add_handler(CommandHandler(COMMAND_START, start_view))
+    application.add_handler(CommandHandler(COMMAND_START, timed_handler(f"/{COMMAND_START}", start_view)))
     
     # Promocode conversation handler (must be before CallbackQueryHandler)
-    application.add_handler(get_promocode_conversation_handler())
+    application.add_handler(get_promocode_conversation_handler(persistent=application.persistence is not None))
     
     # Callback query handlers
     application.add_handler(CallbackQueryHandler(route_callback))
     
     # Payment handlers
-    application.add_handler(PreCheckoutQueryHandler(pre_checkout_handler))
-    application.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment_handler))
+    application.add_handler(PreCheckoutQueryHandler(timed_handler("pre_checkout", pre_checkout_handler)))
+    application.add_handler(MessageHandler(
+        filters.SUCCESSFUL_PAYMENT,
+        timed_handler("successful_payment", successful_payment_handler)
+    ))
     
     # Error handler (must be last)
     application.add_error_handler(error_handler)
@@ -125,14 +135,134 @@ def setup_jobs(application):
             name='process_reminders'
         )
         logging.info("Scheduled database-based reminder processing: every 1 minute (testing mode)")
+        
+        # Poll scheduled_reminders table for due reminders (lead magnet chain, fallback reminders)
+        job_queue.run_repeating(
+            callback=process_scheduled_reminders,
+            interval=15,  # Reminders are sent at most 15 seconds late
+            first=5,
+            name='process_scheduled_reminders'
+        )
+        logging.info("Scheduled persisted reminder polling: every 15 seconds")
+        
+        # Delete old sent/failed/cancelled rows so scheduled_reminders doesn't grow forever
+        job_queue.run_repeating(
+            callback=purge_scheduled_reminders,
+            interval=24 * 60 * 60,
+            first=600,
+            name='purge_scheduled_reminders'
+        )
     else:
         logging.info("Database-based reminders not available. Using JobQueue fallback only.")
+    
+    if application.persistence is not None:
+        # Keep only recently active users' user_data in memory
+        from repository.bot_persistence import evict_idle_user_data
+        job_queue.run_repeating(
+            callback=evict_idle_user_data,
+            interval=300,
+            first=300,
+            name='evict_idle_user_data'
+        )
+
+
+async def post_init(application):
+    """Prepare application state before polling starts"""
+    from shared.utils.build_keyboards import build_keyboards
+    logging.getLogger(__name__).info(f"Built {build_keyboards()} keyboards")
+    
+    start_metrics_server(env.METRICS_PORT, env.METRICS_LISTEN)
+    
+    if DB_AVAILABLE:
+        # Promocodes are reloaded as soon as they change in the database
+        from repository.promocodes import get_promocode_index
+        get_promocode_index().start_listener()
+    
+    if REMINDERS_AVAILABLE:
+        # Rehydrate reminders claimed by a previous process that stopped mid-send
+        try:
+            from db.session import get_async_db_session
+            from db.repository import release_claimed_reminders
+            db = get_async_db_session()
+            try:
+                await release_claimed_reminders(db)
+            finally:
+                await db.close()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Failed to release claimed reminders: {e}", exc_info=True)
+
+
+async def post_shutdown(application):
+    """Release resources held by the application"""
+    from scheduler.broadcast import shutdown_broadcast_engine
+    await shutdown_broadcast_engine()
+    
+    from modules.admin.export import shutdown_export_executor
+    shutdown_export_executor()
+    
+    if DB_AVAILABLE:
+        # Write queued analytics events and user profile changes before the engine is disposed
+        from repository.analytics_pipeline import shutdown_analytics_pipeline
+        from repository.users import shutdown_user_cache
+        await shutdown_analytics_pipeline()
+        await shutdown_user_cache()
+        
+        from repository.promocodes import shutdown_promocode_index
+        await shutdown_promocode_index()
+        
+        from db.session import dispose_async_engine
+        await dispose_async_engine()
+
+
+def build_application(request: BaseRequest = None, get_updates_request: BaseRequest = None):
+    """Build application with all handlers registered (jobs are set up by setup_jobs)
+    
+    Args:
+        request: Bot API request for all methods but getUpdates (HTTPX with latency metrics by default)
+        get_updates_request: Bot API request for getUpdates (HTTPX by default)
+    """
+    # Configure timeouts to handle network issues better
+    builder = (
+        ApplicationBuilder()
+        .token(env.TELEGRAM_TOKEN)
+        # Bot API requests with latency metrics
+        .request(request or InstrumentedHTTPXRequest(
+            connection_pool_size=256,
+            read_timeout=30,  # Read timeout for requests
+            write_timeout=30,  # Write timeout for requests
+            connect_timeout=30,  # Connection timeout
+            pool_timeout=30  # Pool timeout
+        ))
+        # Long polling latency says nothing, so getUpdates is not instrumented
+        .get_updates_request(get_updates_request or HTTPXRequest(connection_pool_size=1, read_timeout=30))  # Timeout for getUpdates
+        # Updates of different users are processed in parallel, updates of one user in order
+        .concurrent_updates(PerUserUpdateProcessor(env.CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if env.TELEGRAM_BASE_URL:
+        # Another Bot API server, e.g. app/fake_bot_api.py for load tests
+        builder = builder.base_url(env.TELEGRAM_BASE_URL)
+    if DB_AVAILABLE:
+        # user_data (promocode discount) and conversation states survive restarts
+        from repository.bot_persistence import DatabasePersistence
+        builder = builder.persistence(DatabasePersistence())
+    application = builder.build()
+    
+    setup_handlers(application)
+    return application
 
 
 def main():
     """Initialize and run the bot"""
     logger = logging.getLogger(__name__)
     
+    if env.WEBHOOK_URL and not env.WEBHOOK_SECRET_TOKEN:
+        # Without it anyone who finds the webhook port can post forged updates (e.g. fake payments)
+        raise ValueError(
+            "WEBHOOK_SECRET_TOKEN is not set. It is required when WEBHOOK_URL is set."
+        )
+    
     # Initialize database
     try:
         from db.init_db import init_db
@@ -142,22 +272,30 @@ def main():
         logger.error(f"Failed to initialize database: {e}", exc_info=True)
         # Continue anyway - database might already exist
     
-    # Configure timeouts to handle network issues better
-    application = (
-        ApplicationBuilder()
-        .token(env.TELEGRAM_TOKEN)
-        .read_timeout(30)  # Read timeout for requests
-        .write_timeout(30)  # Write timeout for requests
-        .connect_timeout(30)  # Connection timeout
-        .pool_timeout(30)  # Pool timeout
-        .get_updates_read_timeout(30)  # Timeout for getUpdates
-        .build()
-    )
-    
-    setup_handlers(application)
+    application = build_application()
     setup_jobs(application)
     
-    application.run_polling()
+    if env.WEBHOOK_URL:
+        run_webhook(application)
+    else:
+        application.run_polling()
+
+
+def run_webhook(application):
+    """Receive updates through a local web server instead of long polling"""
+    logger = logging.getLogger(__name__)
+    url_path = env.WEBHOOK_PATH.strip('/')
+    webhook_url = f"{env.WEBHOOK_URL.rstrip('/')}/{url_path}"
+    
+    logger.info(f"Starting webhook server on {env.WEBHOOK_LISTEN}:{env.WEBHOOK_PORT}/{url_path} for {webhook_url}")
+    application.run_webhook(
+        listen=env.WEBHOOK_LISTEN,
+        port=env.WEBHOOK_PORT,
+        url_path=url_path,
+        webhook_url=webhook_url,
+        secret_token=env.WEBHOOK_SECRET_TOKEN,
+        allowed_updates=Update.ALL_TYPES
+    )
 
 
 if __name__ == '__main__':
@@ -1,86 +1,164 @@
 """
 Admin functions for exporting database data to PDF
+
+Exports run in a separate process so rendering doesn't block the bot.
+Rows are streamed from a server-side cursor and rendered as a sequence of
+small tables, so memory use doesn't grow with the number of rows. The PDF
+is written to a temporary file which the caller sends and removes.
 """
 from db.session import get_db_session
 from db.models import User, Offer
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.enums import TA_CENTER
+from sqlalchemy import select
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-import io
+from typing import Callable, Iterator, Optional
+import asyncio
+import multiprocessing
+import os
+import tempfile
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched from the server-side cursor at a time
+EXPORT_FETCH_SIZE = 2000
+# Rows per rendered table (a table is laid out as a whole before it's split into pages)
+EXPORT_TABLE_ROWS = 500
+
+USERS_HEADER = ['ID', 'Telegram ID', 'First Name', 'Nickname', 'Premium', 'Registration Date']
+USERS_COL_WIDTHS = [0.5*inch, 1*inch, 1.2*inch, 1*inch, 0.6*inch, 1.2*inch]
+OFFERS_HEADER = ['ID', 'User ID', 'Telegram ID', 'Active', 'Expires', 'Lesson Clicked', 'Created']
+OFFERS_COL_WIDTHS = [0.4*inch, 0.6*inch, 0.9*inch, 0.5*inch, 1*inch, 1*inch, 1*inch]
+
+
+class _StreamingStory(list):
+    """
+    Story that pulls flowables from an iterator while the document is built.
+
+    SimpleDocTemplate.build() consumes the story from the front and checks
+    len() before every flowable, so keeping only a couple of flowables in
+    the list is enough and rendered tables are released right away.
+    """
+
+    def __init__(self, flowables: Iterator):
+        super().__init__()
+        self._flowables = flowables
+
+    def __len__(self):
+        while list.__len__(self) < 2:
+            flowable = next(self._flowables, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+        return list.__len__(self)
+
+
+def _get_title_style() -> ParagraphStyle:
+    styles = getSampleStyleSheet()
+    return ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor('#1a1a1a'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+
+def _get_table_style(header_font_size: int, body_font_size: int) -> TableStyle:
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), body_font_size),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ])
 
-def export_users_to_pdf() -> io.BytesIO:
-    """Export all users to PDF format"""
+
+def _iter_tables(rows: Iterator[list], header: list, col_widths: list, style: TableStyle) -> Iterator[Table]:
+    """Render rows as tables of EXPORT_TABLE_ROWS rows, each with the header"""
+    data = [header]
+    for row in rows:
+        data.append(row)
+        if len(data) > EXPORT_TABLE_ROWS:
+            yield Table(data, colWidths=col_widths, style=style, repeatRows=1)
+            data = [header]
+    if len(data) > 1:
+        yield Table(data, colWidths=col_widths, style=style, repeatRows=1)
+
+
+def _format_date(value: Optional[datetime], default: str) -> str:
+    return value.strftime("%d.%m.%Y %H:%M") if value else default
+
+
+def _build_pdf(path: str, flowables: Iterator, **doc_kwargs):
+    doc = SimpleDocTemplate(path, pagesize=A4, pageCompression=1, **doc_kwargs)
+    doc.build(_StreamingStory(flowables))
+
+
+def write_users_pdf(path: str) -> int:
+    """
+    Export all users to PDF file.
+
+    Args:
+        path: File to write the PDF to
+
+    Returns:
+        Number of exported users
+    """
     db = get_db_session()
+    total = 0
     try:
-        users = db.query(User).order_by(User.created_at.desc()).all()
-        
-        # Create PDF in memory
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
+        result = db.execute(
+            select(
+                User.id,
+                User.telegram_id,
+                User.first_name,
+                User.last_name,
+                User.nickname,
+                User.is_premium_tg_user,
+                User.created_at
+            )
+            .order_by(User.created_at.desc())
+            .execution_options(yield_per=EXPORT_FETCH_SIZE)
         )
-        
-        # Title
-        story.append(Paragraph("Users Database", title_style))
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Table data
-        data = [['ID', 'Telegram ID', 'First Name', 'Nickname', 'Premium', 'Registration Date']]
-        
-        for user in users:
-            created_at = user.created_at.strftime("%d.%m.%Y %H:%M") if user.created_at else "N/A"
-            data.append([
-                str(user.id),
-                str(user.telegram_id),
-                user.first_name or user.last_name or "N/A",
-                user.nickname or "N/A",
-                "Yes" if user.is_premium_tg_user else "No",
-                created_at
-            ])
-        
-        # Create table
-        table = Table(data, colWidths=[0.5*inch, 1*inch, 1.2*inch, 1*inch, 0.6*inch, 1.2*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 0.2*inch))
-        story.append(Paragraph(f"Total users: {len(users)}", styles['Normal']))
-        story.append(Paragraph(f"Export date: {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M UTC')}", styles['Normal']))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
-        
+
+        def rows():
+            nonlocal total
+            for user in result:
+                total += 1
+                yield [
+                    str(user.id),
+                    str(user.telegram_id),
+                    user.first_name or user.last_name or "N/A",
+                    user.nickname or "N/A",
+                    "Yes" if user.is_premium_tg_user else "No",
+                    _format_date(user.created_at, "N/A")
+                ]
+
+        def story():
+            styles = getSampleStyleSheet()
+            yield Paragraph("Users Database", _get_title_style())
+            yield Spacer(1, 0.2*inch)
+            yield from _iter_tables(rows(), USERS_HEADER, USERS_COL_WIDTHS, _get_table_style(10, 8))
+            yield Spacer(1, 0.2*inch)
+            yield Paragraph(f"Total users: {total}", styles['Normal'])
+            yield Paragraph(f"Export date: {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M UTC')}", styles['Normal'])
+
+        _build_pdf(path, story())
+        return total
+
     except Exception as e:
         logger.error(f"Error exporting users to PDF: {e}", exc_info=True)
         raise
@@ -88,81 +166,111 @@ def export_users_to_pdf() -> io.BytesIO:
         db.close()
 
 
-def export_offers_to_pdf() -> io.BytesIO:
-    """Export all offers to PDF format"""
+def write_offers_pdf(path: str) -> int:
+    """
+    Export all offers to PDF file.
+
+    Args:
+        path: File to write the PDF to
+
+    Returns:
+        Number of exported offers
+    """
     db = get_db_session()
+    total = 0
+    active_count = 0
     try:
-        offers = db.query(Offer).order_by(Offer.created_at.desc()).all()
-        
-        # Create PDF in memory
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.5*inch, leftMargin=0.5*inch)
-        story = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
+        # Telegram ID comes from the join instead of lazy-loading offer.user per row
+        result = db.execute(
+            select(
+                Offer.id,
+                Offer.user_id,
+                User.telegram_id,
+                Offer.is_active,
+                Offer.offer_expiration_date,
+                Offer.lesson_clicked_at,
+                Offer.created_at
+            )
+            .outerjoin(User, User.id == Offer.user_id)
+            .order_by(Offer.created_at.desc())
+            .execution_options(yield_per=EXPORT_FETCH_SIZE)
         )
-        
-        # Title
-        story.append(Paragraph("Offers Database", title_style))
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Table data
-        data = [['ID', 'User ID', 'Telegram ID', 'Active', 'Expires', 'Lesson Clicked', 'Created']]
-        
-        for offer in offers:
-            expiration = offer.offer_expiration_date.strftime("%d.%m.%Y %H:%M") if offer.offer_expiration_date else "N/A"
-            clicked = offer.lesson_clicked_at.strftime("%d.%m.%Y %H:%M") if offer.lesson_clicked_at else "No"
-            created = offer.created_at.strftime("%d.%m.%Y %H:%M") if offer.created_at else "N/A"
-            telegram_id = str(offer.user.telegram_id) if offer.user and offer.user.telegram_id else "N/A"
-            
-            data.append([
-                str(offer.id),
-                str(offer.user_id),
-                telegram_id,
-                "Yes" if offer.is_active else "No",
-                expiration,
-                clicked,
-                created
-            ])
-        
-        # Create table
-        table = Table(data, colWidths=[0.4*inch, 0.6*inch, 0.9*inch, 0.5*inch, 1*inch, 1*inch, 1*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 0.2*inch))
-        story.append(Paragraph(f"Total offers: {len(offers)}", styles['Normal']))
-        active_count = sum(1 for o in offers if o.is_active)
-        story.append(Paragraph(f"Active offers: {active_count}", styles['Normal']))
-        story.append(Paragraph(f"Export date: {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M UTC')}", styles['Normal']))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
-        
+
+        def rows():
+            nonlocal total, active_count
+            for offer in result:
+                total += 1
+                active_count += 1 if offer.is_active else 0
+                yield [
+                    str(offer.id),
+                    str(offer.user_id),
+                    str(offer.telegram_id) if offer.telegram_id else "N/A",
+                    "Yes" if offer.is_active else "No",
+                    _format_date(offer.offer_expiration_date, "N/A"),
+                    _format_date(offer.lesson_clicked_at, "No"),
+                    _format_date(offer.created_at, "N/A")
+                ]
+
+        def story():
+            styles = getSampleStyleSheet()
+            yield Paragraph("Offers Database", _get_title_style())
+            yield Spacer(1, 0.2*inch)
+            yield from _iter_tables(rows(), OFFERS_HEADER, OFFERS_COL_WIDTHS, _get_table_style(9, 7))
+            yield Spacer(1, 0.2*inch)
+            yield Paragraph(f"Total offers: {total}", styles['Normal'])
+            yield Paragraph(f"Active offers: {active_count}", styles['Normal'])
+            yield Paragraph(f"Export date: {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M UTC')}", styles['Normal'])
+
+        _build_pdf(path, story(), rightMargin=0.5*inch, leftMargin=0.5*inch)
+        return total
+
     except Exception as e:
         logger.error(f"Error exporting offers to PDF: {e}", exc_info=True)
         raise
     finally:
         db.close()
 
+
+# Export worker process (lazy initialization)
+# One worker: exports are rare and shouldn't compete with the bot for CPU
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_export_executor() -> ProcessPoolExecutor:
+    """Get process pool exports are rendered in"""
+    global _executor
+    if _executor is None:
+        # spawn: forking a process with a running event loop and open connections is unsafe
+        _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_export_executor():
+    """Stop export worker process (call on application shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _export_to_file(write_pdf: Callable[[str], int], prefix: str) -> str:
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".pdf")
+    os.close(fd)
+    try:
+        loop = asyncio.get_running_loop()
+        total = await loop.run_in_executor(get_export_executor(), write_pdf, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    logger.info(f"Exported {total} rows to {path} ({os.path.getsize(path)} bytes)")
+    return path
+
+
+async def export_users_to_pdf() -> str:
+    """Export all users to PDF in worker process (returns temporary file path, caller removes it)"""
+    return await _export_to_file(write_users_pdf, "users_export_")
+
+
+async def export_offers_to_pdf() -> str:
+    """Export all offers to PDF in worker process (returns temporary file path, caller removes it)"""
+    return await _export_to_file(write_offers_pdf, "offers_export_")
@@ -0,0 +1,133 @@
+"""
+Cache of sent export documents.
+
+An export is identified by its kind (table + format) and the table's
+high-water mark (row count, max id, max updated_at). While the table
+doesn't change, the document uploaded last time is re-sent by its
+Telegram file_id instead of rebuilding and re-uploading the file.
+
+Requests for an export that is being built wait for that build
+(single-flight) and then get the document by file_id as well.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+from telegram import Bot, InputFile
+from db.models import User, Offer, PayClick
+from db.repository import get_table_version
+from db.session import get_async_db_session
+from shared.utils.metrics import EXPORT_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Exported table -> model the high-water mark is read from
+EXPORT_TABLE_MODELS = {
+    "users": User,
+    "offers": Offer,
+    "pay_clicks": PayClick,
+}
+
+# Telegram Bot API limit for documents uploaded by bots
+MAX_DOCUMENT_SIZE_BYTES = 50 * 1024 * 1024
+
+
+class ExportTooLargeError(Exception):
+    """Built export exceeds the size Telegram accepts from bots"""
+
+
+class ExportCache:
+    """Latest sent document per export kind, with single-flight builds"""
+
+    def __init__(self):
+        # kind -> (table version, file_id)
+        self._documents: dict[str, tuple[tuple, str]] = {}
+        # (kind, table version) -> future resolved with file_id of the build in progress
+        self._builds: dict[tuple[str, tuple], asyncio.Future] = {}
+
+    async def send_export(
+        self,
+        bot: Bot,
+        chat_id: int,
+        table: str,
+        file_format: str,
+        build: Callable[[], Awaitable[str]],
+        filename: str,
+        caption: Optional[str] = None
+    ) -> bool:
+        """
+        Send export document, building it only if the table changed since the last export.
+
+        Args:
+            bot: Bot instance
+            chat_id: Chat to send the document to
+            table: Name from EXPORT_TABLE_MODELS
+            file_format: Export format (part of the cache key)
+            build: Coroutine function building the export, returns temporary file path
+            filename: Document file name
+            caption: Document caption
+
+        Returns:
+            True if a cached document was re-sent, False if it was built and uploaded
+        """
+        kind = f"{table}:{file_format}"
+        db = get_async_db_session()
+        try:
+            version = await get_table_version(db, EXPORT_TABLE_MODELS[table])
+        finally:
+            await db.close()
+
+        cached = self._documents.get(kind)
+        if cached is not None and cached[0] == version:
+            await bot.send_document(chat_id=chat_id, document=cached[1], caption=caption)
+            logger.info(f"Re-sent cached {kind} export to chat_id={chat_id}")
+            return True
+
+        build_key = (kind, version)
+        in_progress = self._builds.get(build_key)
+        if in_progress is not None:
+            file_id = await asyncio.shield(in_progress)
+            await bot.send_document(chat_id=chat_id, document=file_id, caption=caption)
+            logger.info(f"Sent {kind} export built for another request to chat_id={chat_id}")
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        self._builds[build_key] = future
+        try:
+            with EXPORT_DURATION.labels(table, file_format).time():
+                path = await build()
+            try:
+                if os.path.getsize(path) > MAX_DOCUMENT_SIZE_BYTES:
+                    raise ExportTooLargeError(f"{kind} export is {os.path.getsize(path)} bytes")
+                with open(path, "rb") as export_buffer:
+                    document = InputFile(export_buffer, filename=filename)
+                message = await bot.send_document(chat_id=chat_id, document=document, caption=caption)
+            finally:
+                os.remove(path)
+
+            file_id = message.document.file_id
+            self._documents[kind] = (version, file_id)
+            future.set_result(file_id)
+            return False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark exception as retrieved: there may be no other request waiting
+            future.exception()
+            raise
+        finally:
+            del self._builds[build_key]
+
+
+# Global cache (lazy initialization)
+_cache: Optional[ExportCache] = None
+
+
+def get_export_cache() -> ExportCache:
+    """Get shared export cache"""
+    global _cache
+    if _cache is None:
+        _cache = ExportCache()
+    return _cache
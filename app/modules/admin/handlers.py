@@ -1,48 +1,72 @@
 """
 Admin handlers for callback queries
 """
-from telegram import Update, InputFile
+from telegram import Update
 from telegram.ext import ContextTypes
-from telegram.error import TelegramError
 from modules.admin.export import export_users_to_pdf, export_offers_to_pdf
+from modules.admin.table_export import export_table, EXPORT_FORMAT_PDF, EXPORT_FILE_SUFFIXES
+from modules.admin.export_cache import get_export_cache, ExportTooLargeError
+from repository.entitlements import is_admin
+from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-async def handle_export_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle export users to PDF"""
+async def _send_export(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    table: str,
+    file_format: str,
+    build,
+    status_text: str,
+    error_text: str,
+    caption: str
+):
+    """Send export document (cached one if the table didn't change) with status message"""
     query = update.callback_query
+    user = update.effective_user
+    if user is None or not is_admin(user.id):
+        # Export callbacks are only shown to admins, but anyone can send the callback data
+        logger.warning(f"Rejected {table} {file_format} export for non-admin user_id={user.id if user else None}")
+        if query:
+            await query.answer()
+        return
+
     if query:
         await query.answer()
-    
+
     try:
-        status_msg = await query.message.reply_text("⏳ Генерирую PDF с базой пользователей...")
-        
-        # Generate PDF
-        pdf_buffer = export_users_to_pdf()
-        
-        # Create InputFile from BytesIO
-        pdf_file = InputFile(pdf_buffer, filename=f"users_export_{update.effective_user.id}.pdf")
-        
-        # Send PDF as document
-        await context.bot.send_document(
-            chat_id=update.effective_user.id,
-            document=pdf_file,
-            caption="📄 База пользователей"
-        )
-        
-        # Delete status message
+        status_msg = await query.message.reply_text(status_text)
+
+        filename = f"{table}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M')}{EXPORT_FILE_SUFFIXES[file_format]}"
         try:
-            await status_msg.delete()
+            await get_export_cache().send_export(
+                context.bot,
+                chat_id=update.effective_user.id,
+                table=table,
+                file_format=file_format,
+                build=build,
+                filename=filename,
+                caption=caption
+            )
+        finally:
+            # Delete status message
+            try:
+                await status_msg.delete()
+            except:
+                pass
+
+        logger.info(f"Exported {table} {file_format} for admin user_id={update.effective_user.id}")
+
+    except ExportTooLargeError as e:
+        logger.warning(f"Export too large: {e}")
+        try:
+            await query.message.reply_text("❌ Файл выгрузки больше 50 МБ, Telegram не позволяет его отправить.")
         except:
             pass
-        
-        logger.info(f"Exported users PDF for admin user_id={update.effective_user.id}")
-        
     except Exception as e:
-        logger.error(f"Error exporting users: {e}", exc_info=True)
-        error_text = "❌ Произошла ошибка при выгрузке базы пользователей."
+        logger.error(f"Error exporting {table} as {file_format}: {e}", exc_info=True)
         try:
             if query:
                 await query.message.reply_text(error_text)
@@ -50,42 +74,48 @@ async def handle_export_users(update: Update, context: ContextTypes.DEFAULT_TYPE
             pass
 
 
+async def handle_export_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle export users to PDF"""
+    await _send_export(
+        update,
+        context,
+        table="users",
+        file_format=EXPORT_FORMAT_PDF,
+        build=export_users_to_pdf,
+        status_text="⏳ Генерирую PDF с базой пользователей...",
+        error_text="❌ Произошла ошибка при выгрузке базы пользователей.",
+        caption="📄 База пользователей"
+    )
+
+
 async def handle_export_offers(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle export offers to PDF"""
-    query = update.callback_query
-    if query:
-        await query.answer()
-    
-    try:
-        status_msg = await query.message.reply_text("⏳ Генерирую PDF с базой предложений...")
-        
-        # Generate PDF
-        pdf_buffer = export_offers_to_pdf()
-        
-        # Create InputFile from BytesIO
-        pdf_file = InputFile(pdf_buffer, filename=f"offers_export_{update.effective_user.id}.pdf")
-        
-        # Send PDF as document
-        await context.bot.send_document(
-            chat_id=update.effective_user.id,
-            document=pdf_file,
-            caption="📄 База предложений"
+    await _send_export(
+        update,
+        context,
+        table="offers",
+        file_format=EXPORT_FORMAT_PDF,
+        build=export_offers_to_pdf,
+        status_text="⏳ Генерирую PDF с базой предложений...",
+        error_text="❌ Произошла ошибка при выгрузке базы предложений.",
+        caption="📄 База предложений"
+    )
+
+
+def get_table_export_handler(table: str, file_format: str):
+    """Create handler exporting table as gzip CSV or Parquet document"""
+
+    async def handle_table_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await _send_export(
+            update,
+            context,
+            table=table,
+            file_format=file_format,
+            build=lambda: export_table(table, file_format),
+            status_text=f"⏳ Выгружаю {table} ({file_format})...",
+            error_text="❌ Произошла ошибка при выгрузке.",
+            caption=f"📄 {table} ({file_format})"
         )
-        
-        # Delete status message
-        try:
-            await status_msg.delete()
-        except:
-            pass
-        
-        logger.info(f"Exported offers PDF for admin user_id={update.effective_user.id}")
-        
-    except Exception as e:
-        logger.error(f"Error exporting offers: {e}", exc_info=True)
-        error_text = "❌ Произошла ошибка при выгрузке базы предложений."
-        try:
-            if query:
-                await query.message.reply_text(error_text)
-        except:
-            pass
 
+    handle_table_export.__name__ = f"handle_export_{table}_{file_format}"
+    return handle_table_export
@@ -0,0 +1,191 @@
+"""
+Admin exports of raw tables for large datasets
+
+- CSV: rows are streamed from Postgres with COPY ... TO STDOUT and
+  gzip-compressed into a temporary file chunk by chunk, so no table is
+  ever materialized in Python. Chunks are buffered up to
+  CSV_WRITE_BUFFER_SIZE and compressed in a thread, off the event loop.
+- Parquet (only if pyarrow is installed): rows are fetched from a
+  server-side cursor in the export worker process and written as one
+  row group per fetched batch.
+"""
+from db.session import get_async_engine, get_db_session
+from db.models import User, Offer, PayClick
+from modules.admin.export import EXPORT_FETCH_SIZE, get_export_executor
+from sqlalchemy import Select, select, Integer, BigInteger, Boolean, DateTime
+from sqlalchemy.dialects import postgresql
+from typing import Callable
+import asyncio
+import gzip
+import os
+import tempfile
+import logging
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_PDF = "pdf"  # Built by modules.admin.export
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_PARQUET = "parquet"
+
+# Level 6 (zlib default) is several times faster than gzip.open's default 9 and barely larger
+CSV_GZIP_COMPRESS_LEVEL = 6
+CSV_WRITE_BUFFER_SIZE = 1024 * 1024
+
+EXPORT_FILE_SUFFIXES = {
+    EXPORT_FORMAT_PDF: ".pdf",
+    EXPORT_FORMAT_CSV: ".csv.gz",
+    EXPORT_FORMAT_PARQUET: ".parquet",
+}
+
+
+def _users_query() -> Select:
+    return select(
+        User.id,
+        User.telegram_id,
+        User.nickname,
+        User.first_name,
+        User.last_name,
+        User.is_premium_tg_user,
+        User.created_at
+    ).order_by(User.id)
+
+
+def _offers_query() -> Select:
+    return select(
+        Offer.id,
+        Offer.user_id,
+        User.telegram_id,
+        Offer.is_active,
+        Offer.offer_expiration_date,
+        Offer.lesson_clicked_at,
+        Offer.first_reminder_sent,
+        Offer.second_reminder_sent,
+        Offer.last_reminder_sent,
+        Offer.reminder_type,
+        Offer.created_at
+    ).outerjoin(User, User.id == Offer.user_id).order_by(Offer.id)
+
+
+def _pay_clicks_query() -> Select:
+    return select(
+        PayClick.id,
+        PayClick.user_id,
+        User.telegram_id,
+        PayClick.source,
+        PayClick.created_at
+    ).outerjoin(User, User.id == PayClick.user_id).order_by(PayClick.id)
+
+
+# Exportable tables: name -> query
+EXPORT_TABLES: dict[str, Callable[[], Select]] = {
+    "users": _users_query,
+    "offers": _offers_query,
+    "pay_clicks": _pay_clicks_query,
+}
+
+
+def _get_copy_sql(query: Select) -> str:
+    compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    return f"COPY ({compiled}) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+
+async def _write_csv_gzip(table: str, path: str) -> int:
+    """Stream table as gzip CSV into file, returns uncompressed size in bytes"""
+    engine = get_async_engine()
+    if engine is None:
+        raise RuntimeError("Async database engine is not available. Database may not be initialized.")
+
+    size = 0
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        cursor = raw_connection.driver_connection.cursor()
+        try:
+            with gzip.open(path, "wb", compresslevel=CSV_GZIP_COMPRESS_LEVEL) as file:
+                buffer = bytearray()
+                async with cursor.copy(_get_copy_sql(EXPORT_TABLES[table]())) as copy:
+                    async for chunk in copy:
+                        buffer += chunk
+                        size += len(chunk)
+                        if len(buffer) >= CSV_WRITE_BUFFER_SIZE:
+                            await asyncio.to_thread(file.write, bytes(buffer))
+                            buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(file.write, bytes(buffer))
+        finally:
+            await cursor.close()
+    return size
+
+
+def _get_arrow_type(column_type):
+    if isinstance(column_type, (Integer, BigInteger)):
+        return pyarrow.int64()
+    if isinstance(column_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column_type, DateTime):
+        return pyarrow.timestamp("us", tz="UTC" if column_type.timezone else None)
+    return pyarrow.string()
+
+
+def write_parquet(table: str, path: str) -> int:
+    """
+    Export table to Parquet file (runs in export worker process).
+
+    Returns:
+        Number of exported rows
+    """
+    query = EXPORT_TABLES[table]()
+    schema = pyarrow.schema([
+        (column.name, _get_arrow_type(column.type)) for column in query.selected_columns
+    ])
+
+    db = get_db_session()
+    total = 0
+    try:
+        result = db.execute(query.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+            for rows in result.partitions():
+                columns = list(zip(*rows))
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                    [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                total += len(rows)
+        return total
+    finally:
+        db.close()
+
+
+async def export_table(table: str, file_format: str) -> str:
+    """
+    Export table to temporary file.
+
+    Args:
+        table: Name from EXPORT_TABLES
+        file_format: EXPORT_FORMAT_CSV or EXPORT_FORMAT_PARQUET
+
+    Returns:
+        Path of the temporary file (caller removes it)
+    """
+    if file_format == EXPORT_FORMAT_PARQUET and not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    fd, path = tempfile.mkstemp(prefix=f"{table}_export_", suffix=EXPORT_FILE_SUFFIXES[file_format])
+    os.close(fd)
+    try:
+        if file_format == EXPORT_FORMAT_CSV:
+            await _write_csv_gzip(table, path)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(get_export_executor(), write_parquet, table, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    logger.info(f"Exported {table} as {file_format} to {path} ({os.path.getsize(path)} bytes)")
+    return path
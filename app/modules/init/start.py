@@ -4,6 +4,7 @@ from telegram.error import NetworkError, TimedOut
 from shared.utils.welcome_text import get_welcome_text
 from shared.utils.get_welcome_keyboard import get_welcome_keyboard
 from repository.analytics import track_start_analytics
+from repository.entitlements import user_has_paid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +25,7 @@ async def start_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
         is_premium = bool(getattr(user, 'is_premium', False) or False)
         # Collect analytics and persist user/offer
         try:
-            track_start_analytics(
+            await track_start_analytics(
                 user=user,
                 offer_expiration_days=OFFER_EXPIRATION_DAYS
             )
@@ -34,7 +35,8 @@ async def start_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Send welcome message with lesson button
         text = get_welcome_text()
-        await update.message.reply_text(text, reply_markup=get_welcome_keyboard(user_id=user_id))
+        has_paid = await user_has_paid(user_id)
+        await update.message.reply_text(text, reply_markup=get_welcome_keyboard(user_id=user_id, has_paid=has_paid))
 
     except (NetworkError, TimedOut) as e:
         logger.warning(f"Network error in start command: {e}")
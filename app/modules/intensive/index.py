@@ -17,7 +17,7 @@ async def handle_intensive(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Uncomment if you want to cancel on page visit:
     # try:
     #     from scheduler.job_queue_reminders import cancel_lead_reminders
-    #     cancel_lead_reminders(context, user_id)
+    #     await cancel_lead_reminders(context, user_id)
     #     logger.info(f"Cancelled lead reminders for user_id={user_id} after intensive page visit")
     # except Exception as cancel_error:
     #     logger.warning(f"Error cancelling reminders for user_id={user_id}: {cancel_error}")
@@ -22,7 +22,8 @@ ERROR_3_STEP_LESSON_YOUTUBE_URL = "https://www.youtube.com/watch?v=A2z9Ug3K4p0"
 # To get file_id: send video to your bot, then check update.message.video.file_id
 LESSON_TELEGRAM_VIDEO_FILE_ID = None  # Example: "BAACAgIAAxkBAAIBY2..." 
 
-# Option 3: Local video file path (video will be uploaded from disk)
+# Option 3: Local video file path (uploaded once, its file_id is stored in media_assets
+# table and reused until the file content changes)
 LESSON_VIDEO_FILE_PATH = None  # Example: "lessons/lesson_video.mp4"
 
 # Lesson description text
@@ -3,8 +3,12 @@ from telegram.ext import ContextTypes
 from telegram.error import TelegramError
 from shared.utils.get_back import get_back_keyboard
 from modules.lead_magnet.config import get_lead_magnet_config
-from db.session import get_db_session
-from db.repository import get_or_create_user, mark_lesson_clicked
+from db.session import get_async_db_session
+from db.repository import mark_lesson_clicked
+from repository.users import get_user_id
+from repository.analytics import track_funnel_event
+from repository.media import send_media
+from repository.analytics_pipeline import FUNNEL_EVENT_LESSON_CLICK
 from scheduler.job_queue_reminders import schedule_lead_reminders
 import os
 import logging
@@ -20,26 +24,20 @@ async def handle_get_lead_magnet(update: Update, context: ContextTypes.DEFAULT_T
     user_id = update.effective_user.id
     bot = context.bot
     config = get_lead_magnet_config()
+    track_funnel_event(update.effective_user, FUNNEL_EVENT_LESSON_CLICK)
     
     # Try to use database-based reminder system first
     # If database is unavailable, fallback to JobQueue-based system
     db_available = False
     try:
-        db = get_db_session()
+        db = get_async_db_session()
         try:
-            # Test database connection by trying to get or create user
-            db_user = get_or_create_user(
-                db=db,
-                telegram_id=user_id,
-                nickname=update.effective_user.username,
-                first_name=update.effective_user.first_name,
-                last_name=update.effective_user.last_name,
-                is_premium=bool(getattr(update.effective_user, 'is_premium', False) or False)
-            )
+            # Get or create user (cached, no database access for known users)
+            db_user_id = await get_user_id(update.effective_user)
             
             # Mark lesson clicked - this triggers database-based reminder system
             # (process_reminders in scheduler/reminders.py will pick it up)
-            offer = mark_lesson_clicked(db, db_user.id)
+            offer = await mark_lesson_clicked(db, db_user_id)
             
             if offer:
                 db_available = True
@@ -50,30 +48,24 @@ async def handle_get_lead_magnet(update: Update, context: ContextTypes.DEFAULT_T
             logger.warning(f"Database error in handle_get_lead_magnet: {db_error}. Will use JobQueue fallback.")
             db_available = False
         finally:
-            db.close()
+            await db.close()
     except Exception as db_session_error:
         logger.warning(f"Could not get database session: {db_session_error}. Will use JobQueue fallback.")
         db_available = False
     
-    # Fallback to JobQueue-based reminder system if database is not available
+    # Fallback reminder system if offer-based reminders are not available
+    # (persisted in scheduled_reminders, or JobQueue if database is down)
     if not db_available:
         try:
-            # Check if JobQueue is available before trying to use it
-            try:
-                job_queue = context.job_queue
-                if job_queue is None:
-                    raise AttributeError("JobQueue is None")
-            except AttributeError:
-                logger.warning("JobQueue is not available. Reminders will not be sent. Install python-telegram-bot[job-queue] to enable fallback reminder system.")
-                # Continue - user still gets the lesson even if reminders can't be scheduled
-                return
-            
             # Use minutes for testing, set to False for production (uses hours)
             use_minutes = False  # Set to False in production
-            schedule_lead_reminders(context, user_id, use_minutes=use_minutes)
-            logger.info(f"Database unavailable: scheduled lead reminders for user_id={user_id} using JobQueue (fallback mode)")
+            scheduled = await schedule_lead_reminders(context, user_id, use_minutes=use_minutes)
+            if scheduled:
+                logger.info(f"Scheduled fallback lead reminders for user_id={user_id}: {scheduled}")
+            else:
+                logger.warning(f"Reminders will not be sent for user_id={user_id}: neither database nor JobQueue is available")
         except Exception as reminder_error:
-            logger.error(f"Error scheduling reminders via JobQueue for user_id={user_id}: {reminder_error}", exc_info=True)
+            logger.error(f"Error scheduling fallback reminders for user_id={user_id}: {reminder_error}", exc_info=True)
             # Continue even if reminder scheduling fails - user still gets the lesson
     
     # Get lesson description
@@ -104,15 +96,16 @@ async def handle_get_lead_magnet(update: Update, context: ContextTypes.DEFAULT_T
                 logger.error(f"Error sending video by file_id: {e}")
                 # Fallback to file upload if file_id doesn't work
         
-        # Option 3: Local video file (upload from disk)
+        # Option 3: Local video file (uploaded once, then sent by cached file_id)
         if config["video_file_path"] and os.path.exists(config["video_file_path"]):
             try:
-                with open(config["video_file_path"], "rb") as video_file:
-                    await bot.send_video(
-                        chat_id=user_id,
-                        video=video_file,
-                        caption=description
-                    )
+                await send_media(
+                    bot,
+                    user_id,
+                    config["video_file_path"],
+                    media_type="video",
+                    caption=description
+                )
                 await bot.send_message(
                     chat_id=user_id,
                     text="✅ Урок отправлен!",
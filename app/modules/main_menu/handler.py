@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from shared.utils.welcome_text import get_welcome_text
 from shared.utils.get_welcome_keyboard import get_welcome_keyboard
+from repository.entitlements import user_has_paid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,5 +14,6 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = update.effective_user.id
     text = get_welcome_text()
-    await query.message.reply_text(text, reply_markup=get_welcome_keyboard(user_id=user_id))
+    has_paid = await user_has_paid(user_id)
+    await query.message.reply_text(text, reply_markup=get_welcome_keyboard(user_id=user_id, has_paid=has_paid))
 
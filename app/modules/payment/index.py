@@ -9,12 +9,22 @@ from modules.payment.promocodes import (
     get_discount_value,
     calculate_discount_amount,
     calculate_final_price,
-    is_percentage_discount
+    is_percentage_discount,
+    requires_active_offer
 )
 from shared.utils.get_intensive_keyboard import get_intensive_keyboard
 from shared.utils.get_promocode_keyboard import get_promocode_keyboard
 from shared.constants.callback_register import CALLBACK_PROMOCODE
 from modules.main_menu.index import get_main_menu_keyboard
+from repository.analytics import track_pay_click, track_funnel_event
+from repository.analytics_pipeline import FUNNEL_EVENT_INVOICE_SENT, FUNNEL_EVENT_PAYMENT
+from repository.entitlements import invalidate_entitlements
+from repository.promocodes import get_promocode, can_redeem_promocode, PromocodesUnavailableError
+from repository.bot_persistence import CONVERSATION_TIMEOUT_SECONDS
+from repository.users import get_user_id
+from db.session import get_async_db_session
+from db.repository import record_payment
+from shared.utils.metrics import timed_handler
 
 # Payment configuration
 PAYMENT_PROVIDER_TOKEN = env.PAYMENT_PROVIDER_TOKEN
@@ -41,25 +51,10 @@ async def process_promocode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     promocode = update.message.text.strip()
     user_id = update.effective_user.id
     
-    # Get database session to check offer expiration for "УРОК" promocode
-    from db.session import get_db_session
-    from db.repository import get_or_create_user
-    
-    db = get_db_session()
     try:
-        # Get or create user to get user_id for offer check
-        db_user = get_or_create_user(
-            db=db,
-            telegram_id=user_id,
-            nickname=update.effective_user.username,
-            first_name=update.effective_user.first_name,
-            last_name=update.effective_user.last_name,
-            is_premium=bool(getattr(update.effective_user, 'is_premium', False) or False)
-        )
-        
         # Check if promocode is valid (including offer expiration check for "УРОК")
-        if is_valid_promocode(promocode, user_id=db_user.id, db_session=db):
-            discount_value = get_discount_value(promocode)
+        if await is_valid_promocode(promocode, telegram_id=user_id):
+            discount_value = await get_discount_value(promocode)
             discount_amount = calculate_discount_amount(INTENSIVE_PRICE, discount_value)
             final_price = calculate_final_price(INTENSIVE_PRICE, discount_value)
             
@@ -86,10 +81,10 @@ async def process_promocode(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Show keyboard with payment button for promocode discount
             await update.message.reply_text(text, reply_markup=get_promocode_keyboard())
         else:
-            # Check if it's "УРОК" promocode that expired
-            if promocode.upper() == "УРОК":
+            # Check if it's promocode tied to special offer (e.g. "УРОК") that expired
+            if await requires_active_offer(promocode):
                 text = (
-                    "❌ Промокод 'УРОК' больше не действителен.\n\n"
+                    f"❌ Промокод '{promocode.upper()}' больше не действителен.\n\n"
                     "⏰ Срок действия специального предложения истек.\n"
                     "Попробуйте другой промокод или вернитесь назад."
                 )
@@ -100,8 +95,6 @@ async def process_promocode(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error processing promocode: {e}", exc_info=True)
         text = "❌ Произошла ошибка при проверке промокода. Попробуйте еще раз."
         await update.message.reply_text(text, reply_markup=get_intensive_keyboard())
-    finally:
-        db.close()
     
     return ConversationHandler.END
 
@@ -127,6 +120,8 @@ async def send_intensive_invoice(update: Update, context: ContextTypes.DEFAULT_T
     else:
         message = update.message
     
+    track_pay_click(update.effective_user, source="intensive_invoice")
+    
     # Get discount from user_data if exists
     discount_value = context.user_data.get('discount_value', '')
     if discount_value:
@@ -162,6 +157,7 @@ async def send_intensive_invoice(update: Update, context: ContextTypes.DEFAULT_T
         currency=INTENSIVE_CURRENCY,  # BYN - may show as USD in test mode
         prices=prices,
     )
+    track_funnel_event(update.effective_user, FUNNEL_EVENT_INVOICE_SENT, source=context.user_data.get('promocode'))
 
 async def pre_checkout_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle pre-checkout query - approve payment"""
@@ -179,6 +175,17 @@ async def pre_checkout_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
         
         if invoice_payload == INTENSIVE_PAYLOAD:
+            # Redemption is counted when the payment succeeds, here limits are only checked
+            promocode = context.user_data.get('promocode')
+            if promocode and not await can_redeem_promocode(promocode, query.from_user.id):
+                logger.info(f"Promocode {promocode} can't be redeemed by user_id={query.from_user.id}")
+                context.user_data.pop('discount_value', None)
+                context.user_data.pop('promocode', None)
+                await query.answer(
+                    ok=False,
+                    error_message="Промокод больше не действителен. Запросите счет заново без промокода."
+                )
+                return
             await query.answer(ok=True)
             logger.info(f"Payment approved for invoice_payload: {invoice_payload}")
         else:
@@ -205,14 +212,57 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
         user = update.effective_user
         user_id = user.id
         username = user.username or user.first_name or ""
-        
-        # Cancel scheduled reminders (target action-2 performed)
+        # Record payment, deactivate offer and cancel pending reminders in one statement,
+        # count promocode redemption in the same transaction
+        # (duplicate delivery of the same payment is a no-op)
         try:
-            from scheduler.job_queue_reminders import cancel_lead_reminders
-            cancel_lead_reminders(context, user_id)
-            logger.info(f"Cancelled lead reminders for user_id={user_id} after successful payment")
-        except Exception as cancel_error:
-            logger.warning(f"Error cancelling reminders for user_id={user_id}: {cancel_error}")
+            promocode = context.user_data.get('promocode')
+            try:
+                promocode_info = await get_promocode(promocode) if promocode else None
+            except PromocodesUnavailableError as e:
+                # The payment is recorded anyway, only the redemption isn't counted
+                logger.warning(f"Redemption of promocode {promocode} by user_id={user_id} not counted: {e}")
+                promocode_info = None
+            db = get_async_db_session()
+            try:
+                recorded = await record_payment(
+                    db,
+                    promocode_id=promocode_info.id if promocode_info else None,
+                    user_id=await get_user_id(user),
+                    telegram_id=user_id,
+                    invoice_payload=payment.invoice_payload,
+                    currency=payment.currency,
+                    total_amount=payment.total_amount,
+                    promocode=promocode,
+                    telegram_payment_charge_id=payment.telegram_payment_charge_id,
+                    provider_payment_charge_id=payment.provider_payment_charge_id
+                )
+            finally:
+                await db.close()
+            
+            if recorded:
+                track_funnel_event(user, FUNNEL_EVENT_PAYMENT, source=payment.telegram_payment_charge_id)
+            else:
+                logger.info(f"Payment {payment.telegram_payment_charge_id} for user_id={user_id} was already recorded")
+            
+            # record_payment cancels only persisted reminders: JobQueue fallback jobs
+            # scheduled while the database was down are removed here
+            from scheduler.job_queue_reminders import get_reminder_job_registry
+            cancelled_jobs = get_reminder_job_registry().cancel(user_id)
+            if cancelled_jobs:
+                logger.info(f"Cancelled {cancelled_jobs} JobQueue reminder(s) for user_id={user_id} after successful payment")
+        except Exception as record_error:
+            logger.error(f"Error recording payment {payment.telegram_payment_charge_id} for user_id={user_id}: {record_error}", exc_info=True)
+            track_funnel_event(user, FUNNEL_EVENT_PAYMENT, source=payment.telegram_payment_charge_id)
+            
+            # Cancel scheduled reminders (target action-2 performed) without the payment record
+            try:
+                from scheduler.job_queue_reminders import cancel_lead_reminders
+                await cancel_lead_reminders(context, user_id)
+                logger.info(f"Cancelled lead reminders for user_id={user_id} after successful payment")
+            except Exception as cancel_error:
+                logger.warning(f"Error cancelling reminders for user_id={user_id}: {cancel_error}")
+        invalidate_entitlements(user_id)
         
         # Get payment amount
         payment_amount = f"{payment.total_amount / 100:.2f} {payment.currency}"
@@ -258,20 +308,31 @@ async def failed_payment_handler(update: Update, context: ContextTypes.DEFAULT_T
     
     await update.message.reply_text(text, reply_markup=reply_markup)
 
-def get_promocode_conversation_handler():
-    """Create and return ConversationHandler for promocode input"""
+def get_promocode_conversation_handler(persistent: bool = False):
+    """Create and return ConversationHandler for promocode input
+    
+    Args:
+        persistent: Store conversation state in application persistence (survives restarts)
+    """
     return ConversationHandler(
-        entry_points=[CallbackQueryHandler(start_promocode_input, pattern=f"^{CALLBACK_PROMOCODE}$")],
+        entry_points=[CallbackQueryHandler(
+            timed_handler(CALLBACK_PROMOCODE, start_promocode_input),
+            pattern=f"^{CALLBACK_PROMOCODE}$"
+        )],
         states={
             WAITING_FOR_PROMOCODE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, process_promocode)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler("promocode:text", process_promocode))
             ],
         },
         fallbacks=[
             # Cancel on any callback query (user pressed any button)
-            CallbackQueryHandler(cancel_promocode),
+            CallbackQueryHandler(timed_handler("promocode:cancel", cancel_promocode)),
             # Cancel on any command
-            MessageHandler(filters.COMMAND, cancel_promocode)
+            MessageHandler(filters.COMMAND, timed_handler("promocode:cancel", cancel_promocode))
         ],
+        name="promocode",
+        persistent=persistent,
+        # Abandoned inputs end instead of waiting for a promocode forever
+        conversation_timeout=CONVERSATION_TIMEOUT_SECONDS,
     )
 
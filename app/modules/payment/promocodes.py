@@ -1,57 +1,51 @@
-# Promocode configuration
-# Format: {promocode: discount_value}
+from repository.promocodes import get_promocode
+
+# Promocodes are stored in the promocodes table (see repository/promocodes.py)
+# discount_value format:
 # If discount_value contains '%' - it's percentage discount (e.g., "10%" = 10% off)
 # If discount_value is a number without '%' - it's fixed amount discount in cents (e.g., "5000" = 50.00 BYN off)
-PROMOCODES = {
-    "МАРАФОН": "6000",  # 60 BYN fixed discount
-    "МАРАФОН20": "20%",   # 20% discount
-    "МАРАФОН15": "15%",   # 15% discount
-    "УРОК": "6000",  # 60 BYN fixed discount (290 instead of 350 BYN)
-    # Example of fixed discount: "МАРАФОН5000": "5000"  # 50.00 BYN fixed discount
-}
 
 def is_percentage_discount(discount_value: str) -> bool:
     """Check if discount is percentage (contains %)"""
     return "%" in discount_value
 
-def get_discount_value(promocode: str) -> str:
+async def get_discount_value(promocode: str) -> str:
     """Get discount value for promocode, returns empty string if not found"""
-    return PROMOCODES.get(promocode.upper(), "")
+    info = await get_promocode(promocode)
+    return info.discount_value if info else ""
+
+async def requires_active_offer(promocode: str) -> bool:
+    """Check if promocode is only valid while user's special offer is active (e.g. "УРОК")"""
+    info = await get_promocode(promocode)
+    return bool(info and info.requires_active_offer)
 
-def is_valid_promocode(promocode: str, user_id: int = None, db_session = None) -> bool:
+async def is_valid_promocode(promocode: str, telegram_id: int = None) -> bool:
     """Check if promocode exists and is valid
     
     Args:
         promocode: Promocode to check
-        user_id: Optional user ID to check offer expiration for "УРОК" promocode
-        db_session: Optional database session to check offer expiration
+        telegram_id: Optional Telegram user ID to check offer expiration for promocodes requiring active offer
     
     Returns:
         True if promocode is valid, False otherwise
     """
-    promocode_upper = promocode.upper()
+    info = await get_promocode(promocode)
     
-    # Check if promocode exists
-    if promocode_upper not in PROMOCODES:
+    # Check if promocode exists, is active and not used up
+    if info is None or not info.is_available():
         return False
     
-    # Special check for "УРОК" promocode - must check offer expiration
-    if promocode_upper == "УРОК":
-        if user_id is None or db_session is None:
-            # If no user_id or db_session provided, we can't validate - return False for safety
+    # Promocodes like "УРОК" are only valid while user's offer hasn't expired
+    if info.requires_active_offer:
+        if telegram_id is None:
+            # If no telegram_id provided, we can't validate - return False for safety
             return False
         
-        # Check if user has active offer that hasn't expired
-        from db.repository import get_active_offer_for_user
-        from datetime import datetime, timezone
-        
-        offer = get_active_offer_for_user(db_session, user_id)
-        if not offer:
-            return False
+        # Check if user has active offer that hasn't expired (cached, see repository/entitlements.py)
+        from repository.entitlements import get_entitlements
         
-        # Check if offer has expired
-        now = datetime.now(timezone.utc)
-        if offer.offer_expiration_date < now:
+        entitlements = await get_entitlements(telegram_id)
+        if not entitlements.has_active_offer():
             return False
     
     return True
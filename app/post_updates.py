@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Script to post recorded Telegram updates to the bot running in webhook mode.
+
+Updates are read from a JSON file (a list of updates or one update per line)
+and posted concurrently to the webhook, the same way Telegram does it.
+
+Usage:
+    python app/post_updates.py updates.json --url http://localhost:8080/telegram \\
+        --secret "$WEBHOOK_SECRET_TOKEN" --concurrency 50 --repeat 10
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import httpx
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def load_updates(path: str) -> list[dict]:
+    """Load updates from JSON list or JSON lines file"""
+    with open(path, encoding="utf-8") as file:
+        content = file.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+async def post_updates(url: str, updates: list[dict], secret: str | None, concurrency: int) -> list[float]:
+    """
+    Post updates to webhook.
+
+    Returns:
+        Response times in seconds of successfully posted updates
+    """
+    headers = {SECRET_TOKEN_HEADER: secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(headers=headers, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def post(update: dict):
+            nonlocal errors
+            async with semaphore:
+                started_at = time.perf_counter()
+                try:
+                    response = await client.post(url, json=update)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started_at)
+                except httpx.HTTPError as e:
+                    errors += 1
+                    if errors <= 10:
+                        print(f"❌ Update {update.get('update_id')}: {e}")
+
+        await asyncio.gather(*(post(update) for update in updates))
+
+    if errors:
+        print(f"❌ {errors} updates failed")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post recorded updates to the bot webhook")
+    parser.add_argument("file", help="JSON file with updates (list or one update per line)")
+    parser.add_argument("--url", default="http://localhost:8080/telegram", help="Webhook URL")
+    parser.add_argument("--secret", default=None, help="Webhook secret token")
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of requests in flight")
+    parser.add_argument("--repeat", type=int, default=1, help="Post the updates this many times")
+    args = parser.parse_args()
+
+    recorded = load_updates(args.file)
+    if not recorded:
+        print("❌ No updates found")
+        sys.exit(1)
+
+    # Telegram never sends the same update_id twice, so repeated updates get new ids
+    first_update_id = max(update.get("update_id", 0) for update in recorded) + 1
+    updates = []
+    for index in range(len(recorded) * args.repeat):
+        update = dict(recorded[index % len(recorded)])
+        update["update_id"] = first_update_id + index
+        updates.append(update)
+
+    print(f"Posting {len(updates)} updates to {args.url} ({args.concurrency} concurrent)...")
+    started_at = time.perf_counter()
+    latencies = asyncio.run(post_updates(args.url, updates, args.secret, args.concurrency))
+    elapsed = time.perf_counter() - started_at
+
+    if latencies:
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"✅ Posted {len(latencies)} updates in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} updates/s)")
+        print(f"Response time: p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,39 @@
 import logging
 from telegram import User
-from db.session import get_db_session
-from db.repository import get_or_create_user, create_or_update_offer, log_pay_click
+from db.session import get_async_db_session
+from db.repository import create_or_update_offer
+from repository.users import get_user_id
+from repository.entitlements import invalidate_entitlements
+from repository.analytics_pipeline import record_pay_click, record_funnel_event, FUNNEL_EVENT_START
 
 logger = logging.getLogger(__name__)
 
 
-def track_start_analytics(user: User, offer_expiration_days: int) -> None:
+async def track_start_analytics(user: User, offer_expiration_days: int) -> None:
     """Persist user and offer data for analytics purposes."""
-    db = get_db_session()
+    db = get_async_db_session()
     try:
-        db_user = get_or_create_user(
-            db=db,
-            telegram_id=user.id,
-            nickname=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            is_premium=bool(getattr(user, "is_premium", False) or False),
-        )
+        user_id = await get_user_id(user)
 
-        create_or_update_offer(
+        await create_or_update_offer(
             db=db,
-            user_id=db_user.id,
+            user_id=user_id,
             expiration_days=offer_expiration_days,
         )
+        invalidate_entitlements(user.id)
+        record_funnel_event(user.id, FUNNEL_EVENT_START)
     except Exception as error:
         logger.error("Failed to track start analytics", exc_info=True)
         raise error
     finally:
-        db.close()
+        await db.close()
 
 
 def track_pay_click(user: User, source: str | None = None) -> None:
-    """Persist user for analytics when pay/оплатить button is clicked."""
-    db = get_db_session()
-    try:
-        db_user = get_or_create_user(
-            db=db,
-            telegram_id=user.id,
-            nickname=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            is_premium=bool(getattr(user, "is_premium", False) or False),
-        )
-        log_pay_click(db=db, user_id=db_user.id, source=source)
-    except Exception as error:
-        logger.error("Failed to track pay click", exc_info=True)
-        raise error
-    finally:
-        db.close()
+    """Record pay/оплатить button click (written in background by analytics pipeline)."""
+    record_pay_click(user, source)
+
+
+def track_funnel_event(user: User, event: str, source: str | None = None) -> None:
+    """Record funnel event (written in background by analytics pipeline)."""
+    record_funnel_event(user.id, event, source)
@@ -0,0 +1,188 @@
+"""
+Asynchronous analytics pipeline.
+
+Handlers record analytics events (pay clicks, funnel events) without waiting
+for the database: events are put into a bounded in-memory queue and written
+by a background flusher with one multi-row INSERT per table and batch.
+
+When the queue is full (database is slow or down) new events are dropped
+and counted instead of slowing down user requests.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+from telegram import User as TelegramUser
+from db.session import get_async_db_session
+from db.repository import log_pay_clicks, log_funnel_events
+from repository.users import get_user_id
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_QUEUE_SIZE = 10000
+FLUSH_BATCH_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 1.0  # Max time an event waits for a fuller batch
+
+# Log a warning on the first dropped event and then every N-th one
+DROP_WARNING_EVERY = 1000
+
+# Event kinds
+EVENT_PAY_CLICK = "pay_click"
+EVENT_FUNNEL = "funnel"
+
+# Funnel events
+FUNNEL_EVENT_START = "start"
+FUNNEL_EVENT_LESSON_CLICK = "lesson_click"
+FUNNEL_EVENT_INVOICE_SENT = "invoice_sent"
+FUNNEL_EVENT_PAYMENT = "payment"
+
+
+class AnalyticsPipeline:
+    """Bounded queue of analytics events with background batched writes"""
+
+    def __init__(
+        self,
+        queue_size: int = ANALYTICS_QUEUE_SIZE,
+        batch_size: int = FLUSH_BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0}
+
+    def _ensure_started(self):
+        """Start flusher lazily inside the running event loop"""
+        if self._flusher_task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._flusher_task = asyncio.create_task(self._flusher(), name="analytics_flusher")
+
+    def record(self, kind: str, event: dict) -> bool:
+        """
+        Queue event without waiting.
+
+        Args:
+            kind: EVENT_PAY_CLICK or EVENT_FUNNEL
+            event: Event data
+
+        Returns:
+            True if queued, False if dropped because the queue is full
+        """
+        if self._closing:
+            self.stats["dropped"] += 1
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((kind, event))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % DROP_WARNING_EVERY == 1:
+                logger.warning(f"Analytics queue is full, dropped {self.stats['dropped']} events so far")
+            return False
+        self.stats["recorded"] += 1
+        return True
+
+    def get_queue_size(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _flusher(self):
+        loop = asyncio.get_running_loop()
+        while not (self._closing and self._queue.empty()):
+            item = await self._queue.get()
+            if item is None:
+                # Wake-up from shutdown()
+                continue
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: list[tuple[str, dict]]):
+        """Write batch with one INSERT per table"""
+        pay_clicks = [event for kind, event in batch if kind == EVENT_PAY_CLICK]
+        funnel_events = [event for kind, event in batch if kind == EVENT_FUNNEL]
+
+        try:
+            # Pay clicks reference users.id; ids of known users come from the cache
+            user_ids = await asyncio.gather(*(get_user_id(event["user"]) for event in pay_clicks))
+            db = get_async_db_session()
+            try:
+                await log_pay_clicks(db, [
+                    {"user_id": user_id, "source": event["source"], "created_at": event["created_at"]}
+                    for user_id, event in zip(user_ids, pay_clicks)
+                ])
+                await log_funnel_events(db, funnel_events)
+            finally:
+                await db.close()
+            self.stats["written"] += len(batch)
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"Failed to write {len(batch)} analytics events: {e}", exc_info=True)
+
+    async def shutdown(self):
+        """Stop flusher and write queued events (call on application shutdown)"""
+        if self._flusher_task is None:
+            return
+        # Flusher writes what is left in the queue and exits
+        self._closing = True
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass  # Flusher is busy and will see the flag after the current batch
+        await asyncio.gather(self._flusher_task, return_exceptions=True)
+        self._flusher_task = None
+        self._queue = None
+        logger.info(f"Analytics pipeline stopped: {self.stats}")
+
+
+# Global pipeline (lazy initialization)
+_pipeline: Optional[AnalyticsPipeline] = None
+
+
+def get_analytics_pipeline() -> AnalyticsPipeline:
+    """Get shared analytics pipeline"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = AnalyticsPipeline()
+    return _pipeline
+
+
+def record_pay_click(user: TelegramUser, source: str | None = None) -> bool:
+    """Queue pay click event"""
+    return get_analytics_pipeline().record(EVENT_PAY_CLICK, {
+        "user": user,
+        "source": source,
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+def record_funnel_event(telegram_id: int, event: str, source: str | None = None) -> bool:
+    """Queue funnel event"""
+    return get_analytics_pipeline().record(EVENT_FUNNEL, {
+        "telegram_id": telegram_id,
+        "event": event,
+        "source": source,
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+async def shutdown_analytics_pipeline():
+    """Write queued events of shared pipeline (call on application shutdown)"""
+    global _pipeline
+    if _pipeline is not None:
+        await _pipeline.shutdown()
+        _pipeline = None
@@ -0,0 +1,286 @@
+"""
+PTB persistence of user_data and conversation states in the bot_persistence table.
+
+- user_data is not loaded at startup: each user's entry is read on the
+  first update of that user (refresh_user_data), so startup time and
+  memory don't grow with the number of users who ever used the bot.
+- PTB collects changed users and calls update_user_data every
+  PERSISTENCE_UPDATE_INTERVAL seconds. Entries whose data didn't change
+  since the last write are skipped, the rest are queued and written by
+  one batched upsert/delete (write-behind, like repository.users).
+  Entries of a failed write are queued again, unless a newer value was
+  queued meanwhile. A user's entry that is queued or being written is
+  newer than the table, so refresh_user_data loads it instead.
+- Users idle for more than USER_DATA_IDLE_SECONDS are evicted from
+  memory (not from the table) by evict_idle_users, run from JobQueue.
+- Only conversations updated within CONVERSATION_TIMEOUT_SECONDS are
+  restored on startup; older ones would have timed out anyway.
+
+Only JSON-serializable values may be stored in user_data.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from telegram.ext import Application, BasePersistence, PersistenceInput
+from db.session import get_async_db_session
+from db.repository import get_persistence_entry, get_persistence_entries, write_persistence_entries
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_UPDATE_INTERVAL = 5  # Seconds between PTB persistence updates
+FLUSH_INTERVAL_SECONDS = 0.1
+FLUSH_RETRY_SECONDS = 5  # Delay before writing entries again after a failed write
+MAX_FLUSH_BATCH_SIZE = 500
+USER_DATA_IDLE_SECONDS = 3600  # Users without updates for this long are evicted from memory
+CONVERSATION_TIMEOUT_SECONDS = 600  # Conversations without updates for this long are ended
+
+KIND_USER_DATA = "user_data"
+
+
+def _conversation_kind(name: str) -> str:
+    return f"conversation:{name}"
+
+
+def _serialize(data) -> str:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+class DatabasePersistence(BasePersistence):
+    """user_data and conversation states in Postgres, loaded per user on demand"""
+
+    def __init__(self, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        # telegram_id -> monotonic time of the user's last update (oldest first)
+        self._last_seen: OrderedDict[int, float] = OrderedDict()
+        # telegram_id -> JSON of user_data as last written (or loaded)
+        self._persisted: dict[int, str] = {}
+        # Users evicted from memory whose drop_user_data call PTB hasn't made yet
+        self._evicting: set[int] = set()
+        # Evicted users with updates before that call: telegram_id -> live user_data
+        self._returned: dict[int, dict] = {}
+        # (kind, key) -> data to write, None to delete
+        self._pending: dict[tuple[str, str], Optional[dict]] = {}
+        # Entries of the batch being written
+        self._writing: dict[tuple[str, str], Optional[dict]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # user_data
+
+    async def get_user_data(self) -> dict[int, dict]:
+        """Nothing is loaded at startup (see refresh_user_data)"""
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        """Load user's persisted data on the user's first update"""
+        self._last_seen[user_id] = time.monotonic()
+        self._last_seen.move_to_end(user_id)
+        if user_id in self._evicting:
+            self._returned[user_id] = user_data
+        if user_id in self._persisted:
+            return
+
+        entry = (KIND_USER_DATA, str(user_id))
+        if entry in self._pending or entry in self._writing:
+            # Staged on eviction but not written yet - the table still has older data
+            data = deepcopy(self._pending[entry] if entry in self._pending else self._writing[entry])
+        else:
+            try:
+                db = get_async_db_session()
+                try:
+                    data = await get_persistence_entry(db, *entry)
+                finally:
+                    await db.close()
+            except Exception as e:
+                # Not marked as loaded: nothing is written for the user until loading succeeds
+                logger.warning(f"Could not load user_data of user_id={user_id}: {e}")
+                return
+
+        if data:
+            user_data.update(data)
+        self._persisted[user_id] = _serialize(data or {})
+
+    async def update_user_data(self, user_id: int, data: dict):
+        """Queue write of user's data if it changed"""
+        self._stage_user_data(user_id, data)
+
+    def _stage_user_data(self, user_id: int, data: dict):
+        serialized = self._persisted.get(user_id)
+        if serialized is None:
+            # Persisted data was never loaded, writing would overwrite it
+            return
+        new_serialized = _serialize(data)
+        if new_serialized == serialized:
+            return
+        self._persisted[user_id] = new_serialized
+        self._enqueue((KIND_USER_DATA, str(user_id)), data or None)
+
+    async def drop_user_data(self, user_id: int):
+        """Delete user's data (or only forget it, if the user was evicted from memory)"""
+        if user_id in self._evicting:
+            self._evicting.discard(user_id)
+            user_data = self._returned.pop(user_id, None)
+            if user_data is not None:
+                # User came back before PTB processed the eviction - keep their changes
+                await self.update_user_data(user_id, deepcopy(user_data))
+            return
+        self._forget(user_id)
+        self._enqueue((KIND_USER_DATA, str(user_id)), None)
+
+    def _forget(self, user_id: int):
+        self._last_seen.pop(user_id, None)
+        self._persisted.pop(user_id, None)
+
+    def evict_idle_users(self, application: Application, max_idle: float = USER_DATA_IDLE_SECONDS) -> int:
+        """
+        Drop user_data of idle users from memory, their persisted data is kept.
+
+        Returns:
+            Number of evicted users
+        """
+        threshold = time.monotonic() - max_idle
+        evicted = 0
+        while self._last_seen:
+            user_id, last_seen = next(iter(self._last_seen.items()))
+            if last_seen > threshold:
+                break
+            if user_id in application.user_data:
+                # Changes PTB hasn't passed to update_user_data yet would be lost with the entry
+                self._stage_user_data(user_id, deepcopy(application.user_data[user_id]))
+                self._evicting.add(user_id)
+                application.drop_user_data(user_id)
+            self._forget(user_id)
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted user_data of {evicted} idle user(s), {len(self._last_seen)} in memory")
+        return evicted
+
+    # Conversations
+
+    async def get_conversations(self, name: str) -> dict[tuple, object]:
+        """Load conversations of handler that may not have timed out yet"""
+        updated_after = datetime.now(timezone.utc) - timedelta(seconds=CONVERSATION_TIMEOUT_SECONDS)
+        try:
+            db = get_async_db_session()
+            try:
+                rows = await get_persistence_entries(db, _conversation_kind(name), updated_after)
+            finally:
+                await db.close()
+        except Exception as e:
+            logger.warning(f"Could not load {name} conversations: {e}")
+            return {}
+        return {tuple(json.loads(row.key)): row.data for row in rows}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]):
+        """Queue write of conversation state (None - conversation ended)"""
+        self._enqueue((_conversation_kind(name), json.dumps(list(key))), new_state)
+
+    # Write-behind
+
+    def _enqueue(self, entry: tuple[str, str], data):
+        self._pending[entry] = data
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="persistence_flush")
+
+    async def _flush_loop(self):
+        while self._pending:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            if not await self._write_batch():
+                await asyncio.sleep(FLUSH_RETRY_SECONDS)
+
+    async def _write_batch(self) -> bool:
+        """
+        Write up to MAX_FLUSH_BATCH_SIZE queued entries.
+
+        Returns:
+            False if the write failed (entries are queued again)
+        """
+        entries = list(self._pending)[:MAX_FLUSH_BATCH_SIZE]
+        if not entries:
+            return True
+        values = {entry: self._pending.pop(entry) for entry in entries}
+        self._writing = values
+        upserts = [
+            {"kind": kind, "key": key, "data": data}
+            for (kind, key), data in values.items() if data is not None
+        ]
+        deletes = [entry for entry, data in values.items() if data is None]
+
+        try:
+            db = get_async_db_session()
+            try:
+                await write_persistence_entries(db, upserts, deletes)
+            finally:
+                await db.close()
+        except asyncio.CancelledError:
+            # Cancelled by flush() on shutdown, which writes the entries again
+            self._requeue(values)
+            raise
+        except Exception as e:
+            logger.error(f"Failed to write {len(entries)} persistence entries, will retry: {e}", exc_info=True)
+            self._requeue(values)
+            return False
+        finally:
+            self._writing = {}
+        return True
+
+    def _requeue(self, values: dict[tuple[str, str], Optional[dict]]):
+        for entry, data in values.items():
+            # A value queued while writing is newer than the failed one
+            if entry not in self._pending:
+                self._pending[entry] = data
+
+    async def flush(self):
+        """Write all queued entries (called by PTB on shutdown)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        while self._pending:
+            if not await self._write_batch():
+                logger.error(f"Lost {len(self._pending)} persistence entries: database is not available")
+                self._pending.clear()
+                return
+
+    # Not stored (see store_data)
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
+
+    async def get_callback_data(self) -> Optional[tuple]:
+        return None
+
+    async def update_callback_data(self, data: tuple):
+        pass
+
+
+async def evict_idle_user_data(context):
+    """JobQueue callback: evict user_data of idle users from memory"""
+    persistence = context.application.persistence
+    if isinstance(persistence, DatabasePersistence):
+        persistence.evict_idle_users(context.application)
@@ -0,0 +1,123 @@
+"""
+Per-user entitlements: admin, has paid, active offer.
+
+Admins come from the ADMIN_USER_IDS frozenset (no database access).
+"Has paid" and the active offer are loaded with one query and cached per
+telegram_id for ENTITLEMENT_TTL_SECONDS, so menus and promocode checks
+don't hit the database on every update. Handlers that change these flags
+(payment, /start offer creation) invalidate the user's entry; a load that
+was running during an invalidation isn't cached, as it may have read the
+old row.
+"""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+from db.session import get_async_db_session
+from db.repository import get_user_entitlements
+from shared.constants.callback_register import ADMIN_USER_IDS
+
+logger = logging.getLogger(__name__)
+
+ENTITLEMENT_CACHE_SIZE = 10000  # Least recently used users are evicted above this size
+ENTITLEMENT_TTL_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    """What a user is entitled to"""
+    has_paid: bool = False
+    active_offer_expires_at: Optional[datetime] = None
+
+    def has_active_offer(self, now: datetime = None) -> bool:
+        """User has an active offer that hasn't expired"""
+        if self.active_offer_expires_at is None:
+            return False
+        return self.active_offer_expires_at >= (now or datetime.now(timezone.utc))
+
+
+def is_admin(telegram_id: int) -> bool:
+    """Check if Telegram user is admin"""
+    return telegram_id in ADMIN_USER_IDS
+
+
+class EntitlementCache:
+    """LRU cache of user entitlements with TTL"""
+
+    def __init__(self, max_size: int = ENTITLEMENT_CACHE_SIZE, ttl: float = ENTITLEMENT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        # telegram_id -> (loaded at (monotonic), entitlements)
+        self._entries: OrderedDict[int, tuple[float, Entitlements]] = OrderedDict()
+        # Incremented by every invalidation
+        self._generation = 0
+
+    async def get(self, telegram_id: int) -> Entitlements:
+        """
+        Get user entitlements, loading them from the database if not cached or expired.
+
+        Raises:
+            Exception: Database error (only when entitlements are not cached)
+        """
+        entry = self._entries.get(telegram_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(telegram_id)
+            return entry[1]
+
+        generation = self._generation
+        db = get_async_db_session()
+        try:
+            row = await get_user_entitlements(db, telegram_id)
+        finally:
+            await db.close()
+
+        entitlements = Entitlements(
+            has_paid=bool(row.has_paid),
+            active_offer_expires_at=row.active_offer_expires_at
+        ) if row is not None else Entitlements()
+        if self._generation != generation:
+            return entitlements
+
+        self._entries[telegram_id] = (time.monotonic(), entitlements)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entitlements
+
+    def invalidate(self, telegram_id: int):
+        """Forget cached entitlements of user (call after changing payments or offers)"""
+        self._entries.pop(telegram_id, None)
+        self._generation += 1
+
+
+# Global cache (lazy initialization)
+_cache: Optional[EntitlementCache] = None
+
+
+def get_entitlement_cache() -> EntitlementCache:
+    """Get shared entitlement cache"""
+    global _cache
+    if _cache is None:
+        _cache = EntitlementCache()
+    return _cache
+
+
+async def get_entitlements(telegram_id: int) -> Entitlements:
+    """Get cached entitlements of Telegram user (see EntitlementCache.get)"""
+    return await get_entitlement_cache().get(telegram_id)
+
+
+async def user_has_paid(telegram_id: int) -> bool:
+    """Check if Telegram user has paid, False if entitlements can't be loaded"""
+    try:
+        return (await get_entitlements(telegram_id)).has_paid
+    except Exception as e:
+        logger.warning(f"Could not load entitlements for telegram_id={telegram_id}: {e}")
+        return False
+
+
+def invalidate_entitlements(telegram_id: int):
+    """Forget cached entitlements of Telegram user"""
+    get_entitlement_cache().invalidate(telegram_id)
@@ -0,0 +1,188 @@
+"""
+Media registry: local files are uploaded to Telegram once.
+
+The file_id Telegram returns for the first upload is stored in the
+media_assets table by SHA-256 of the file content, and every later send
+uses that file_id. Changing the file (new content, new hash) makes the
+next send upload it again.
+
+File hashes are cached by (path, size, mtime) so the file is only read
+again after it changed on disk.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Optional
+from telegram import Bot, Message
+from telegram.error import BadRequest
+from db.session import get_async_db_session
+from db.repository import get_media_asset, save_media_asset
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Media type -> Bot method used to send it
+MEDIA_SEND_METHODS = {
+    "video": "send_video",
+    "photo": "send_photo",
+    "document": "send_document",
+    "animation": "send_animation",
+    "audio": "send_audio",
+    "voice": "send_voice",
+}
+
+# BadRequest messages (lowercased) meaning a cached file_id can't be used anymore.
+# Other errors (chat not found, bad caption) would fail the upload as well.
+INVALID_FILE_ID_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "wrong file_id",
+    "file reference",
+    "wrong type of the web page content",
+)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_invalid_file_id_error(error: BadRequest) -> bool:
+    message = error.message.lower()
+    return any(text in message for text in INVALID_FILE_ID_ERRORS)
+
+
+def _get_sent_media(message: Message, media_type: str):
+    media = getattr(message, media_type)
+    if media_type == "photo":
+        # Photos come in several sizes, the last one is the original
+        return media[-1]
+    return media
+
+
+class MediaRegistry:
+    """file_id cache of local media files, persisted in media_assets"""
+
+    def __init__(self):
+        # path -> ((size, mtime), content hash)
+        self._hashes: dict[str, tuple[tuple[int, float], str]] = {}
+        # (content hash, media type) -> file_id
+        self._file_ids: dict[tuple[str, str], str] = {}
+        # (content hash, media type) -> lock held while the file is uploaded
+        self._upload_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+    async def get_content_hash(self, path: str) -> str:
+        """Get SHA-256 of file, reading the file only if it changed since the last call"""
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        content_hash = await asyncio.to_thread(_hash_file, path)
+        self._hashes[path] = (signature, content_hash)
+        return content_hash
+
+    async def _get_file_id(self, key: tuple[str, str]) -> Optional[str]:
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            return file_id
+        try:
+            db = get_async_db_session()
+            try:
+                asset = await get_media_asset(db, *key)
+            finally:
+                await db.close()
+        except Exception as e:
+            logger.warning(f"Could not load media asset {key}: {e}")
+            return None
+        if asset is not None:
+            self._file_ids[key] = asset.file_id
+            return asset.file_id
+        return None
+
+    async def _save_file_id(self, key: tuple[str, str], media, file_name: str):
+        self._file_ids[key] = media.file_id
+        try:
+            db = get_async_db_session()
+            try:
+                await save_media_asset(
+                    db,
+                    content_hash=key[0],
+                    media_type=key[1],
+                    file_id=media.file_id,
+                    file_unique_id=media.file_unique_id,
+                    file_name=file_name
+                )
+            finally:
+                await db.close()
+        except Exception as e:
+            # file_id stays cached in memory until restart
+            logger.warning(f"Could not save media asset {key}: {e}")
+
+    async def send_media(self, bot: Bot, chat_id: int, path: str, media_type: str = "video", **kwargs) -> Message:
+        """
+        Send local media file, uploading it only if it wasn't uploaded before.
+
+        Args:
+            bot: Bot instance
+            chat_id: Chat to send the media to
+            path: Local file path
+            media_type: Key of MEDIA_SEND_METHODS
+            **kwargs: Extra arguments of the send method (caption, reply_markup, ...)
+
+        Returns:
+            Sent message
+        """
+        send = getattr(bot, MEDIA_SEND_METHODS[media_type])
+        key = (await self.get_content_hash(path), media_type)
+
+        file_id = await self._get_file_id(key)
+        if file_id is not None:
+            try:
+                return await send(chat_id, file_id, **kwargs)
+            except BadRequest as e:
+                if not _is_invalid_file_id_error(e):
+                    raise
+                # file_id is no longer valid (e.g. bot token changed) - upload again
+                logger.warning(f"Cached file_id of {path} was rejected: {e}. Uploading file again.")
+                self._file_ids.pop(key, None)
+
+        # One upload per file even if many users request it at once
+        lock = self._upload_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                file_id = self._file_ids.get(key)
+                if file_id is not None:
+                    return await send(chat_id, file_id, **kwargs)
+
+                with open(path, "rb") as file:
+                    message = await send(chat_id, file, **kwargs)
+                await self._save_file_id(key, _get_sent_media(message, media_type), os.path.basename(path))
+                logger.info(f"Uploaded {path} as {media_type}, file_id cached")
+                return message
+        finally:
+            # Waiting senders keep their reference to lock; later ones find file_id cached
+            if self._upload_locks.get(key) is lock:
+                del self._upload_locks[key]
+
+
+# Global registry (lazy initialization)
+_registry: Optional[MediaRegistry] = None
+
+
+def get_media_registry() -> MediaRegistry:
+    """Get shared media registry"""
+    global _registry
+    if _registry is None:
+        _registry = MediaRegistry()
+    return _registry
+
+
+async def send_media(bot: Bot, chat_id: int, path: str, media_type: str = "video", **kwargs) -> Message:
+    """Send local media file by cached file_id (see MediaRegistry.send_media)"""
+    return await get_media_registry().send_media(bot, chat_id, path, media_type, **kwargs)
@@ -0,0 +1,233 @@
+"""
+In-memory index of promocodes.
+
+Promocodes live in the promocodes table and are looked up from a dict
+keyed by code, so validating a promocode doesn't touch the database.
+The index is reloaded when it is older than PROMOCODE_REFRESH_SECONDS
+or as soon as the promocodes_changed trigger sends a NOTIFY (see
+db/migrate_add_promocodes.py), so codes can be added, changed or
+disabled in the database without a redeploy. The listener holds its own
+connection, opened outside the async engine pool, so it doesn't take a
+pooled connection from handlers and jobs.
+
+Until the first load succeeds lookups raise PromocodesUnavailableError
+(an empty index would reject every code as nonexistent), and the load is
+retried after LOAD_RETRY_SECONDS.
+
+Redemption limits are checked in the database at pre-checkout
+(can_redeem_promocode) and enforced when the payment is recorded (see
+db.repository.record_payment); the index only has the redemption count
+as of its last reload. If the pre-checkout check can't reach the
+database in REDEEM_CHECK_TIMEOUT_SECONDS the payment is approved and the
+limits are left to record_payment.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+from db.session import connect_async_unpooled, get_async_db_session
+from db.repository import get_promocodes, can_redeem_promocode as can_redeem_promocode_in_db
+from db.migrate_add_promocodes import PROMOCODES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+PROMOCODE_REFRESH_SECONDS = 60
+LOAD_RETRY_SECONDS = 5  # Delay before loading again while promocodes were never loaded
+LISTEN_RETRY_SECONDS = 5
+# Telegram waits 10 seconds for the pre-checkout answer
+REDEEM_CHECK_TIMEOUT_SECONDS = 3
+
+
+class PromocodesUnavailableError(RuntimeError):
+    """Promocodes couldn't be loaded from the database yet"""
+
+
+@dataclass(frozen=True)
+class PromocodeInfo:
+    """Promocode as loaded from the promocodes table"""
+    id: int
+    code: str
+    discount_value: str
+    is_active: bool = True
+    requires_active_offer: bool = False
+    valid_from: Optional[datetime] = None
+    valid_until: Optional[datetime] = None
+    max_redemptions: Optional[int] = None
+    max_redemptions_per_user: Optional[int] = None
+    redemptions_count: int = 0
+
+    def is_available(self, now: datetime = None) -> bool:
+        """Promocode is active, within its validity window and not fully redeemed"""
+        now = now or datetime.now(timezone.utc)
+        if not self.is_active:
+            return False
+        if self.valid_from is not None and now < self.valid_from:
+            return False
+        if self.valid_until is not None and now > self.valid_until:
+            return False
+        if self.max_redemptions is not None and self.redemptions_count >= self.max_redemptions:
+            return False
+        return True
+
+
+class PromocodeIndex:
+    """Promocodes by code, reloaded on TTL or change notification"""
+
+    def __init__(self, refresh_interval: float = PROMOCODE_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._codes: dict[str, PromocodeInfo] = {}
+        self._loaded = False  # _codes was loaded at least once
+        self._reload_at: Optional[float] = None  # monotonic, None - needs reload
+        self._lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get(self, code: str) -> Optional[PromocodeInfo]:
+        """
+        Get promocode by code (case-insensitive), None if it doesn't exist.
+
+        Raises:
+            PromocodesUnavailableError: Promocodes were never loaded
+        """
+        if self._reload_at is None or time.monotonic() >= self._reload_at:
+            await self.refresh()
+        if not self._loaded:
+            raise PromocodesUnavailableError("Promocodes are not loaded, database is not available")
+        return self._codes.get(code.strip().upper())
+
+    async def refresh(self):
+        """Reload promocodes from the database (concurrent callers share one reload)"""
+        reload_at = self._reload_at
+        async with self._lock:
+            if self._reload_at != reload_at:
+                return
+
+            started_at = time.monotonic()
+            try:
+                db = get_async_db_session()
+                try:
+                    promocodes = await get_promocodes(db)
+                finally:
+                    await db.close()
+            except Exception as e:
+                # Keep serving the previous index, retry after the next interval
+                logger.warning(f"Could not load promocodes: {e}")
+                self._reload_at = started_at + (self.refresh_interval if self._loaded else LOAD_RETRY_SECONDS)
+                return
+
+            self._codes = {
+                promocode.code.upper(): PromocodeInfo(
+                    id=promocode.id,
+                    code=promocode.code.upper(),
+                    discount_value=promocode.discount_value,
+                    is_active=promocode.is_active,
+                    requires_active_offer=promocode.requires_active_offer,
+                    valid_from=promocode.valid_from,
+                    valid_until=promocode.valid_until,
+                    max_redemptions=promocode.max_redemptions,
+                    max_redemptions_per_user=promocode.max_redemptions_per_user,
+                    redemptions_count=promocode.redemptions_count
+                )
+                for promocode in promocodes
+            }
+            self._loaded = True
+            self._reload_at = started_at + self.refresh_interval
+            logger.info(f"Loaded {len(self._codes)} promocodes")
+
+    def invalidate(self):
+        """Reload promocodes on next lookup"""
+        self._reload_at = None
+
+    async def can_redeem(self, code: str, telegram_id: int) -> bool:
+        """
+        Check that user can redeem promocode (limits are read from the database).
+
+        Returns:
+            False if promocode doesn't exist, isn't available or a redemption limit is reached,
+            True if it can be redeemed or the database is not available
+            (the code was validated when the user entered it, record_payment enforces limits)
+        """
+        try:
+            promocode = await self.get(code)
+        except PromocodesUnavailableError as e:
+            logger.warning(f"Could not check promocode {code} for user_id={telegram_id}: {e}")
+            return True
+        if promocode is None or not promocode.is_available():
+            return False
+
+        async def check_limits() -> bool:
+            db = get_async_db_session()
+            try:
+                return await can_redeem_promocode_in_db(db, promocode.id, telegram_id)
+            finally:
+                await db.close()
+
+        try:
+            return await asyncio.wait_for(check_limits(), REDEEM_CHECK_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(
+                f"Could not check redemption limits of promocode {code} for user_id={telegram_id}: "
+                f"{e!r}. Limits are checked when the payment is recorded"
+            )
+            return True
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await connect_async_unpooled() as connection:
+                    await connection.execute(f"LISTEN {PROMOCODES_CHANNEL}")
+                    # Changes made while not listening were missed
+                    self.invalidate()
+                    async for _ in connection.notifies():
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Promocode change listener failed: {e}. Retrying in {LISTEN_RETRY_SECONDS}s")
+                await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    def start_listener(self):
+        """Reload promocodes as soon as they change in the database (LISTEN/NOTIFY)"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop_listener(self):
+        """Stop change listener"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+# Global index (lazy initialization)
+_index: Optional[PromocodeIndex] = None
+
+
+def get_promocode_index() -> PromocodeIndex:
+    """Get shared promocode index"""
+    global _index
+    if _index is None:
+        _index = PromocodeIndex()
+    return _index
+
+
+async def get_promocode(code: str) -> Optional[PromocodeInfo]:
+    """Get promocode by code (see PromocodeIndex.get)"""
+    return await get_promocode_index().get(code)
+
+
+async def can_redeem_promocode(code: str, telegram_id: int) -> bool:
+    """Check that user can redeem promocode (see PromocodeIndex.can_redeem)"""
+    return await get_promocode_index().can_redeem(code, telegram_id)
+
+
+async def shutdown_promocode_index():
+    """Stop shared promocode index listener (call on application shutdown)"""
+    global _index
+    if _index is not None:
+        await _index.stop_listener()
+        _index = None
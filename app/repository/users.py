@@ -0,0 +1,202 @@
+"""
+Write-behind user cache.
+
+Hot handlers (/start, lesson click, promocode, pay click) only need the
+user's database id, but used to run SELECT + UPDATE + COMMIT on every call.
+Users are now cached by telegram_id together with a hash of their profile
+(nickname, names, premium flag):
+- known user, unchanged profile: no database access at all
+- known user, changed profile: id is returned immediately, the update is
+  queued and written by the next batched upsert
+- unknown user: queued, the caller waits for the batched upsert to return its id
+
+Queued profiles are flushed every FLUSH_INTERVAL_SECONDS with a single
+INSERT ... ON CONFLICT (telegram_id) DO UPDATE.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from telegram import User as TelegramUser
+from db.models import User
+from db.session import get_async_db_session
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = 10000  # Least recently used users are evicted above this size
+FLUSH_INTERVAL_SECONDS = 0.1
+MAX_FLUSH_BATCH_SIZE = 500
+
+
+def get_user_profile(user: TelegramUser) -> dict:
+    """Get users table values from Telegram user"""
+    return {
+        "telegram_id": user.id,
+        "nickname": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        # Ensure is_premium is always a boolean, never None
+        "is_premium_tg_user": bool(getattr(user, "is_premium", False) or False),
+    }
+
+
+def _profile_hash(profile: dict) -> int:
+    return hash((profile["nickname"], profile["first_name"], profile["last_name"], profile["is_premium_tg_user"]))
+
+
+class UserCache:
+    """LRU cache of user ids with batched write-behind of profile changes"""
+
+    def __init__(
+        self,
+        max_size: int = USER_CACHE_SIZE,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_batch_size: int = MAX_FLUSH_BATCH_SIZE
+    ):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        # telegram_id -> (user id, profile hash)
+        self._users: OrderedDict[int, tuple[int, Optional[int]]] = OrderedDict()
+        # telegram_id -> profile waiting to be written
+        self._pending: dict[int, dict] = {}
+        # telegram_id -> futures of callers waiting for the user id
+        self._waiters: dict[int, list[asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def get_user_id(self, user: TelegramUser) -> int:
+        """
+        Get database id of Telegram user, creating or updating the user if needed.
+
+        Raises:
+            Exception: Database error of the upsert (only when the user is not cached)
+        """
+        profile = get_user_profile(user)
+        profile_hash = _profile_hash(profile)
+        cached = self._users.get(user.id)
+
+        if cached is not None:
+            self._users.move_to_end(user.id)
+            user_id, cached_hash = cached
+            if cached_hash != profile_hash:
+                self._users[user.id] = (user_id, profile_hash)
+                self._enqueue(profile)
+            return user_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user.id, []).append(future)
+        self._enqueue(profile)
+        return await future
+
+    def _enqueue(self, profile: dict):
+        self._pending[profile["telegram_id"]] = profile
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="user_cache_flush")
+
+    def _remember(self, telegram_id: int, user_id: int, profile_hash: Optional[int]):
+        self._users[telegram_id] = (user_id, profile_hash)
+        self._users.move_to_end(telegram_id)
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    async def _flush_loop(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write queued profiles with one upsert"""
+        telegram_ids = list(self._pending)[:self.max_batch_size]
+        if not telegram_ids:
+            return
+        profiles = [self._pending.pop(telegram_id) for telegram_id in telegram_ids]
+        waiters = {telegram_id: self._waiters.pop(telegram_id, []) for telegram_id in telegram_ids}
+
+        try:
+            rows = await self._upsert(profiles)
+        except Exception as e:
+            logger.error(f"Failed to write {len(profiles)} users: {e}", exc_info=True)
+            for telegram_id in telegram_ids:
+                # Forget profile hash so the next call queues the write again
+                cached = self._users.get(telegram_id)
+                if cached is not None:
+                    self._users[telegram_id] = (cached[0], None)
+                for future in waiters[telegram_id]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        created = 0
+        profile_hashes = {profile["telegram_id"]: _profile_hash(profile) for profile in profiles}
+        for row in rows:
+            self._remember(row.telegram_id, row.id, profile_hashes[row.telegram_id])
+            created += row.inserted
+            for future in waiters[row.telegram_id]:
+                if not future.done():
+                    future.set_result(row.id)
+
+        if created:
+            logger.info(f"Created {created} new users")
+
+    async def _upsert(self, profiles: list[dict]) -> list:
+        statement = insert(User).values(profiles)
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                # Names are only updated when Telegram sent them
+                "nickname": func.coalesce(statement.excluded.nickname, User.nickname),
+                "first_name": func.coalesce(statement.excluded.first_name, User.first_name),
+                "last_name": func.coalesce(statement.excluded.last_name, User.last_name),
+                "is_premium_tg_user": statement.excluded.is_premium_tg_user,
+                "updated_at": func.now(),
+            }
+        ).returning(
+            User.id,
+            User.telegram_id,
+            # xmax is 0 for rows inserted (not updated) by this statement
+            literal_column("(xmax = 0)").label("inserted")
+        )
+
+        db = get_async_db_session()
+        try:
+            result = await db.execute(statement)
+            rows = result.all()
+            await db.commit()
+            return rows
+        finally:
+            await db.close()
+
+    async def shutdown(self):
+        """Write all queued profiles (call on application shutdown)"""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        while self._pending:
+            await self.flush()
+
+
+# Global cache (lazy initialization)
+_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """Get shared user cache"""
+    global _cache
+    if _cache is None:
+        _cache = UserCache()
+    return _cache
+
+
+async def get_user_id(user: TelegramUser) -> int:
+    """Get database id of Telegram user (see UserCache.get_user_id)"""
+    return await get_user_cache().get_user_id(user)
+
+
+async def shutdown_user_cache():
+    """Flush shared user cache (call on application shutdown)"""
+    global _cache
+    if _cache is not None:
+        await _cache.shutdown()
+        _cache = None
@@ -0,0 +1,280 @@
+"""
+Broadcast engine for reminder sends.
+
+Sends are queued and executed by a bounded pool of workers instead of
+being awaited one by one. Before every send a worker takes a token from
+the per-chat bucket (Telegram allows ~1 message per second to the same
+chat) and from the global bucket (~30 messages per second per bot), so
+large batches go out as fast as Telegram allows without hitting flood limits.
+A send whose chat bucket is empty is put back into the queue when the
+chat's next token is due, so the worker moves on to other chats instead
+of waiting for it.
+
+Sends that fail with transient errors are requeued according to the policy
+in scheduler/retry.py; a RetryAfter also pauses the buckets for the
+requested time so the bot stops hitting the API while flood-limited.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from telegram.error import RetryAfter
+from scheduler.retry import (
+    MAX_SEND_ATTEMPTS,
+    is_retryable,
+    get_retry_delay,
+    get_retry_after_seconds,
+    dead_letter
+)
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API limits
+GLOBAL_MESSAGES_PER_SECOND = 30
+PER_CHAT_MESSAGES_PER_SECOND = 1
+
+# Worker pool configuration
+# 8 workers are enough to saturate 30 msg/s with ~250ms API latency
+WORKER_COUNT = 8
+QUEUE_MAX_SIZE = 1000  # submit() waits when queue is full (backpressure)
+
+# Per-chat buckets are pruned when their number exceeds this value
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Async token bucket rate limiter"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def is_idle(self) -> bool:
+        """Bucket is full - nobody has used it recently"""
+        self._refill()
+        return (
+            self._tokens >= self.capacity
+            and not self._lock.locked()
+            and self._paused_until <= time.monotonic()
+        )
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given time"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available, without waiting.
+
+        Returns:
+            0 if the token was taken, otherwise seconds until one is available
+        """
+        paused_for = self._paused_until - time.monotonic()
+        if paused_for > 0:
+            return paused_for
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                paused_for = self._paused_until - time.monotonic()
+                if paused_for > 0:
+                    await asyncio.sleep(paused_for)
+                    continue
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class SendJob:
+    """Queued send with its retry state"""
+    chat_id: int
+    send_func: Callable
+    args: tuple
+    kwargs: dict
+    future: asyncio.Future
+    attempts: int = 0
+    label: str = field(init=False)
+
+    def __post_init__(self):
+        self.label = getattr(self.send_func, "__name__", repr(self.send_func))
+
+
+class BroadcastEngine:
+    """Bounded worker pool that executes rate-limited sends"""
+
+    def __init__(
+        self,
+        workers: int = WORKER_COUNT,
+        global_rate: float = GLOBAL_MESSAGES_PER_SECOND,
+        per_chat_rate: float = PER_CHAT_MESSAGES_PER_SECOND,
+        queue_size: int = QUEUE_MAX_SIZE
+    ):
+        self.workers = workers
+        self.per_chat_rate = per_chat_rate
+        self._global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._requeue_tasks: set[asyncio.Task] = set()
+
+    def _ensure_started(self):
+        """Start workers lazily inside the running event loop"""
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"broadcast_worker_{index}")
+            for index in range(self.workers)
+        ]
+        logger.info(f"Broadcast engine started with {self.workers} workers")
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._prune_chat_buckets()
+            bucket = TokenBucket(self.per_chat_rate, capacity=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self):
+        idle_chat_ids = [chat_id for chat_id, bucket in self._chat_buckets.items() if bucket.is_idle()]
+        for chat_id in idle_chat_ids:
+            del self._chat_buckets[chat_id]
+
+    async def submit(self, chat_id: int, send_func: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Queue a send for chat_id.
+
+        Args:
+            chat_id: Telegram chat ID the send is addressed to (used for per-chat limit)
+            send_func: Async function performing the send
+            *args: Positional arguments to pass to send_func
+            **kwargs: Keyword arguments to pass to send_func
+
+        Returns:
+            Future resolved with send_func result (False if send_func raised
+            a permanent error or ran out of retry attempts)
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(SendJob(chat_id, send_func, args, kwargs, future))
+        return future
+
+    async def send(self, chat_id: int, send_func: Callable, *args, **kwargs):
+        """Queue a send and wait for its result"""
+        future = await self.submit(chat_id, send_func, *args, **kwargs)
+        return await future
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                wait = self._chat_bucket(job.chat_id).try_acquire()
+                if wait > 0:
+                    self._requeue(job, wait)
+                    continue
+                await self._global_bucket.acquire()
+                job.attempts += 1
+                result = await job.send_func(*job.args, **job.kwargs)
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                if is_retryable(e):
+                    await self._retry(job, e)
+                else:
+                    logger.error(f"Unexpected error in broadcast send to chat_id={job.chat_id}: {e}", exc_info=True)
+                    if not job.future.done():
+                        job.future.set_result(False)
+            finally:
+                self._queue.task_done()
+
+    async def _retry(self, job: SendJob, error: Exception):
+        """Requeue job after a delay, or dead-letter it when attempts are exhausted"""
+        if isinstance(error, RetryAfter):
+            # Flood limit: stop sending to this chat and globally until it's lifted
+            retry_after = get_retry_after_seconds(error)
+            self._chat_bucket(job.chat_id).pause(retry_after)
+            self._global_bucket.pause(retry_after)
+
+        if job.attempts >= MAX_SEND_ATTEMPTS:
+            await dead_letter(job.chat_id, job.label, job.attempts, error)
+            if not job.future.done():
+                job.future.set_result(False)
+            return
+
+        delay = get_retry_delay(error, job.attempts)
+        logger.info(
+            f"Requeueing {job.label} to chat_id={job.chat_id} in {delay:.1f}s "
+            f"(attempt {job.attempts}/{MAX_SEND_ATTEMPTS}, {type(error).__name__})"
+        )
+        self._requeue(job, delay)
+
+    def _requeue(self, job: SendJob, delay: float):
+        task = asyncio.create_task(self._requeue_later(job, delay))
+        self._requeue_tasks.add(task)
+        task.add_done_callback(self._requeue_tasks.discard)
+
+    async def _requeue_later(self, job: SendJob, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            await self._queue.put(job)
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.cancel()
+            raise
+
+    async def shutdown(self):
+        """Stop workers (pending sends, scheduled retries and deferred sends are cancelled)"""
+        tasks = self._worker_tasks + list(self._requeue_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._requeue_tasks = set()
+        self._queue = None
+        logger.info("Broadcast engine stopped")
+
+
+# Global engine (lazy initialization)
+_engine: Optional[BroadcastEngine] = None
+
+
+def get_broadcast_engine() -> BroadcastEngine:
+    """Get shared broadcast engine"""
+    global _engine
+    if _engine is None:
+        _engine = BroadcastEngine()
+    return _engine
+
+
+async def shutdown_broadcast_engine():
+    """Stop shared broadcast engine (call on application shutdown)"""
+    global _engine
+    if _engine is not None:
+        await _engine.shutdown()
+        _engine = None
@@ -1,11 +1,13 @@
 """
-JobQueue-based reminder system that doesn't depend on database.
+Fallback reminder system for users without an offer.
 
-This module schedules reminders directly using JobQueue after target actions.
+This module schedules reminders after target actions. Reminders are persisted
+in scheduled_reminders table (sent by scheduled reminder poller, survive restarts);
+if the database is unavailable they are scheduled in memory using JobQueue.
 Reminders can be cancelled if target action-2 is performed.
 """
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import ContextTypes, Job
 from modules.lead_magnet.config import get_lead_magnet_config
 from shared.utils.get_lead_reminder_keyboards import (
     get_watch_lesson_keyboard,
@@ -13,43 +15,90 @@ from shared.utils.get_lead_reminder_keyboards import (
     get_third_reminder_keyboard
 )
 from shared.utils.telegram_error_handler import send_message_with_error_handling
+from scheduler.broadcast import get_broadcast_engine
+from db.session import get_async_db_session
+from db.repository import schedule_reminders, cancel_scheduled_reminders
 import logging
 from datetime import timedelta
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-# Job names for identification and cancellation
-# Note: These are for fallback system (without DB)
-# New DB-based system uses different job names in lead_magnet modules
+# Job names for identification (used only when DB is unavailable, cancelled via ReminderJobRegistry)
 JOB_NAME_FIRST_REMINDER = "first_reminder_fallback_{user_id}"
 JOB_NAME_SECOND_REMINDER = "second_reminder_fallback_{user_id}"
 JOB_NAME_THIRD_REMINDER = "third_reminder_fallback_{user_id}"
 
+# Scheduled reminder kinds for fallback reminders (no offer attached)
+REMINDER_KIND_FIRST_FALLBACK = "first_fallback"
+REMINDER_KIND_SECOND_FALLBACK = "second_fallback"
+REMINDER_KIND_THIRD_FALLBACK = "third_fallback"
 
-async def send_first_reminder_callback_fallback(context: ContextTypes.DEFAULT_TYPE):
-    """Callback for first reminder (fallback, no DB) - send watch lesson reminder"""
-    user_id = context.job.data.get('user_id')
-    if not user_id:
-        logger.error("First reminder callback: user_id not found in job data")
-        return
+
+# Built once at import: lesson link comes from static config
+FIRST_FALLBACK_REMINDER_TEXT = (
+    "Коллеги, не забывайте посмотреть урок \"ТОП 3 ошибки в продажах бьюти мастера\"\n\n"
+    "Что разобрали?\n\n"
+    "▪️ почему клиенты не записываются? ТОП ошибок, о которых никто не говорит\n\n"
+    "▪️ реальные примеры из практики для любой бьюти-ниши\n\n"
+    "▪️ как привести к покупке через 5 минут после подписки\n\n"
+    "🔥рекомендации, которые можно внедрить сразу в ваш инстаграм\n\n"
+    "А также рассказала про свой интенсив \"Продажи бьюти-мастера\" и бонусы для участников интенсива❤️\n\n"
+    f"Ссылка на урок: {get_lead_magnet_config()['youtube_url']}"
+)
+
+SECOND_FALLBACK_REMINDER_TEXT = (
+    "❓ <b>ТОП-4 вопроса об интенсиве \"Продажи бьюти-мастера\"</b>\n"
+    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
     
-    config = get_lead_magnet_config()
-    text = (
-        "Коллеги, не забывайте посмотреть урок \"ТОП 3 ошибки в продажах бьюти мастера\"\n\n"
-        "Что разобрали?\n\n"
-        "▪️ почему клиенты не записываются? ТОП ошибок, о которых никто не говорит\n\n"
-        "▪️ реальные примеры из практики для любой бьюти-ниши\n\n"
-        "▪️ как привести к покупке через 5 минут после подписки\n\n"
-        "🔥рекомендации, которые можно внедрить сразу в ваш инстаграм\n\n"
-        "А также рассказала про свой интенсив \"Продажи бьюти-мастера\" и бонусы для участников интенсива❤️\n\n"
-        f"Ссылка на урок: {config['youtube_url']}"
-    )
+    "🔹 <b>Для какой бьюти ниши подойдет интенсив?</b>\n"
+    "   Интенсив подходит для любой ниши: брови, перманент, массаж, ламинирование ресниц, "
+    "косметология, подология, маникюр, кератин - примеры и инструменты в уроках можно "
+    "адаптировать под любую нишу.\n\n"
+    
+    "🔹 <b>Смогу ли я проходить интенсив, если у меня плотный график?</b>\n"
+    "   Да, уроки интенсива в записи, можно просматривать их и выполнять рекомендации в "
+    "любое удобное для вас время.\n\n"
+    
+    "🔹 <b>Хочу начать обучать, поможет ли мне интенсив?</b>\n"
+    "   Да, уроки в интенсиве построены на базовых знаниях маркетинга и продаж, поэтому "
+    "вы с легкостью сможете их адаптировать для вашего будущего курса.\n\n"
+    
+    "🔹 <b>Смогу ли я задать вопросы по своему инстаграм автору интенсива?</b>\n"
+    "   Да, после просмотра интенсива вы сможете задать вопросы в отдельный чат, Анна "
+    "дает обратную связь в чате и также проводит прямые эфиры с разбором популярных вопросов.\n\n"
+    
+    "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    "💫 <i>Почему бы не начать Новый год по новому? Особенно с поддержкой и рекомендациями от эксперта.</i>\n\n"
+    "🔥 <b>Смотри урок, там есть промокод на участие</b>"
+)
+
+THIRD_FALLBACK_REMINDER_TEXT = (
+    "🔔 <b>Важно!</b>\n"
+    "Скоро спецпредложение пропадет\n\n"
+    
+    "Успей:\n\n"
+    
+    "▪️ Забрать место на курсе с выгодой (без промокода цена будет выше)\n\n"
+    
+    "▪️ Получить бонусы:\n\n"
+    
+    "- урок «Нейросети для бьюти мастера» - как создать контент без моделей, с 0 и оживить фото "
+    "(практический урок от приглашенного эксперта Александры Легович)\n\n"
+    
+    "- готовый контент-план с идеями, который можно адаптировать под любой месяц и нишу\n\n"
+)
+
+
+async def send_first_fallback_reminder(bot, user_id: int):
+    """Send first fallback reminder - watch lesson reminder"""
+    text = FIRST_FALLBACK_REMINDER_TEXT
     
     keyboard = get_watch_lesson_keyboard()
-    await send_message_with_error_handling(
-        context.bot.send_message,
+    return await send_message_with_error_handling(
+        bot.send_message,
         user_id,
-        "first lead reminder (JobQueue)",
+        "first lead reminder (fallback)",
         message_text=text,
         chat_id=user_id,
         text=text,
@@ -57,44 +106,15 @@ async def send_first_reminder_callback_fallback(context: ContextTypes.DEFAULT_TY
     )
 
 
-async def send_second_reminder_callback_fallback(context: ContextTypes.DEFAULT_TYPE):
-    """Callback for second reminder (fallback, no DB) - send special price reminder"""
-    user_id = context.job.data.get('user_id')
-    if not user_id:
-        logger.error("Second reminder callback: user_id not found in job data")
-        return
-    
-    text = (
-        "❓ <b>ТОП-4 вопроса об интенсиве \"Продажи бьюти-мастера\"</b>\n"
-        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-        
-        "🔹 <b>Для какой бьюти ниши подойдет интенсив?</b>\n"
-        "   Интенсив подходит для любой ниши: брови, перманент, массаж, ламинирование ресниц, "
-        "косметология, подология, маникюр, кератин - примеры и инструменты в уроках можно "
-        "адаптировать под любую нишу.\n\n"
-        
-        "🔹 <b>Смогу ли я проходить интенсив, если у меня плотный график?</b>\n"
-        "   Да, уроки интенсива в записи, можно просматривать их и выполнять рекомендации в "
-        "любое удобное для вас время.\n\n"
-        
-        "🔹 <b>Хочу начать обучать, поможет ли мне интенсив?</b>\n"
-        "   Да, уроки в интенсиве построены на базовых знаниях маркетинга и продаж, поэтому "
-        "вы с легкостью сможете их адаптировать для вашего будущего курса.\n\n"
-        
-        "🔹 <b>Смогу ли я задать вопросы по своему инстаграм автору интенсива?</b>\n"
-        "   Да, после просмотра интенсива вы сможете задать вопросы в отдельный чат, Анна "
-        "дает обратную связь в чате и также проводит прямые эфиры с разбором популярных вопросов.\n\n"
-        
-        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-        "💫 <i>Почему бы не начать Новый год по новому? Особенно с поддержкой и рекомендациями от эксперта.</i>\n\n"
-        "🔥 <b>Смотри урок, там есть промокод на участие</b>"
-    )
+async def send_second_fallback_reminder(bot, user_id: int):
+    """Send second fallback reminder - FAQ about intensive"""
+    text = SECOND_FALLBACK_REMINDER_TEXT
     
     keyboard = get_second_reminder_keyboard()
-    await send_message_with_error_handling(
-        context.bot.send_message,
+    return await send_message_with_error_handling(
+        bot.send_message,
         user_id,
-        "second lead reminder (JobQueue)",
+        "second lead reminder (fallback)",
         message_text=text,
         chat_id=user_id,
         text=text,
@@ -103,34 +123,15 @@ async def send_second_reminder_callback_fallback(context: ContextTypes.DEFAULT_T
     )
 
 
-async def send_third_reminder_callback_fallback(context: ContextTypes.DEFAULT_TYPE):
-    """Callback for third reminder (fallback, no DB) - send final push reminder"""
-    user_id = context.job.data.get('user_id')
-    if not user_id:
-        logger.error("Third reminder callback: user_id not found in job data")
-        return
-    
-    text = (
-        "🔔 <b>Важно!</b>\n"
-        "Скоро спецпредложение пропадет\n\n"
-        
-        "Успей:\n\n"
-        
-        "▪️ Забрать место на курсе с выгодой (без промокода цена будет выше)\n\n"
-        
-        "▪️ Получить бонусы:\n\n"
-        
-        "- урок «Нейросети для бьюти мастера» - как создать контент без моделей, с 0 и оживить фото "
-        "(практический урок от приглашенного эксперта Александры Легович)\n\n"
-        
-        "- готовый контент-план с идеями, который можно адаптировать под любой месяц и нишу\n\n"
-    )
+async def send_third_fallback_reminder(bot, user_id: int):
+    """Send third fallback reminder - final push reminder"""
+    text = THIRD_FALLBACK_REMINDER_TEXT
     
     keyboard = get_third_reminder_keyboard()
-    await send_message_with_error_handling(
-        context.bot.send_message,
+    return await send_message_with_error_handling(
+        bot.send_message,
         user_id,
-        "third lead reminder (JobQueue)",
+        "third lead reminder (fallback)",
         message_text=text,
         chat_id=user_id,
         text=text,
@@ -139,18 +140,129 @@ async def send_third_reminder_callback_fallback(context: ContextTypes.DEFAULT_TY
     )
 
 
-def schedule_lead_reminders(context: ContextTypes.DEFAULT_TYPE, user_id: int, use_minutes: bool = False):
+class ReminderJobRegistry:
+    """
+    JobQueue reminder jobs by user, so cancelling user's reminders is O(1)
+    instead of looking jobs up by name among all scheduled jobs.
+    """
+
+    def __init__(self):
+        self._jobs: dict[int, list[Job]] = {}
+
+    def add(self, user_id: int, job: Job):
+        """Register scheduled job of user"""
+        self._jobs.setdefault(user_id, []).append(job)
+
+    def discard(self, user_id: int, job: Job):
+        """Forget job of user (call when the job has run)"""
+        jobs = self._jobs.get(user_id)
+        if not jobs:
+            return
+        try:
+            jobs.remove(job)
+        except ValueError:
+            pass
+        if not jobs:
+            del self._jobs[user_id]
+
+    def cancel(self, user_id: int) -> int:
+        """Remove all scheduled jobs of user, returns number of removed jobs"""
+        jobs = self._jobs.pop(user_id, [])
+        for job in jobs:
+            job.schedule_removal()
+        return len(jobs)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+
+# Global registry (lazy initialization)
+_job_registry: Optional[ReminderJobRegistry] = None
+
+
+def get_reminder_job_registry() -> ReminderJobRegistry:
+    """Get shared registry of JobQueue reminder jobs"""
+    global _job_registry
+    if _job_registry is None:
+        _job_registry = ReminderJobRegistry()
+    return _job_registry
+
+
+# Fallback reminder senders by scheduled reminder kind
+FALLBACK_REMINDER_SENDERS = {
+    REMINDER_KIND_FIRST_FALLBACK: send_first_fallback_reminder,
+    REMINDER_KIND_SECOND_FALLBACK: send_second_fallback_reminder,
+    REMINDER_KIND_THIRD_FALLBACK: send_third_fallback_reminder,
+}
+
+
+async def send_fallback_reminder_callback(context: ContextTypes.DEFAULT_TYPE):
+    """Callback for fallback reminder scheduled in JobQueue (DB unavailable)"""
+    user_id = context.job.data.get('user_id')
+    kind = context.job.data.get('kind')
+    sender = FALLBACK_REMINDER_SENDERS.get(kind)
+    get_reminder_job_registry().discard(user_id, context.job)
+    if not user_id or not sender:
+        logger.error(f"Fallback reminder callback: invalid job data {context.job.data}")
+        return
+    
+    await get_broadcast_engine().send(user_id, sender, context.bot, user_id)
+
+
+def get_fallback_intervals(use_minutes: bool = False) -> list[tuple[str, str, int]]:
+    """
+    Get fallback reminders with their delays after lesson click.
+    
+    Returns:
+        List of (kind, job name template, delay in seconds)
+    """
+    config = get_lead_magnet_config()
+    if use_minutes:
+        first_interval = config.get("first_reminder_minutes", 1) * 60  # Convert to seconds
+        second_interval = config.get("second_reminder_minutes", 2) * 60
+        third_interval = config.get("third_reminder_after_second_minutes", 1) * 60
+    else:
+        first_interval = config.get("first_reminder_hours", 1) * 3600  # Convert to seconds
+        second_interval = config.get("second_reminder_hours", 2) * 3600
+        third_interval = config.get("third_reminder_after_second_hours", 3) * 3600
+    
+    return [
+        (REMINDER_KIND_FIRST_FALLBACK, JOB_NAME_FIRST_REMINDER, first_interval),
+        (REMINDER_KIND_SECOND_FALLBACK, JOB_NAME_SECOND_REMINDER, first_interval + second_interval),
+        (REMINDER_KIND_THIRD_FALLBACK, JOB_NAME_THIRD_REMINDER, first_interval + second_interval + third_interval),
+    ]
+
+
+async def schedule_lead_reminders(context: ContextTypes.DEFAULT_TYPE, user_id: int, use_minutes: bool = False):
     """
     Schedule all lead magnet reminders after lesson click.
     
+    Reminders are persisted in scheduled_reminders table. If the database
+    is unavailable, they are scheduled in memory using JobQueue.
+    
     Args:
         context: Application context with job_queue
         user_id: Telegram user ID
         use_minutes: If True, use minutes for testing. If False, use hours from config.
     
     Returns:
-        List of scheduled job names
+        List of scheduled reminder kinds (DB) or job names (JobQueue)
     """
+    reminders = get_fallback_intervals(use_minutes)
+    
+    try:
+        db = get_async_db_session()
+        try:
+            await schedule_reminders(db, [
+                {"telegram_id": user_id, "kind": kind, "delay_seconds": delay}
+                for kind, _, delay in reminders
+            ])
+            return [kind for kind, _, _ in reminders]
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.warning(f"Could not persist reminders for user_id={user_id}: {e}. Using JobQueue.")
+    
     # Get job_queue from context
     try:
         job_queue = context.job_queue
@@ -162,58 +274,22 @@ def schedule_lead_reminders(context: ContextTypes.DEFAULT_TYPE, user_id: int, us
         logger.warning("JobQueue is not available. Cannot schedule reminders. Install python-telegram-bot[job-queue] to use this feature.")
         return []
     
-    config = get_lead_magnet_config()
     job_names = []
+    registry = get_reminder_job_registry()
     
     try:
-        # Get intervals from config
-        if use_minutes:
-            first_interval = config.get("first_reminder_minutes", 1) * 60  # Convert to seconds
-            second_interval = config.get("second_reminder_minutes", 2) * 60
-            third_interval = config.get("third_reminder_after_second_minutes", 1) * 60
-        else:
-            first_interval = config.get("first_reminder_hours", 1) * 3600  # Convert to seconds
-            second_interval = config.get("second_reminder_hours", 2) * 3600
-            third_interval = config.get("third_reminder_after_second_hours", 3) * 3600
-        
-        # Job data
-        job_data = {'user_id': user_id}
-        
-        # Schedule first reminder
-        first_job_name = JOB_NAME_FIRST_REMINDER.format(user_id=user_id)
-        first_job = job_queue.run_once(
-            callback=send_first_reminder_callback_fallback,
-            when=first_interval,
-            data=job_data,
-            name=first_job_name,
-            chat_id=user_id
-        )
-        job_names.append(first_job_name)
-        logger.info(f"Scheduled first reminder (fallback) for user_id={user_id} in {first_interval}s")
-        
-        # Schedule second reminder (after first interval + second interval)
-        second_job_name = JOB_NAME_SECOND_REMINDER.format(user_id=user_id)
-        second_job = job_queue.run_once(
-            callback=send_second_reminder_callback_fallback,
-            when=first_interval + second_interval,
-            data=job_data,
-            name=second_job_name,
-            chat_id=user_id
-        )
-        job_names.append(second_job_name)
-        logger.info(f"Scheduled second reminder (fallback) for user_id={user_id} in {first_interval + second_interval}s")
-        
-        # Schedule third reminder (after second reminder + third interval)
-        third_job_name = JOB_NAME_THIRD_REMINDER.format(user_id=user_id)
-        third_job = job_queue.run_once(
-            callback=send_third_reminder_callback_fallback,
-            when=first_interval + second_interval + third_interval,
-            data=job_data,
-            name=third_job_name,
-            chat_id=user_id
-        )
-        job_names.append(third_job_name)
-        logger.info(f"Scheduled third reminder for user_id={user_id} in {first_interval + second_interval + third_interval}s")
+        for kind, job_name_template, delay in reminders:
+            job_name = job_name_template.format(user_id=user_id)
+            job = job_queue.run_once(
+                callback=send_fallback_reminder_callback,
+                when=delay,
+                data={'user_id': user_id, 'kind': kind},
+                name=job_name,
+                chat_id=user_id
+            )
+            registry.add(user_id, job)
+            job_names.append(job_name)
+            logger.info(f"Scheduled {kind} reminder (JobQueue) for user_id={user_id} in {delay}s")
         
         return job_names
         
@@ -222,83 +298,34 @@ def schedule_lead_reminders(context: ContextTypes.DEFAULT_TYPE, user_id: int, us
         return job_names
 
 
-def cancel_lead_reminders(context: ContextTypes.DEFAULT_TYPE, user_id: int):
+async def cancel_lead_reminders(context: ContextTypes.DEFAULT_TYPE, user_id: int):
     """
-    Cancel all scheduled lead reminders for a user (both fallback and DB-based).
+    Cancel all scheduled lead reminders for a user (both persisted and JobQueue).
     This should be called when target action-2 is performed (e.g., payment or intensive page visit).
     
+    Persisted reminders are cancelled by one UPDATE over the pending-by-user index,
+    JobQueue jobs are looked up in ReminderJobRegistry - neither scans all reminders.
+    
     Args:
-        context: Application context with job_queue
+        context: Application context
         user_id: Telegram user ID
     """
-    # Get job_queue from context
+    # Cancel persisted reminders
     try:
-        job_queue = context.job_queue
-    except AttributeError:
-        logger.warning("JobQueue is not available. Install python-telegram-bot[job-queue] to use this feature.")
-        return
-    
-    if not job_queue:
-        logger.warning("JobQueue is not available. Cannot cancel reminders. Install python-telegram-bot[job-queue] to use this feature.")
-        return
-    
-    cancelled_count = 0
+        db = get_async_db_session()
+        try:
+            cancelled = await cancel_scheduled_reminders(db, user_id)
+            if cancelled:
+                logger.info(f"Cancelled {cancelled} scheduled reminder(s) for user_id={user_id}")
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.error(f"Error cancelling scheduled reminders for user_id={user_id}: {e}", exc_info=True)
     
+    # Cancel in-memory jobs (scheduled when DB was unavailable)
     try:
-        # Get all jobs for this user (both fallback and DB-based)
-        job_names = [
-            # Fallback system (no DB)
-            JOB_NAME_FIRST_REMINDER.format(user_id=user_id),
-            JOB_NAME_SECOND_REMINDER.format(user_id=user_id),
-            JOB_NAME_THIRD_REMINDER.format(user_id=user_id),
-            # DB-based system
-            f"special_offer_reminder_{user_id}",
-            f"second_lead_reminder_{user_id}",
-            f"third_lead_reminder_{user_id}",
-            f"fourth_lead_reminder_{user_id}",
-        ]
-        
-        # Cancel each job by iterating through all jobs
-        # JobQueue uses APScheduler internally, jobs are stored in scheduler
-        for job_name in job_names:
-            try:
-                # Try to get jobs by name if method exists
-                jobs_to_cancel = []
-                if hasattr(job_queue, 'get_jobs_by_name'):
-                    jobs_to_cancel = job_queue.get_jobs_by_name(job_name)
-                else:
-                    # Fallback: iterate through scheduler jobs
-                    # APScheduler stores jobs in scheduler._jobs dict
-                    scheduler = getattr(job_queue, '_scheduler', None)
-                    if scheduler and hasattr(scheduler, 'get_jobs'):
-                        all_jobs = scheduler.get_jobs()
-                        for job in all_jobs:
-                            if hasattr(job, 'id') and job.id == job_name:
-                                jobs_to_cancel.append(job)
-                    elif hasattr(job_queue, 'scheduler') and hasattr(job_queue.scheduler, 'get_jobs'):
-                        all_jobs = job_queue.scheduler.get_jobs()
-                        for job in all_jobs:
-                            if hasattr(job, 'id') and job.id == job_name:
-                                jobs_to_cancel.append(job)
-                
-                # Cancel found jobs
-                for job in jobs_to_cancel:
-                    if hasattr(job, 'remove'):
-                        job.remove()
-                        cancelled_count += 1
-                        logger.info(f"Cancelled reminder job: {job_name}")
-                    elif hasattr(job, 'schedule_removal'):
-                        job.schedule_removal()
-                        cancelled_count += 1
-                        logger.info(f"Cancelled reminder job: {job_name}")
-            except Exception as e:
-                logger.warning(f"Error cancelling job {job_name}: {e}")
-        
+        cancelled_count = get_reminder_job_registry().cancel(user_id)
         if cancelled_count > 0:
-            logger.info(f"Cancelled {cancelled_count} reminder(s) for user_id={user_id}")
-        else:
-            logger.debug(f"No reminder jobs found to cancel for user_id={user_id}")
-            
+            logger.info(f"Cancelled {cancelled_count} reminder job(s) for user_id={user_id}")
     except Exception as e:
         logger.error(f"Error cancelling reminders for user_id={user_id}: {e}", exc_info=True)
-
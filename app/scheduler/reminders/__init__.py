@@ -5,7 +5,10 @@ This package contains modules for sending various types of reminders:
 - Lead magnet reminders (after lesson click)
 - Offer expiration reminders (last call and regular)
 
-Main entry point: process_reminders() function from processor module.
+Main entry points:
+- process_reminders() from processor module (offer-based reminders)
+- process_scheduled_reminders() from scheduled module (reminders persisted for a specific time)
+- purge_scheduled_reminders() from scheduled module (deletes old finished reminders)
 """
 # Import all reminder sender functions for backward compatibility
 from scheduler.reminders.lead_magnet import (
@@ -19,10 +22,13 @@ from scheduler.reminders.offer_expiration import (
     send_regular_reminder
 )
 from scheduler.reminders.processor import process_reminders
+from scheduler.reminders.scheduled import process_scheduled_reminders, purge_scheduled_reminders
 
 # Export main function and all sender functions
 __all__ = [
     'process_reminders',
+    'process_scheduled_reminders',
+    'purge_scheduled_reminders',
     'send_first_lead_reminder',
     'send_second_lead_reminder',
     'send_third_lead_reminder',
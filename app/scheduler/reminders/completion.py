@@ -0,0 +1,55 @@
+"""
+Reminder completion.
+
+Senders only send messages. After a batch of sends the reminder pipelines
+(process_reminders, process_scheduled_reminders) record successful sends
+here: one UPDATE of offers per reminder kind, plus one INSERT of the
+follow-up reminders of the lead magnet chain.
+"""
+from db.repository import mark_reminders_sent, schedule_reminders, NEXT_ACTION_FIRST_LEAD
+from scheduler.reminders.lead_magnet.special_offer import REMINDER_KIND_SPECIAL_OFFER
+from scheduler.reminders.lead_magnet.second import REMINDER_KIND_SECOND
+from scheduler.reminders.lead_magnet.third import REMINDER_KIND_THIRD
+from scheduler.reminders.lead_magnet.fourth import REMINDER_KIND_FOURTH
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reminders scheduled after a reminder of given kind is sent:
+# kind -> list of (follow-up kind, delay in seconds)
+FOLLOW_UP_REMINDERS = {
+    NEXT_ACTION_FIRST_LEAD: [
+        (REMINDER_KIND_SPECIAL_OFFER, 3600),  # 1 hour later
+        (REMINDER_KIND_SECOND, 14400),  # 4 hours later
+    ],
+    REMINDER_KIND_SECOND: [(REMINDER_KIND_THIRD, 10800)],  # 3 hours later
+    REMINDER_KIND_THIRD: [(REMINDER_KIND_FOURTH, 10800)],  # 3 hours later
+}
+
+
+async def record_sent_reminders(db, sent: dict):
+    """
+    Record successfully sent reminders and schedule their follow-ups.
+    
+    Args:
+        db: Database session
+        sent: Dict kind -> list of offer rows (with id and telegram_id) the reminder was sent for
+    """
+    for kind, offers in sent.items():
+        if not offers:
+            continue
+        try:
+            await mark_reminders_sent(db, kind, [offer.id for offer in offers])
+            await schedule_reminders(db, [
+                {
+                    "telegram_id": offer.telegram_id,
+                    "kind": follow_up_kind,
+                    "delay_seconds": delay,
+                    "offer_id": offer.id
+                }
+                for offer in offers
+                for follow_up_kind, delay in FOLLOW_UP_REMINDERS.get(kind, [])
+            ])
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Failed to record {len(offers)} sent {kind} reminders: {e}", exc_info=True)
@@ -3,15 +3,17 @@ Special offer reminder.
 
 Sent 1 hour after first reminder with special pricing offer.
 """
-from db.repository import update_reminder_sent
 from shared.utils.get_lead_reminder_keyboards import get_special_offer_keyboard
 from shared.utils.telegram_error_handler import send_message_with_error_handling
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Scheduled reminder kind for special offer reminder
+REMINDER_KIND_SPECIAL_OFFER = "special_offer"
 
-async def send_special_offer_reminder(bot, db, offer, user):
+
+async def send_special_offer_reminder(bot, offer, user):
     """Send special offer reminder (1 hour after first reminder)"""
     text = (
         "<b>ТОЛЬКО 24 ЧАСА</b>\n\n"
@@ -34,8 +36,5 @@ async def send_special_offer_reminder(bot, db, offer, user):
         reply_markup=keyboard
     )
     
-    if success:
-        update_reminder_sent(db, offer.id, reminder_type="special_offer")
-    
     return success
 
@@ -4,7 +4,6 @@ Offer expiration reminder functions.
 This module contains functions for sending reminders about offer expiration
 (last call and regular reminders).
 """
-from db.repository import update_reminder_sent
 from shared.utils.get_lead_reminder_keyboards import get_last_call_reminder_keyboard
 from shared.utils.telegram_error_handler import send_message_with_error_handling
 import logging
@@ -12,7 +11,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-async def send_last_call_reminder(bot, db, offer, user):
+async def send_last_call_reminder(bot, offer, user):
     """Send 'last call' reminder message"""
     expiration_date = offer.offer_expiration_date.strftime("%d.%m.%Y в %H:%M")
     text = (
@@ -31,13 +30,10 @@ async def send_last_call_reminder(bot, db, offer, user):
         reply_markup=keyboard
     )
     
-    if success:
-        update_reminder_sent(db, offer.id, reminder_type='last_call')
-    
     return success
 
 
-async def send_regular_reminder(bot, db, offer, user):
+async def send_regular_reminder(bot, offer, user):
     """Send regular reminder message"""
     expiration_date = offer.offer_expiration_date.strftime("%d.%m.%Y в %H:%M")
     text = (
@@ -55,8 +51,5 @@ async def send_regular_reminder(bot, db, offer, user):
         text=text
     )
     
-    if success:
-        update_reminder_sent(db, offer.id, reminder_type=None)
-    
     return success
 
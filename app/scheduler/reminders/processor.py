@@ -4,32 +4,39 @@ Reminder processor module.
 This module contains the main function that processes all reminders
 by checking the database and sending messages to users.
 """
-from db.session import get_db_session
+from db.session import get_async_db_session
 from db.repository import (
-    get_users_for_last_call_reminder,
-    get_users_for_regular_reminder,
-    get_users_for_first_lead_reminder,
-    get_users_for_second_lead_reminder,
-    get_users_for_third_lead_reminder,
-    get_users_for_special_offer_reminder
-)
-from modules.lead_magnet.config import get_lead_magnet_config
-from scheduler.reminders.lead_magnet import (
-    send_first_lead_reminder,
-    send_second_lead_reminder,
-    send_third_lead_reminder,
-    send_special_offer_reminder
+    get_due_offers,
+    get_offer_due_action,
+    refresh_next_action,
+    NEXT_ACTION_FIRST_LEAD,
+    NEXT_ACTION_REGULAR,
+    NEXT_ACTION_LAST_CALL
 )
+from scheduler.reminders.lead_magnet import send_first_lead_reminder
 from scheduler.reminders.offer_expiration import (
     send_last_call_reminder,
     send_regular_reminder
 )
+from scheduler.reminders.completion import record_sent_reminders
+from scheduler.broadcast import get_broadcast_engine
+from shared.utils.metrics import REMINDERS_DUE, timed_job
+from collections import defaultdict
+import asyncio
 import logging
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# Reminder senders by offer next action kind
+NEXT_ACTION_SENDERS = {
+    NEXT_ACTION_FIRST_LEAD: send_first_lead_reminder,
+    NEXT_ACTION_REGULAR: send_regular_reminder,
+    NEXT_ACTION_LAST_CALL: send_last_call_reminder,
+}
+
 
+@timed_job("process_reminders")
 async def process_reminders(context):
     """Process all reminders - check database and send messages
     
@@ -37,7 +44,7 @@ async def process_reminders(context):
         context: CallbackContext from JobQueue
     """
     try:
-        db = get_db_session()
+        db = get_async_db_session()
     except Exception as db_error:
         logger.error(f"Failed to get database session: {db_error}. Skipping reminder processing.")
         return
@@ -49,59 +56,53 @@ async def process_reminders(context):
             logger.error("Bot is None in process_reminders context")
             return
         
-        config = get_lead_magnet_config()
+        # Sends are queued to the broadcast engine and run concurrently
+        # within Telegram rate limits; the tick waits for all of them below
+        engine = get_broadcast_engine()
+        sends = []
+        sent_kinds = []  # (kind, offer) for each send
         
-        # Lead magnet reminders (after lesson click)
-        # Using minutes for testing - all reminders will fire within 1 minute sequentially
-        # First reminder (1 minute after click)
-        first_lead_offers = get_users_for_first_lead_reminder(
-            db,
-            hours_after_click=config["first_reminder_hours"]
-        )
-        logger.info(f"Found {len(first_lead_offers)} users for first lead reminder")
-        
-        for offer in first_lead_offers:
-            user = offer.user
-            if user and user.telegram_id:
-                # Pass context to enable JobQueue scheduling for special offer
-                await send_first_lead_reminder(bot, db, offer, user, context=context)
-            else:
-                logger.warning(f"Offer {offer.id} has no user or telegram_id")
+        # Offers with a due next action (first lead reminder, regular and last call
+        # reminders) - one range scan over the next_action_at partial index.
+        # Lead magnet chain after the first reminder is persisted in scheduled_reminders
+        # by the senders and sent by process_scheduled_reminders
+        due_offers = await get_due_offers(db)
+        logger.info(f"Found {len(due_offers)} offers with due reminders")
+        REMINDERS_DUE.labels("process_reminders").set(len(due_offers))
         
-        # Second reminder is now scheduled via JobQueue in send_first_lead_reminder
-        # It will be sent automatically 4 hours after first reminder is sent
-        # No need to process it here through database queries
+        now = datetime.now(timezone.utc)
+        stale_offer_ids = []
         
-        # Third reminder is now scheduled via JobQueue in send_second_lead_reminder
-        # It will be sent automatically 3 hours after second reminder is sent
-        # No need to process it here through database queries
+        for offer in due_offers:
+            kind = get_offer_due_action(offer, now)
+            if kind is None:
+                # Reminder window has passed (e.g. bot was down) - recompute next action
+                stale_offer_ids.append(offer.id)
+                continue
+            
+            if offer.telegram_id:
+                # Row carries user's telegram_id, so it is passed as both offer and user
+                sends.append(await engine.submit(offer.telegram_id, NEXT_ACTION_SENDERS[kind], bot, offer, offer))
+                sent_kinds.append((kind, offer))
+            else:
+                logger.warning(f"Offer {offer.id} has no telegram_id")
         
-        # Fourth reminder is now scheduled via JobQueue in send_third_lead_reminder
-        # It will be sent automatically 3 hours after third reminder is sent
-        # No need to process it here through database queries
+        await refresh_next_action(db, stale_offer_ids)
         
-        # Offer expiration reminders
-        # Get users for last call reminder (24-48 hours before expiration)
-        last_call_offers = get_users_for_last_call_reminder(db)
-        logger.info(f"Found {len(last_call_offers)} users for last call reminder")
+        # Release the connection while sends are in flight
+        await db.commit()
         
-        for offer in last_call_offers:
-            user = offer.user
-            if user and user.telegram_id:
-                await send_last_call_reminder(bot, db, offer, user)
-            else:
-                logger.warning(f"Offer {offer.id} has no user or telegram_id")
+        results = await asyncio.gather(*sends)
         
-        # Get users for regular reminder (more than 48 hours before expiration)
-        regular_offers = get_users_for_regular_reminder(db, reminder_interval_hours=48)
-        logger.info(f"Found {len(regular_offers)} users for regular reminder")
+        # Record successful sends with one UPDATE per reminder kind
+        sent = defaultdict(list)
+        for (kind, offer), result in zip(sent_kinds, results):
+            if result:
+                sent[kind].append(offer)
+        await record_sent_reminders(db, sent)
         
-        for offer in regular_offers:
-            user = offer.user
-            if user and user.telegram_id:
-                await send_regular_reminder(bot, db, offer, user)
-            else:
-                logger.warning(f"Offer {offer.id} has no user or telegram_id")
+        sent_count = sum(len(offers) for offers in sent.values())
+        logger.info(f"Sent {sent_count} of {len(results)} reminders")
         
         logger.info(f"Reminder processing completed at {datetime.now(timezone.utc)}")
         
@@ -110,7 +111,7 @@ async def process_reminders(context):
     finally:
         if db is not None:
             try:
-                db.close()
+                await db.close()
             except Exception as close_error:
                 logger.warning(f"Error closing database session: {close_error}")
 
@@ -0,0 +1,178 @@
+"""
+Scheduled reminder poller.
+
+Reminders scheduled for a specific time (lead magnet chain after the first
+reminder, fallback reminders) are stored in scheduled_reminders table instead
+of process memory, so they survive restarts. This poller claims due rows and
+sends them through the broadcast engine.
+
+Finished rows (sent, failed, cancelled) are deleted by
+purge_scheduled_reminders once they are FINISHED_REMINDER_RETENTION_DAYS old.
+"""
+from db.session import get_async_db_session
+from db.repository import (
+    get_reminder_offers,
+    claim_due_reminders,
+    complete_scheduled_reminders,
+    purge_finished_reminders,
+    REMINDER_STATUS_SENT,
+    REMINDER_STATUS_FAILED,
+    REMINDER_STATUS_CANCELLED
+)
+from scheduler.reminders.lead_magnet.second import send_second_lead_reminder, REMINDER_KIND_SECOND
+from scheduler.reminders.lead_magnet.third import send_third_lead_reminder, REMINDER_KIND_THIRD
+from scheduler.reminders.lead_magnet.fourth import send_fourth_lead_reminder, REMINDER_KIND_FOURTH
+from scheduler.reminders.lead_magnet.special_offer import send_special_offer_reminder, REMINDER_KIND_SPECIAL_OFFER
+from scheduler.job_queue_reminders import FALLBACK_REMINDER_SENDERS
+from scheduler.reminders.completion import record_sent_reminders
+from scheduler.broadcast import get_broadcast_engine
+from shared.utils.metrics import REMINDERS_DUE, timed_job
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of reminders claimed per poll
+CLAIM_BATCH_SIZE = 500
+
+# Finished reminders are kept this long for troubleshooting, then deleted
+FINISHED_REMINDER_RETENTION_DAYS = 30
+# Rows deleted per statement by purge_scheduled_reminders
+PURGE_BATCH_SIZE = 5000
+
+# Offer-based reminder senders by scheduled reminder kind
+OFFER_REMINDER_SENDERS = {
+    REMINDER_KIND_SPECIAL_OFFER: send_special_offer_reminder,
+    REMINDER_KIND_SECOND: send_second_lead_reminder,
+    REMINDER_KIND_THIRD: send_third_lead_reminder,
+    REMINDER_KIND_FOURTH: send_fourth_lead_reminder,
+}
+
+
+async def _send_scheduled_reminder(bot, reminder, offer) -> str:
+    """Send one claimed reminder
+    
+    Args:
+        bot: Telegram bot instance
+        reminder: Claimed scheduled reminder row
+        offer: Offer row for offer-based reminders (None if not found)
+    
+    Returns:
+        Final status of the reminder: sent, failed or cancelled (no longer needed)
+    """
+    fallback_sender = FALLBACK_REMINDER_SENDERS.get(reminder.kind)
+    if fallback_sender:
+        sent = await fallback_sender(bot, reminder.telegram_id)
+        return REMINDER_STATUS_SENT if sent else REMINDER_STATUS_FAILED
+    
+    sender = OFFER_REMINDER_SENDERS.get(reminder.kind)
+    if sender is None:
+        logger.error(f"Unknown scheduled reminder kind '{reminder.kind}' (id={reminder.id})")
+        return REMINDER_STATUS_FAILED
+    
+    if offer is None:
+        logger.warning(f"Offer {reminder.offer_id} not found for {reminder.kind} reminder")
+        return REMINDER_STATUS_FAILED
+    if not offer.is_active:
+        # Offer was paid or expired after the reminder was scheduled
+        logger.info(f"Offer {offer.id} is no longer active, skipping {reminder.kind} reminder")
+        return REMINDER_STATUS_CANCELLED
+    
+    # Row carries user's telegram_id, so it is passed as both offer and user
+    sent = await sender(bot, offer, offer)
+    return REMINDER_STATUS_SENT if sent else REMINDER_STATUS_FAILED
+
+
+@timed_job("process_scheduled_reminders")
+async def process_scheduled_reminders(context):
+    """Send due scheduled reminders
+    
+    Args:
+        context: CallbackContext from JobQueue
+    """
+    bot = context.bot
+    
+    try:
+        db = get_async_db_session()
+        try:
+            reminders = await claim_due_reminders(db, limit=CLAIM_BATCH_SIZE)
+            # Offers for all claimed reminders in one query
+            offers = await get_reminder_offers(
+                db, {reminder.offer_id for reminder in reminders if reminder.offer_id}
+            )
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.error(f"Failed to claim scheduled reminders: {e}", exc_info=True)
+        return
+    
+    # CLAIM_BATCH_SIZE means more reminders are due than one poll sends
+    REMINDERS_DUE.labels("process_scheduled_reminders").set(len(reminders))
+    
+    if not reminders:
+        return
+    
+    logger.info(f"Claimed {len(reminders)} scheduled reminders")
+    
+    engine = get_broadcast_engine()
+    sends = [
+        await engine.submit(
+            reminder.telegram_id, _send_scheduled_reminder, bot, reminder, offers.get(reminder.offer_id)
+        )
+        for reminder in reminders
+    ]
+    results = await asyncio.gather(*sends, return_exceptions=True)
+    
+    # Raised sends count as failed
+    ids_by_status = defaultdict(list)
+    for reminder, result in zip(reminders, results):
+        status = result if isinstance(result, str) else REMINDER_STATUS_FAILED
+        ids_by_status[status].append(reminder.id)
+    sent_ids = ids_by_status[REMINDER_STATUS_SENT]
+    
+    # Offer-based reminders update their offer (one UPDATE per kind)
+    sent_offers = defaultdict(list)
+    for reminder, result in zip(reminders, results):
+        if result == REMINDER_STATUS_SENT and reminder.kind in OFFER_REMINDER_SENDERS:
+            sent_offers[reminder.kind].append(offers[reminder.offer_id])
+    
+    try:
+        db = get_async_db_session()
+        try:
+            for status, reminder_ids in ids_by_status.items():
+                await complete_scheduled_reminders(db, reminder_ids, status)
+            await record_sent_reminders(db, sent_offers)
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.error(f"Failed to complete scheduled reminders: {e}", exc_info=True)
+    
+    logger.info(f"Sent {len(sent_ids)} of {len(reminders)} scheduled reminders")
+
+
+@timed_job("purge_scheduled_reminders")
+async def purge_scheduled_reminders(context):
+    """Delete finished scheduled reminders older than FINISHED_REMINDER_RETENTION_DAYS
+    
+    Args:
+        context: CallbackContext from JobQueue
+    """
+    created_before = datetime.now(timezone.utc) - timedelta(days=FINISHED_REMINDER_RETENTION_DAYS)
+    deleted = 0
+    try:
+        db = get_async_db_session()
+        try:
+            while True:
+                batch = await purge_finished_reminders(db, created_before, limit=PURGE_BATCH_SIZE)
+                deleted += batch
+                if batch < PURGE_BATCH_SIZE:
+                    break
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.error(f"Failed to purge scheduled reminders: {e}", exc_info=True)
+    
+    if deleted:
+        logger.info(f"Purged {deleted} finished scheduled reminders")
@@ -0,0 +1,74 @@
+"""
+Retry policy for reminder sends.
+
+Transient Telegram errors are retried by the broadcast engine:
+- RetryAfter (flood limit): requeue after the delay requested by Telegram
+- NetworkError / TimedOut: requeue with exponential backoff and jitter
+
+After MAX_SEND_ATTEMPTS the send is recorded in the dead_letters table.
+"""
+from telegram.error import NetworkError, TimedOut, RetryAfter, BadRequest
+from db.session import get_async_db_session
+from db.repository import record_dead_letter
+from datetime import timedelta
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 1
+BACKOFF_MAX_SECONDS = 60
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check if send failed with transient error"""
+    # BadRequest is a NetworkError subclass in python-telegram-bot, but retrying won't help
+    if isinstance(error, BadRequest):
+        return False
+    return isinstance(error, (RetryAfter, NetworkError, TimedOut))
+
+
+def get_retry_after_seconds(error: RetryAfter) -> float:
+    """Get flood limit delay in seconds (retry_after may be int or timedelta)"""
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+def get_retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Get delay before next attempt.
+
+    Args:
+        error: Error raised by the failed attempt
+        attempt: Number of attempts made so far (1 after first failure)
+
+    Returns:
+        Delay in seconds
+    """
+    if isinstance(error, RetryAfter):
+        return get_retry_after_seconds(error)
+
+    # Exponential backoff with "equal jitter": half fixed, half random
+    backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+async def dead_letter(telegram_id: int, reminder_type: str, attempts: int, error: Exception):
+    """Record send that exhausted all attempts"""
+    try:
+        db = get_async_db_session()
+        try:
+            await record_dead_letter(
+                db,
+                telegram_id=telegram_id,
+                reminder_type=reminder_type,
+                attempts=attempts,
+                error=f"{type(error).__name__}: {error}"
+            )
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.error(f"Failed to record dead letter for telegram_id={telegram_id}: {e}", exc_info=True)
@@ -1,3 +1,5 @@
+import env
+
 # Commands
 COMMAND_START = "start"
 
@@ -19,9 +21,16 @@ CALLBACK_GET_LESSON = "lesson:get"
 # Admin callbacks
 CALLBACK_ADMIN_EXPORT_USERS = "admin:export_users"
 CALLBACK_ADMIN_EXPORT_OFFERS = "admin:export_offers"
+CALLBACK_ADMIN_EXPORT_USERS_CSV = "admin:export_csv:users"
+CALLBACK_ADMIN_EXPORT_OFFERS_CSV = "admin:export_csv:offers"
+CALLBACK_ADMIN_EXPORT_PAY_CLICKS_CSV = "admin:export_csv:pay_clicks"
+CALLBACK_ADMIN_EXPORT_USERS_PARQUET = "admin:export_parquet:users"
+CALLBACK_ADMIN_EXPORT_OFFERS_PARQUET = "admin:export_parquet:offers"
+CALLBACK_ADMIN_EXPORT_PAY_CLICKS_PARQUET = "admin:export_parquet:pay_clicks"
 
-# Admin user IDs
-ADMIN_USER_IDS = [486153193, 304711324]
+# Admin user IDs (frozenset: membership is checked on every menu build)
+DEFAULT_ADMIN_USER_IDS = (486153193, 304711324)
+ADMIN_USER_IDS = frozenset(env.ADMIN_USER_IDS or DEFAULT_ADMIN_USER_IDS)
 
 # Button texts
 BUTTON_TEXT_DETAILS = "Узнать подробнее"
@@ -34,4 +43,10 @@ BUTTON_TEXT_MATERIALS = "Материалы интенсива"
 BUTTON_TEXT_GET_LESSON = "Забрать урок"
 BUTTON_TEXT_ADMIN_EXPORT_USERS = "Выгрузить базу пользователей"
 BUTTON_TEXT_ADMIN_EXPORT_OFFERS = "Выгрузить базу предложений"
+BUTTON_TEXT_ADMIN_EXPORT_USERS_CSV = "CSV: пользователи"
+BUTTON_TEXT_ADMIN_EXPORT_OFFERS_CSV = "CSV: предложения"
+BUTTON_TEXT_ADMIN_EXPORT_PAY_CLICKS_CSV = "CSV: клики оплаты"
+BUTTON_TEXT_ADMIN_EXPORT_USERS_PARQUET = "Parquet: пользователи"
+BUTTON_TEXT_ADMIN_EXPORT_OFFERS_PARQUET = "Parquet: предложения"
+BUTTON_TEXT_ADMIN_EXPORT_PAY_CLICKS_PARQUET = "Parquet: клики оплаты"
 
@@ -9,7 +9,13 @@ from shared.constants.callback_register import (
     CALLBACK_MATERIALS_INTENSIVE,
     CALLBACK_GET_LESSON,
     CALLBACK_ADMIN_EXPORT_USERS,
-    CALLBACK_ADMIN_EXPORT_OFFERS
+    CALLBACK_ADMIN_EXPORT_OFFERS,
+    CALLBACK_ADMIN_EXPORT_USERS_CSV,
+    CALLBACK_ADMIN_EXPORT_OFFERS_CSV,
+    CALLBACK_ADMIN_EXPORT_PAY_CLICKS_CSV,
+    CALLBACK_ADMIN_EXPORT_USERS_PARQUET,
+    CALLBACK_ADMIN_EXPORT_OFFERS_PARQUET,
+    CALLBACK_ADMIN_EXPORT_PAY_CLICKS_PARQUET
 )
 from modules.main_menu.handler import handle_main_menu
 from modules.details.index import handle_details
@@ -18,7 +24,9 @@ from modules.intensive.index import handle_intensive
 from modules.payment.index import send_intensive_invoice
 from modules.materials.index import handle_intensive_materials
 from modules.lead_magnet.index import handle_get_lead_magnet
-from modules.admin.handlers import handle_export_users, handle_export_offers
+from modules.admin.handlers import handle_export_users, handle_export_offers, get_table_export_handler
+from modules.admin.table_export import EXPORT_FORMAT_CSV, EXPORT_FORMAT_PARQUET
+from shared.utils.metrics import timed_handler
 
 # Router mapping callback data to handlers
 CALLBACK_ROUTER = {
@@ -31,7 +39,15 @@ CALLBACK_ROUTER = {
     CALLBACK_GET_LESSON: handle_get_lead_magnet,
     CALLBACK_ADMIN_EXPORT_USERS: handle_export_users,
     CALLBACK_ADMIN_EXPORT_OFFERS: handle_export_offers,
+    CALLBACK_ADMIN_EXPORT_USERS_CSV: get_table_export_handler("users", EXPORT_FORMAT_CSV),
+    CALLBACK_ADMIN_EXPORT_OFFERS_CSV: get_table_export_handler("offers", EXPORT_FORMAT_CSV),
+    CALLBACK_ADMIN_EXPORT_PAY_CLICKS_CSV: get_table_export_handler("pay_clicks", EXPORT_FORMAT_CSV),
+    CALLBACK_ADMIN_EXPORT_USERS_PARQUET: get_table_export_handler("users", EXPORT_FORMAT_PARQUET),
+    CALLBACK_ADMIN_EXPORT_OFFERS_PARQUET: get_table_export_handler("offers", EXPORT_FORMAT_PARQUET),
+    CALLBACK_ADMIN_EXPORT_PAY_CLICKS_PARQUET: get_table_export_handler("pay_clicks", EXPORT_FORMAT_PARQUET),
 }
+# Handler metrics and query scopes are labelled with the router key
+CALLBACK_ROUTER = {key: timed_handler(key, handler) for key, handler in CALLBACK_ROUTER.items()}
 
 async def route_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Centralized router for callback queries"""
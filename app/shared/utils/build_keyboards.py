@@ -0,0 +1,33 @@
+from shared.utils.get_back import get_back_keyboard
+from shared.utils.get_intensive_keyboard import get_intensive_keyboard
+from shared.utils.get_promocode_keyboard import get_promocode_keyboard
+from shared.utils.get_welcome_keyboard import _build_welcome_keyboard
+from shared.utils.get_lead_reminder_keyboards import (
+    get_watch_lesson_keyboard,
+    get_second_reminder_keyboard,
+    get_last_call_reminder_keyboard,
+    get_special_offer_keyboard
+)
+from modules.main_menu.index import _build_main_menu_keyboard
+
+
+def build_keyboards() -> int:
+    """Build every cached keyboard variant at startup, so no send builds one on the hot path
+    
+    Returns:
+        Number of built keyboards
+    """
+    keyboards = [
+        get_back_keyboard(),
+        get_intensive_keyboard(),
+        get_promocode_keyboard(),
+        get_watch_lesson_keyboard(),
+        get_second_reminder_keyboard(),
+        get_last_call_reminder_keyboard(),
+        get_special_offer_keyboard(),
+    ]
+    for is_admin in (False, True):
+        for has_paid in (False, True):
+            keyboards.append(_build_welcome_keyboard(is_admin, has_paid))
+            keyboards.append(_build_main_menu_keyboard(has_paid, is_admin))
+    return len(keyboards)
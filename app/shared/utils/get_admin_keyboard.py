@@ -0,0 +1,44 @@
+from telegram import InlineKeyboardButton
+from modules.admin.table_export import PARQUET_AVAILABLE
+from shared.constants.callback_register import (
+    CALLBACK_ADMIN_EXPORT_USERS,
+    CALLBACK_ADMIN_EXPORT_OFFERS,
+    CALLBACK_ADMIN_EXPORT_USERS_CSV,
+    CALLBACK_ADMIN_EXPORT_OFFERS_CSV,
+    CALLBACK_ADMIN_EXPORT_PAY_CLICKS_CSV,
+    CALLBACK_ADMIN_EXPORT_USERS_PARQUET,
+    CALLBACK_ADMIN_EXPORT_OFFERS_PARQUET,
+    CALLBACK_ADMIN_EXPORT_PAY_CLICKS_PARQUET,
+    BUTTON_TEXT_ADMIN_EXPORT_USERS,
+    BUTTON_TEXT_ADMIN_EXPORT_OFFERS,
+    BUTTON_TEXT_ADMIN_EXPORT_USERS_CSV,
+    BUTTON_TEXT_ADMIN_EXPORT_OFFERS_CSV,
+    BUTTON_TEXT_ADMIN_EXPORT_PAY_CLICKS_CSV,
+    BUTTON_TEXT_ADMIN_EXPORT_USERS_PARQUET,
+    BUTTON_TEXT_ADMIN_EXPORT_OFFERS_PARQUET,
+    BUTTON_TEXT_ADMIN_EXPORT_PAY_CLICKS_PARQUET
+)
+
+
+def get_admin_keyboard_rows():
+    """Create admin export button rows: PDF, CSV and (if pyarrow is installed) Parquet"""
+    rows = [
+        [
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_USERS, callback_data=CALLBACK_ADMIN_EXPORT_USERS),
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_OFFERS, callback_data=CALLBACK_ADMIN_EXPORT_OFFERS)
+        ],
+        [
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_USERS_CSV, callback_data=CALLBACK_ADMIN_EXPORT_USERS_CSV),
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_OFFERS_CSV, callback_data=CALLBACK_ADMIN_EXPORT_OFFERS_CSV),
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_PAY_CLICKS_CSV, callback_data=CALLBACK_ADMIN_EXPORT_PAY_CLICKS_CSV)
+        ]
+    ]
+
+    if PARQUET_AVAILABLE:
+        rows.append([
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_USERS_PARQUET, callback_data=CALLBACK_ADMIN_EXPORT_USERS_PARQUET),
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_OFFERS_PARQUET, callback_data=CALLBACK_ADMIN_EXPORT_OFFERS_PARQUET),
+            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_PAY_CLICKS_PARQUET, callback_data=CALLBACK_ADMIN_EXPORT_PAY_CLICKS_PARQUET)
+        ])
+
+    return rows
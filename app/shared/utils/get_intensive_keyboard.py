@@ -1,3 +1,4 @@
+from functools import cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from shared.constants.callback_register import (
     CALLBACK_MENU_MAIN,
@@ -8,6 +9,7 @@ from shared.constants.callback_register import (
 )
 import env
 
+@cache
 def get_intensive_keyboard():
     """Create keyboard for intensive page with two payment buttons (with and without promocode), Promocode and Back buttons"""
     keyboard = [
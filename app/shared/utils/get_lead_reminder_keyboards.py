@@ -1,3 +1,4 @@
+from functools import cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from shared.constants.callback_register import (
     CALLBACK_MENU_MAIN,
@@ -9,7 +10,11 @@ from shared.constants.callback_register import (
 from modules.lead_magnet.config import get_lead_magnet_config
 import env
 
+# Keyboards don't depend on the user, so each one is built once and shared by
+# all sends (telegram objects are immutable)
 
+
+@cache
 def get_watch_lesson_keyboard():
     """Keyboard for watch lesson reminder with payment and promocode buttons"""
     config = get_lead_magnet_config()
@@ -25,6 +30,7 @@ def get_watch_lesson_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def get_second_reminder_keyboard():
     """Keyboard for second reminder with payment and promocode buttons"""
     config = get_lead_magnet_config()
@@ -40,11 +46,13 @@ def get_second_reminder_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def get_third_reminder_keyboard():
     """Keyboard for final push reminder"""
     return get_second_reminder_keyboard()
 
 
+@cache
 def get_last_call_reminder_keyboard():
     """Keyboard for last call reminder with payment and promocode buttons"""
     keyboard = [
@@ -56,6 +64,7 @@ def get_last_call_reminder_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def get_special_offer_keyboard():
     """Keyboard for special offer reminder with payment and promocode buttons"""
     keyboard = [
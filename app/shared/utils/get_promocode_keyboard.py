@@ -4,6 +4,7 @@ Keyboard for payment with promocode applied.
 This keyboard is shown after user successfully enters a valid promocode.
 It provides a button to proceed to payment with discount.
 """
+from functools import cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from shared.constants.callback_register import (
     CALLBACK_MENU_MAIN,
@@ -12,6 +13,7 @@ from shared.constants.callback_register import (
 import env
 
 
+@cache
 def get_promocode_keyboard():
     """
     Create keyboard for payment with promocode applied.
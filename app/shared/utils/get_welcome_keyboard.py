@@ -1,29 +1,36 @@
+from functools import cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from shared.constants.callback_register import (
     CALLBACK_GET_LESSON,
+    CALLBACK_MATERIALS_INTENSIVE,
     BUTTON_TEXT_GET_LESSON,
-    ADMIN_USER_IDS,
-    CALLBACK_ADMIN_EXPORT_USERS,
-    CALLBACK_ADMIN_EXPORT_OFFERS,
-    BUTTON_TEXT_ADMIN_EXPORT_USERS,
-    BUTTON_TEXT_ADMIN_EXPORT_OFFERS
+    BUTTON_TEXT_MATERIALS
 )
+from shared.utils.get_admin_keyboard import get_admin_keyboard_rows
+from repository.entitlements import is_admin
 
 
-def get_welcome_keyboard(user_id: int = None):
+def get_welcome_keyboard(user_id: int = None, has_paid: bool = False):
     """Create keyboard for welcome message with 'забрать урок' button
+    If user has paid, also add MATERIALS button
     If user is admin, also add admin menu buttons
     """
+    return _build_welcome_keyboard(bool(user_id and is_admin(user_id)), bool(has_paid))
+
+
+@cache
+def _build_welcome_keyboard(is_admin: bool, has_paid: bool = False):
+    """Build welcome keyboard variant (once per is_admin / has_paid combination)"""
     keyboard = [
         [InlineKeyboardButton(BUTTON_TEXT_GET_LESSON, callback_data=CALLBACK_GET_LESSON)]
     ]
     
+    # Add materials button if user has paid
+    if has_paid:
+        keyboard.append([InlineKeyboardButton(BUTTON_TEXT_MATERIALS, callback_data=CALLBACK_MATERIALS_INTENSIVE)])
+    
     # Add admin menu if user is admin
-    if user_id and user_id in ADMIN_USER_IDS:
-        keyboard.append([
-            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_USERS, callback_data=CALLBACK_ADMIN_EXPORT_USERS),
-            InlineKeyboardButton(BUTTON_TEXT_ADMIN_EXPORT_OFFERS, callback_data=CALLBACK_ADMIN_EXPORT_OFFERS)
-        ])
+    if is_admin:
+        keyboard.extend(get_admin_keyboard_rows())
     
     return InlineKeyboardMarkup(keyboard)
-
@@ -0,0 +1,153 @@
+"""
+Prometheus metrics.
+
+Metrics are collected in the default prometheus_client registry and
+served in Prometheus text format by start_metrics_server on
+METRICS_LISTEN:METRICS_PORT (disabled when METRICS_PORT is 0).
+
+Label values must come from small fixed sets (router keys, commands,
+reminder types, error class names) - never user ids or free text.
+"""
+import functools
+import logging
+import time
+from typing import Awaitable, Callable
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Handler latencies are dominated by Telegram API calls and DB round-trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Exports and reminder ticks take seconds to minutes
+LONG_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent handling an update, by callback router key or command",
+    ["handler"],
+    buckets=LATENCY_BUCKETS
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Handler calls that raised, by handler and error class",
+    ["handler", "error"]
+)
+TELEGRAM_API_DURATION = Histogram(
+    "bot_telegram_api_duration_seconds",
+    "Telegram Bot API request latency, by API method",
+    ["method"],
+    buckets=LATENCY_BUCKETS
+)
+MESSAGES_SENT = Counter(
+    "bot_messages_total",
+    "Results of send_message_with_error_handling, by reminder type and outcome (ok or error class)",
+    ["reminder_type", "outcome"]
+)
+REMINDER_TICK_DURATION = Histogram(
+    "bot_reminder_tick_duration_seconds",
+    "Duration of a reminder job run, including sends",
+    ["job"],
+    buckets=LONG_BUCKETS
+)
+REMINDERS_DUE = Gauge(
+    "bot_reminders_due",
+    "Reminders found due by the last run of the reminder job",
+    ["job"]
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "bot_db_pool_checkout_wait_seconds",
+    "Time waiting for a connection from the async database pool (includes connecting)",
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    "bot_db_query_duration_seconds",
+    "Duration of a single SQL statement",
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERIES_PER_SCOPE = Histogram(
+    "bot_db_queries_per_scope",
+    "SQL statements run while handling one update or job run, by handler or job",
+    ["scope"],
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 500)
+)
+DB_TIME_PER_SCOPE = Histogram(
+    "bot_db_time_per_scope_seconds",
+    "Total SQL statement time of one update or job run, by handler or job",
+    ["scope"],
+    buckets=LATENCY_BUCKETS
+)
+EXPORT_DURATION = Histogram(
+    "bot_export_duration_seconds",
+    "Time building an admin export file",
+    ["table", "format"],
+    buckets=LONG_BUCKETS
+)
+
+
+def timed_handler(name: str, handler: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    """Wrap handler to record its duration and errors under name"""
+    # db.instrumentation imports this module
+    from db.instrumentation import set_query_scope_name
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        set_query_scope_name(name)
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception as e:
+            HANDLER_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            HANDLER_DURATION.labels(name).observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def timed_job(name: str):
+    """
+    Decorator recording duration of JobQueue callback runs as REMINDER_TICK_DURATION{job=name}.
+    Queries of a run are attributed to name (see db.instrumentation.query_scope).
+    """
+    # db.instrumentation imports this module
+    from db.instrumentation import query_scope
+
+    def decorator(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with query_scope(name), REMINDER_TICK_DURATION.labels(name).time():
+                return await func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest recording latency of every Bot API call"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs) -> tuple[int, bytes]:
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            # url ends with the API method name, e.g. .../bot<token>/sendMessage
+            TELEGRAM_API_DURATION.labels(url.rsplit("/", 1)[-1]).observe(time.perf_counter() - started)
+
+
+def start_metrics_server(port: int, addr: str = "127.0.0.1") -> bool:
+    """
+    Serve metrics over HTTP in a background thread.
+
+    Returns:
+        True if the server is running, False if disabled (port 0) or it couldn't start
+    """
+    if not port:
+        return False
+    try:
+        start_http_server(port, addr=addr)
+    except OSError as e:
+        logger.error(f"Could not start metrics server on {addr}:{port}: {e}")
+        return False
+    logger.info(f"Serving metrics on http://{addr}:{port}/metrics")
+    return True
@@ -7,6 +7,7 @@ Telegram API errors in a consistent way across the application.
 from telegram.error import TelegramError, NetworkError, TimedOut, RetryAfter, BadRequest
 from typing import Callable, Any, Optional
 import logging
+from shared.utils.metrics import MESSAGES_SENT
 
 logger = logging.getLogger(__name__)
 
@@ -32,22 +33,32 @@ async def send_message_with_error_handling(
     
     Returns:
         True if message was sent successfully, False otherwise
+    
+    Raises:
+        RetryAfter, NetworkError, TimedOut: transient errors are re-raised so the
+            broadcast engine (scheduler/broadcast.py) can requeue the send
     """
     try:
-        await send_func(*args, **kwargs)
+        try:
+            await send_func(*args, **kwargs)
+        except Exception as e:
+            MESSAGES_SENT.labels(reminder_type, type(e).__name__).inc()
+            raise
+        MESSAGES_SENT.labels(reminder_type, "ok").inc()
         logger.info(f"Sent {reminder_type} to user_id={user_id}")
         return True
-    except (NetworkError, TimedOut) as e:
-        logger.warning(f"Network error sending {reminder_type} to user_id={user_id}: {e}")
-        return False
-    except RetryAfter as e:
-        logger.warning(f"Rate limit sending {reminder_type} to user_id={user_id}: {e}")
-        return False
     except BadRequest as e:
+        # BadRequest subclasses NetworkError, so it must be handled first
         logger.error(f"Bad request sending {reminder_type} to user_id={user_id}: {e}")
         if message_text is not None:
             logger.error(f"Message text length: {len(message_text)}")
         return False
+    except (NetworkError, TimedOut) as e:
+        logger.warning(f"Network error sending {reminder_type} to user_id={user_id}: {e}")
+        raise
+    except RetryAfter as e:
+        logger.warning(f"Rate limit sending {reminder_type} to user_id={user_id}: {e}")
+        raise
     except TelegramError as e:
         logger.error(f"Failed to send {reminder_type} to user_id={user_id}: {e}", exc_info=True)
         return False
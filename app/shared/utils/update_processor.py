@@ -0,0 +1,88 @@
+"""
+Update processor that handles updates concurrently but keeps per-user order.
+
+With plain concurrent_updates two updates of the same user can run at the
+same time, e.g. the promocode text and the following "pay" button click,
+and the ConversationHandler state and context.user_data (discount) would
+race. Updates are therefore serialized per effective_user.id (or chat id
+for updates without a user), while updates of different users run in
+parallel up to max_concurrent_updates. An update waits for its user's
+previous updates before taking one of these slots, so a burst of updates
+from one user occupies a single slot and doesn't block other users.
+
+PTB's own limit (BaseUpdateProcessor.max_concurrent_updates) is taken
+before do_process_update, i.e. before the per-user lock, so it is set to
+WAITING_UPDATES_PER_SLOT times the limit and only bounds the number of
+updates processing or waiting; processing is limited by a separate
+semaphore.
+
+Each update runs in a query scope (see db.instrumentation), named by the
+handler that processes it.
+"""
+import asyncio
+from typing import Any, Awaitable, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from db.instrumentation import query_scope
+
+# Updates processing or waiting for their user, per processing slot
+WAITING_UPDATES_PER_SLOT = 4
+
+
+def get_update_key(update: object) -> Optional[int]:
+    """Get id updates are serialized by (None if the update has no user or chat)"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently, one at a time per user"""
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates * WAITING_UPDATES_PER_SLOT)
+        self._processing = asyncio.Semaphore(max_concurrent_updates)
+        # key -> (lock, number of updates holding or waiting for it)
+        self._locks: dict[int, tuple[asyncio.Lock, int]] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Wait for the user's previous updates, then for a free slot, and process update"""
+        key = get_update_key(update)
+        if key is None:
+            await self._process(coroutine)
+            return
+
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, so updates keep their order
+            async with lock:
+                await self._process(coroutine)
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                # Nobody else is waiting: drop the lock so the dict doesn't grow with every user
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    async def _process(self, coroutine: Awaitable[Any]):
+        async with self._processing:
+            with query_scope("update"):
+                await coroutine
+
+    def get_active_user_count(self) -> int:
+        """Number of users whose updates are being processed or waiting"""
+        return len(self._locks)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,48 @@
+"""
+Test setup: modules are imported from app/, as the bot runs them.
+
+Run from the project root: python -m pytest
+Tests using the database fixture need a Postgres database at DATABASE_URL
+with the bot's tables (db.init_db.init_db) and are skipped when it
+isn't reachable.
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+os.environ.setdefault("TELEGRAM_TOKEN", "123:test")
+
+import pytest
+
+
+@pytest.fixture
+def run():
+    """Run coroutine in a new event loop, disposing async DB connections opened in it"""
+    from db.session import dispose_async_engine
+
+    async def run_and_dispose(coroutine):
+        try:
+            return await coroutine
+        finally:
+            await dispose_async_engine()
+
+    return lambda coroutine: asyncio.run(run_and_dispose(coroutine))
+
+
+@pytest.fixture
+def database():
+    """Skip test if the database isn't available"""
+    from sqlalchemy import text
+    from db.session import get_engine
+
+    engine = get_engine()
+    if engine is None:
+        pytest.skip("Database engine is not configured")
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1 FROM scheduled_reminders LIMIT 1"))
+    except Exception as e:
+        pytest.skip(f"Database is not available: {e}")
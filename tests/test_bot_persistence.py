@@ -0,0 +1,191 @@
+import asyncio
+import pytest
+from telegram.ext import ApplicationBuilder
+from repository import bot_persistence
+from repository.bot_persistence import DatabasePersistence, KIND_USER_DATA
+
+USER_ID = 1001
+ENTRY = (KIND_USER_DATA, str(USER_ID))
+
+
+@pytest.fixture
+def no_database(monkeypatch):
+    def unavailable():
+        raise RuntimeError("database is not available")
+    monkeypatch.setattr(bot_persistence, "get_async_db_session", unavailable)
+
+
+def _loaded_application(persistence: DatabasePersistence, user_data: dict):
+    application = ApplicationBuilder().token("123:test").persistence(persistence).build()
+    application.user_data[USER_ID].update(user_data)
+    persistence._last_seen[USER_ID] = 0.0
+    persistence._persisted[USER_ID] = bot_persistence._serialize({"step": "old"})
+    return application
+
+
+def test_refresh_after_eviction_loads_staged_data(no_database, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        application = _loaded_application(persistence, {"step": "new"})
+
+        assert persistence.evict_idle_users(application, max_idle=0) == 1
+        assert persistence._pending[ENTRY] == {"step": "new"}
+        # PTB passes the eviction to persistence, the entry isn't written yet
+        await persistence.drop_user_data(USER_ID)
+
+        user_data = {}
+        await persistence.refresh_user_data(USER_ID, user_data)
+        assert user_data == {"step": "new"}
+
+        # The staged value is the baseline: an unchanged user_data isn't written again,
+        # a changed one replaces the staged value
+        persistence._pending.clear()
+        await persistence.update_user_data(USER_ID, {"step": "new"})
+        assert ENTRY not in persistence._pending
+        await persistence.update_user_data(USER_ID, {"step": "newer"})
+        assert persistence._pending[ENTRY] == {"step": "newer"}
+        persistence._flush_task.cancel()
+
+    run(scenario())
+
+
+def test_refresh_while_entry_is_written_loads_written_data(monkeypatch, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        persistence._pending[ENTRY] = {"step": "new"}
+        writing = asyncio.Event()
+        release = asyncio.Event()
+
+        class Session:
+            async def close(self):
+                pass
+
+        async def write_persistence_entries(db, upserts, deletes):
+            writing.set()
+            await release.wait()
+
+        monkeypatch.setattr(bot_persistence, "get_async_db_session", Session)
+        monkeypatch.setattr(bot_persistence, "write_persistence_entries", write_persistence_entries)
+
+        write = asyncio.create_task(persistence._write_batch())
+        await writing.wait()
+        user_data = {}
+        await persistence.refresh_user_data(USER_ID, user_data)
+        release.set()
+
+        assert await write
+        assert user_data == {"step": "new"}
+        assert persistence._writing == {}
+
+    run(scenario())
+
+
+def test_refresh_after_deleted_user_loads_nothing(no_database, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        persistence._pending[ENTRY] = None
+        user_data = {}
+        await persistence.refresh_user_data(USER_ID, user_data)
+        assert user_data == {}
+        assert USER_ID in persistence._persisted
+
+    run(scenario())
+
+
+class FakeWriter:
+    """write_persistence_entries recording written batches, failing while error is set"""
+
+    def __init__(self):
+        self.batches: list[tuple[dict, list]] = []
+        self.error: Exception | None = None
+        self.started = asyncio.Event()
+        self.release: asyncio.Event | None = None
+
+    async def __call__(self, db, upserts, deletes):
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        self.batches.append(({(row["kind"], row["key"]): row["data"] for row in upserts}, list(deletes)))
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    class Session:
+        async def close(self):
+            pass
+
+    writer = FakeWriter()
+    monkeypatch.setattr(bot_persistence, "get_async_db_session", Session)
+    monkeypatch.setattr(bot_persistence, "write_persistence_entries", writer)
+    monkeypatch.setattr(bot_persistence, "FLUSH_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(bot_persistence, "FLUSH_RETRY_SECONDS", 0.01)
+    return writer
+
+
+def test_failed_write_keeps_value_queued_meanwhile(writer, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        persistence._pending[ENTRY] = {"step": "old"}
+        writer.error = RuntimeError("database is not available")
+        writer.release = asyncio.Event()
+
+        write = asyncio.create_task(persistence._write_batch())
+        await writer.started.wait()
+        persistence._pending[ENTRY] = {"step": "new"}
+        writer.release.set()
+        assert not await write
+        assert persistence._pending == {ENTRY: {"step": "new"}}
+
+        writer.release = None
+        persistence._pending[ENTRY] = None
+        assert not await persistence._write_batch()
+        assert persistence._pending == {ENTRY: None}
+
+    run(scenario())
+
+
+def test_flush_loop_retries_failed_write(writer, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        writer.error = RuntimeError("database is not available")
+        persistence._enqueue(ENTRY, {"step": "new"})
+        await writer.started.wait()
+        await asyncio.sleep(0.02)
+        assert not writer.batches and ENTRY in persistence._pending
+
+        writer.error = None
+        await persistence._flush_task
+        assert writer.batches == [({ENTRY: {"step": "new"}}, [])]
+        assert persistence._pending == {}
+
+    run(scenario())
+
+
+def test_flush_on_shutdown_writes_cancelled_batch(writer, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        writer.release = asyncio.Event()
+        persistence._enqueue(ENTRY, {"step": "new"})
+        await writer.started.wait()
+
+        # The in-flight write is cancelled and its entries written again
+        writer.release = None
+        await persistence.flush()
+        assert writer.batches == [({ENTRY: {"step": "new"}}, [])]
+        assert persistence._pending == {} and persistence._flush_task is None
+
+    run(scenario())
+
+
+def test_flush_on_shutdown_gives_up_without_database(writer, run):
+    async def scenario():
+        persistence = DatabasePersistence()
+        writer.error = RuntimeError("database is not available")
+        persistence._pending[ENTRY] = {"step": "new"}
+        await persistence.flush()
+        assert persistence._pending == {}
+        assert len(writer.batches) == 0
+
+    run(scenario())
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from scheduler.broadcast import BroadcastEngine, TokenBucket
+
+
+def test_try_acquire_does_not_wait(run):
+    async def scenario():
+        bucket = TokenBucket(10, capacity=1)
+        assert bucket.try_acquire() == 0
+        wait = bucket.try_acquire()
+        assert 0 < wait <= 0.1
+        bucket.pause(1)
+        assert bucket.try_acquire() > 0.9
+
+    run(scenario())
+
+
+def test_repeat_recipient_does_not_hold_workers(run):
+    async def scenario():
+        engine = BroadcastEngine(workers=2, global_rate=1000, per_chat_rate=5)
+        sent_at = {}
+        started = time.perf_counter()
+
+        async def send(chat_id: int, number: int):
+            sent_at[chat_id, number] = time.perf_counter() - started
+            return True
+
+        # Chat 1 gets 5 messages (one per 0.2s), queued before 20 other chats
+        futures = [await engine.submit(1, send, 1, number) for number in range(5)]
+        futures += [await engine.submit(chat_id, send, chat_id, 0) for chat_id in range(2, 22)]
+        try:
+            assert all(await asyncio.gather(*futures))
+        finally:
+            await engine.shutdown()
+
+        other_chats_done = max(sent_at[chat_id, 0] for chat_id in range(2, 22))
+        assert other_chats_done < 0.1
+        chat_1 = sorted(sent_at[1, number] for number in range(5))
+        assert chat_1[-1] >= 0.75
+        assert all(later - earlier >= 0.15 for earlier, later in zip(chat_1, chat_1[1:]))
+
+    run(scenario())
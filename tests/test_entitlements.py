@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from repository import entitlements
+from repository.entitlements import EntitlementCache, is_admin
+
+
+class Session:
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_database(monkeypatch):
+    """Entitlement rows of a fake database: telegram_id -> row"""
+    state = SimpleNamespace(rows={}, loads=0, loading=None)
+
+    async def get_user_entitlements(db, telegram_id):
+        state.loads += 1
+        row = state.rows.get(telegram_id)
+        if state.loading is not None:
+            # Let the test change the data while this query is in flight
+            await state.loading.wait()
+        return row
+
+    monkeypatch.setattr(entitlements, "get_async_db_session", Session)
+    monkeypatch.setattr(entitlements, "get_user_entitlements", get_user_entitlements)
+    return state
+
+
+def _row(has_paid: bool = False, expires_in: timedelta = None):
+    expires_at = datetime.now(timezone.utc) + expires_in if expires_in is not None else None
+    return SimpleNamespace(has_paid=has_paid, active_offer_expires_at=expires_at)
+
+
+def test_is_admin(monkeypatch):
+    monkeypatch.setattr(entitlements, "ADMIN_USER_IDS", frozenset({1}))
+    assert is_admin(1)
+    assert not is_admin(2)
+
+
+def test_entitlements_are_cached_until_invalidated(fake_database, run):
+    cache = EntitlementCache()
+    fake_database.rows[1] = _row(expires_in=timedelta(days=1))
+
+    async def scenario():
+        assert (await cache.get(1)).has_active_offer()
+        fake_database.rows[1] = _row(has_paid=True)
+        assert not (await cache.get(1)).has_paid
+        assert fake_database.loads == 1
+
+        cache.invalidate(1)
+        current = await cache.get(1)
+        assert current.has_paid and not current.has_active_offer()
+        assert fake_database.loads == 2
+
+        # Unknown user
+        assert await cache.get(2) == entitlements.Entitlements()
+
+    run(scenario())
+
+
+def test_expired_entries_are_reloaded(fake_database, run):
+    cache = EntitlementCache(ttl=0)
+    fake_database.rows[1] = _row()
+
+    async def scenario():
+        await cache.get(1)
+        await cache.get(1)
+
+    run(scenario())
+    assert fake_database.loads == 2
+
+
+def test_invalidation_during_load_is_not_lost(fake_database, run):
+    cache = EntitlementCache()
+    fake_database.rows[1] = _row()
+
+    async def scenario():
+        fake_database.loading = asyncio.Event()
+        load = asyncio.create_task(cache.get(1))
+        await asyncio.sleep(0)
+        # Payment recorded while the old row is being loaded
+        fake_database.rows[1] = _row(has_paid=True)
+        cache.invalidate(1)
+        fake_database.loading.set()
+        assert not (await load).has_paid
+
+        fake_database.loading = None
+        assert (await cache.get(1)).has_paid
+
+    run(scenario())
+
+
+def test_least_recently_used_users_are_evicted(fake_database, run):
+    cache = EntitlementCache(max_size=2)
+
+    async def scenario():
+        for telegram_id in (1, 2, 1, 3):
+            await cache.get(telegram_id)
+
+    run(scenario())
+    assert list(cache._entries) == [1, 3]
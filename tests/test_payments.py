@@ -0,0 +1,162 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import delete, func, insert, select
+from db.models import Offer, Payment, ScheduledReminder, User
+from db.repository import (
+    record_payment,
+    schedule_reminders,
+    claim_due_reminders,
+    REMINDER_STATUS_PENDING,
+    REMINDER_STATUS_PROCESSING,
+    REMINDER_STATUS_CANCELLED
+)
+from db.session import get_async_db_session
+from scheduler.job_queue_reminders import ReminderJobRegistry
+
+TELEGRAM_IDS = [990000201, 990000202]
+
+
+@pytest.fixture
+def users(database, run):
+    """telegram_id -> user id of test users with an active offer; their rows are deleted after the test"""
+    async def cleanup():
+        db = get_async_db_session()
+        try:
+            user_ids = select(User.id).where(User.telegram_id.in_(TELEGRAM_IDS))
+            await db.execute(delete(ScheduledReminder).where(ScheduledReminder.telegram_id.in_(TELEGRAM_IDS)))
+            await db.execute(delete(Payment).where(Payment.telegram_id.in_(TELEGRAM_IDS)))
+            await db.execute(delete(Offer).where(Offer.user_id.in_(user_ids)))
+            await db.execute(delete(User).where(User.telegram_id.in_(TELEGRAM_IDS)))
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def create():
+        db = get_async_db_session()
+        try:
+            result = await db.execute(
+                insert(User).values([{"telegram_id": telegram_id} for telegram_id in TELEGRAM_IDS])
+                .returning(User.telegram_id, User.id)
+            )
+            user_ids = dict(result.all())
+            await db.execute(insert(Offer), [
+                {"user_id": user_id, "offer_expiration_date": datetime.now(timezone.utc) + timedelta(days=1)}
+                for user_id in user_ids.values()
+            ])
+            await db.commit()
+            return user_ids
+        finally:
+            await db.close()
+
+    run(cleanup())
+    yield run(create())
+    run(cleanup())
+
+
+async def _record(user_id: int, telegram_id: int, charge_id: str) -> bool:
+    db = get_async_db_session()
+    try:
+        return await record_payment(
+            db,
+            user_id=user_id,
+            telegram_id=telegram_id,
+            invoice_payload="test",
+            currency="BYN",
+            total_amount=100,
+            telegram_payment_charge_id=charge_id,
+            provider_payment_charge_id=None
+        )
+    finally:
+        await db.close()
+
+
+async def _count_payments(telegram_id: int) -> int:
+    db = get_async_db_session()
+    try:
+        return await db.scalar(select(func.count()).select_from(Payment).where(Payment.telegram_id == telegram_id))
+    finally:
+        await db.close()
+
+
+def test_duplicate_delivery_is_recorded_once(users, run):
+    telegram_id = TELEGRAM_IDS[0]
+
+    async def scenario():
+        assert await _record(users[telegram_id], telegram_id, "test-charge")
+        assert not await _record(users[telegram_id], telegram_id, "test-charge")
+        assert await _count_payments(telegram_id) == 1
+
+    run(scenario())
+
+
+def test_concurrent_deliveries_are_recorded_once(users, run):
+    telegram_id = TELEGRAM_IDS[0]
+
+    async def scenario():
+        results = await asyncio.gather(*(
+            _record(users[telegram_id], telegram_id, "test-charge") for _ in range(5)
+        ))
+        assert sorted(results) == [False] * 4 + [True]
+        assert await _count_payments(telegram_id) == 1
+
+    run(scenario())
+
+
+def test_payment_deactivates_offer_and_cancels_pending_reminders(users, run):
+    paying, other = TELEGRAM_IDS
+
+    async def scenario():
+        db = get_async_db_session()
+        try:
+            await schedule_reminders(db, [
+                {"telegram_id": paying, "kind": "first_fallback", "delay_seconds": -1},
+                {"telegram_id": paying, "kind": "second_fallback", "delay_seconds": 3600},
+                {"telegram_id": other, "kind": "second_fallback", "delay_seconds": 3600},
+            ])
+            # Being sent right now, the poller sets its final status
+            claimed = [reminder.id for reminder in await claim_due_reminders(db) if reminder.telegram_id == paying]
+        finally:
+            await db.close()
+
+        assert await _record(users[paying], paying, "test-charge")
+
+        db = get_async_db_session()
+        try:
+            result = await db.execute(
+                select(ScheduledReminder.id, ScheduledReminder.telegram_id, ScheduledReminder.status)
+                .where(ScheduledReminder.telegram_id.in_(TELEGRAM_IDS))
+            )
+            statuses = {(row.telegram_id, row.id in claimed): row.status for row in result.all()}
+            assert statuses == {
+                (paying, True): REMINDER_STATUS_PROCESSING,
+                (paying, False): REMINDER_STATUS_CANCELLED,
+                (other, False): REMINDER_STATUS_PENDING,
+            }
+            result = await db.execute(select(Offer.user_id, Offer.is_active).where(Offer.user_id.in_(users.values())))
+            assert dict(result.all()) == {users[paying]: False, users[other]: True}
+        finally:
+            await db.close()
+
+    run(scenario())
+
+
+def test_registry_cancels_only_user_jobs():
+    registry = ReminderJobRegistry()
+    removed = []
+
+    def job(name):
+        return SimpleNamespace(schedule_removal=lambda: removed.append(name))
+
+    first, second, other = job("first"), job("second"), job("other")
+    registry.add(1, first)
+    registry.add(1, second)
+    registry.add(2, other)
+    # First job has already run
+    registry.discard(1, first)
+
+    assert registry.cancel(1) == 1
+    assert removed == ["second"]
+    assert registry.cancel(1) == 0
+    assert len(registry) == 1
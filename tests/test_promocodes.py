@@ -0,0 +1,252 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import delete, insert, select
+from db.models import Payment, Promocode, PromocodeRedemption, User
+from db.repository import can_redeem_promocode, record_payment
+from db.session import get_async_db_session
+from repository import promocodes
+from repository.promocodes import PromocodeIndex, PromocodesUnavailableError
+
+
+class Session:
+    async def close(self):
+        pass
+
+
+def _promocode(**values):
+    row = dict(
+        id=1, code="test", discount_value="10%", is_active=True, requires_active_offer=False,
+        valid_from=None, valid_until=None, max_redemptions=None, max_redemptions_per_user=None,
+        redemptions_count=0
+    )
+    row.update(values)
+    return SimpleNamespace(**row)
+
+
+@pytest.fixture
+def fake_database(monkeypatch):
+    """Promocodes table and redemption check of a fake database"""
+    state = SimpleNamespace(available=True, promocodes=[_promocode()], loads=0, can_redeem=True, delay=0)
+
+    def get_async_db_session():
+        if not state.available:
+            raise RuntimeError("database is not available")
+        return Session()
+
+    async def get_promocodes(db):
+        state.loads += 1
+        return state.promocodes
+
+    async def can_redeem_promocode_in_db(db, promocode_id, telegram_id):
+        await asyncio.sleep(state.delay)
+        return state.can_redeem
+
+    monkeypatch.setattr(promocodes, "get_async_db_session", get_async_db_session)
+    monkeypatch.setattr(promocodes, "get_promocodes", get_promocodes)
+    monkeypatch.setattr(promocodes, "can_redeem_promocode_in_db", can_redeem_promocode_in_db)
+    return state
+
+
+def test_failed_first_load_is_not_an_empty_index(fake_database, monkeypatch, run):
+    monkeypatch.setattr(promocodes, "LOAD_RETRY_SECONDS", 0)
+    fake_database.available = False
+    index = PromocodeIndex()
+
+    with pytest.raises(PromocodesUnavailableError):
+        run(index.get("TEST"))
+
+    # Retried on the next lookup after LOAD_RETRY_SECONDS, not after the refresh interval
+    fake_database.available = True
+    assert run(index.get(" test ")).id == 1
+    assert run(index.get("MISSING")) is None
+
+
+def test_failed_reload_keeps_loaded_promocodes(fake_database, run):
+    index = PromocodeIndex(refresh_interval=0)
+    run(index.get("TEST"))
+    fake_database.available = False
+    assert run(index.get("TEST")).id == 1
+
+
+def test_invalidate_reloads_on_next_lookup(fake_database, run):
+    index = PromocodeIndex()
+    run(index.get("TEST"))
+    run(index.get("TEST"))
+    assert fake_database.loads == 1
+
+    fake_database.promocodes = [_promocode(is_active=False)]
+    index.invalidate()
+    assert not run(index.get("TEST")).is_available()
+    assert fake_database.loads == 2
+
+
+def test_can_redeem_checks_limits_in_database(fake_database, run):
+    index = PromocodeIndex()
+    assert run(index.can_redeem("TEST", 1))
+    fake_database.can_redeem = False
+    assert not run(index.can_redeem("TEST", 1))
+    assert not run(index.can_redeem("MISSING", 1))
+
+
+def test_can_redeem_approves_when_database_is_not_available(fake_database, monkeypatch, run):
+    monkeypatch.setattr(promocodes, "LOAD_RETRY_SECONDS", 0)
+    fake_database.can_redeem = False
+    index = PromocodeIndex()
+
+    # Never loaded
+    fake_database.available = False
+    assert run(index.can_redeem("TEST", 1))
+
+    # Loaded, limit check fails
+    fake_database.available = True
+    run(index.get("TEST"))
+    fake_database.available = False
+    assert run(index.can_redeem("TEST", 1))
+
+
+def test_can_redeem_approves_when_limit_check_is_slow(fake_database, monkeypatch, run):
+    monkeypatch.setattr(promocodes, "REDEEM_CHECK_TIMEOUT_SECONDS", 0.01)
+    fake_database.can_redeem = False
+    fake_database.delay = 1
+    assert run(PromocodeIndex().can_redeem("TEST", 1))
+
+
+# Redemption limits in the database
+
+TELEGRAM_IDS = [990000101, 990000102]
+TEST_CODE_PREFIX = "TESTLIMIT"
+
+
+@pytest.fixture
+def promocode_db(database, run):
+    """Creates test promocodes and users; their payments and redemptions are deleted after the test"""
+    async def cleanup():
+        db = get_async_db_session()
+        try:
+            test_promocodes = select(Promocode.id).where(Promocode.code.like(f"{TEST_CODE_PREFIX}%"))
+            await db.execute(delete(PromocodeRedemption).where(PromocodeRedemption.promocode_id.in_(test_promocodes)))
+            await db.execute(delete(Promocode).where(Promocode.code.like(f"{TEST_CODE_PREFIX}%")))
+            await db.execute(delete(Payment).where(Payment.telegram_id.in_(TELEGRAM_IDS)))
+            await db.execute(delete(User).where(User.telegram_id.in_(TELEGRAM_IDS)))
+            await db.commit()
+        finally:
+            await db.close()
+
+    codes = itertools.count()
+
+    async def create_promocode(**values) -> int:
+        db = get_async_db_session()
+        try:
+            promocode_id = await db.scalar(
+                insert(Promocode)
+                .values(code=f"{TEST_CODE_PREFIX}{next(codes)}", discount_value="10%", **values)
+                .returning(Promocode.id)
+            )
+            await db.commit()
+            return promocode_id
+        finally:
+            await db.close()
+
+    async def create_users() -> dict[int, int]:
+        db = get_async_db_session()
+        try:
+            result = await db.execute(
+                insert(User).values([{"telegram_id": telegram_id} for telegram_id in TELEGRAM_IDS])
+                .returning(User.telegram_id, User.id)
+            )
+            user_ids = dict(result.all())
+            await db.commit()
+            return user_ids
+        finally:
+            await db.close()
+
+    async def redemptions_count(promocode_id: int) -> int:
+        db = get_async_db_session()
+        try:
+            return await db.scalar(select(Promocode.redemptions_count).where(Promocode.id == promocode_id))
+        finally:
+            await db.close()
+
+    run(cleanup())
+    yield SimpleNamespace(
+        create_promocode=create_promocode,
+        create_users=create_users,
+        redemptions_count=redemptions_count
+    )
+    run(cleanup())
+
+
+async def _pay(promocode_id: int, user_id: int, telegram_id: int, charge_id: str) -> tuple[bool, bool]:
+    """Pre-checkout check and payment, returns (could redeem, payment recorded)"""
+    db = get_async_db_session()
+    try:
+        could_redeem = await can_redeem_promocode(db, promocode_id, telegram_id)
+        recorded = await record_payment(
+            db,
+            promocode_id=promocode_id,
+            user_id=user_id,
+            telegram_id=telegram_id,
+            invoice_payload="test",
+            currency="BYN",
+            total_amount=100,
+            promocode="TEST",
+            telegram_payment_charge_id=charge_id,
+            provider_payment_charge_id=None
+        )
+        return could_redeem, recorded
+    finally:
+        await db.close()
+
+
+def test_validity_window_is_checked_in_database(promocode_db, run):
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        windows = {
+            (now - timedelta(hours=1), now + timedelta(hours=1)): True,
+            (None, now - timedelta(minutes=1)): False,
+            (now + timedelta(hours=1), None): False,
+        }
+        db = get_async_db_session()
+        try:
+            for (valid_from, valid_until), expected in windows.items():
+                promocode_id = await promocode_db.create_promocode(valid_from=valid_from, valid_until=valid_until)
+                assert await can_redeem_promocode(db, promocode_id, TELEGRAM_IDS[0]) is expected
+        finally:
+            await db.close()
+
+    run(scenario())
+
+
+def test_redemption_is_counted_once_per_payment(promocode_db, run):
+    async def scenario():
+        user_ids = await promocode_db.create_users()
+        promocode_id = await promocode_db.create_promocode(max_redemptions_per_user=1)
+        telegram_id = TELEGRAM_IDS[0]
+
+        assert await _pay(promocode_id, user_ids[telegram_id], telegram_id, "test-charge-1") == (True, True)
+        # Duplicate delivery of the same payment
+        assert await _pay(promocode_id, user_ids[telegram_id], telegram_id, "test-charge-1") == (False, False)
+        # Per-user limit reached: pre-checkout declines, a payment that got through anyway is kept
+        assert await _pay(promocode_id, user_ids[telegram_id], telegram_id, "test-charge-2") == (False, True)
+        assert await promocode_db.redemptions_count(promocode_id) == 1
+
+    run(scenario())
+
+
+def test_concurrent_payments_do_not_exceed_max_redemptions(promocode_db, run):
+    async def scenario():
+        user_ids = await promocode_db.create_users()
+        promocode_id = await promocode_db.create_promocode(max_redemptions=1)
+
+        # Both users passed pre-checkout before either payment was recorded
+        results = await asyncio.gather(*(
+            _pay(promocode_id, user_ids[telegram_id], telegram_id, f"test-charge-{telegram_id}")
+            for telegram_id in TELEGRAM_IDS
+        ))
+        assert all(recorded for _, recorded in results)
+        assert await promocode_db.redemptions_count(promocode_id) == 1
+
+    run(scenario())
@@ -0,0 +1,216 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import delete, insert, select, update
+from telegram.error import BadRequest
+from db.models import Offer, ScheduledReminder, User
+from db.repository import (
+    schedule_reminders,
+    claim_due_reminders,
+    complete_scheduled_reminders,
+    release_claimed_reminders,
+    cancel_scheduled_reminders,
+    purge_finished_reminders,
+    REMINDER_STATUS_PENDING,
+    REMINDER_STATUS_PROCESSING,
+    REMINDER_STATUS_SENT,
+    REMINDER_STATUS_FAILED,
+    REMINDER_STATUS_CANCELLED
+)
+from db.session import get_async_db_session
+from scheduler.broadcast import shutdown_broadcast_engine
+from scheduler.reminders.lead_magnet.special_offer import REMINDER_KIND_SPECIAL_OFFER
+from scheduler.reminders.scheduled import process_scheduled_reminders
+
+TELEGRAM_IDS = [990000001, 990000002, 990000003]
+
+
+@pytest.fixture
+def session(database, run):
+    """Async session factory; rows of TELEGRAM_IDS are deleted before and after the test"""
+    async def cleanup():
+        db = get_async_db_session()
+        try:
+            await db.execute(delete(ScheduledReminder).where(ScheduledReminder.telegram_id.in_(TELEGRAM_IDS)))
+            user_ids = select(User.id).where(User.telegram_id.in_(TELEGRAM_IDS))
+            await db.execute(delete(Offer).where(Offer.user_id.in_(user_ids)))
+            await db.execute(delete(User).where(User.telegram_id.in_(TELEGRAM_IDS)))
+            await db.commit()
+        finally:
+            await db.close()
+
+    run(cleanup())
+    yield get_async_db_session
+    run(cleanup())
+
+
+async def _statuses(db) -> dict[int, str]:
+    result = await db.execute(
+        select(ScheduledReminder.id, ScheduledReminder.status)
+        .where(ScheduledReminder.telegram_id.in_(TELEGRAM_IDS))
+    )
+    return dict(result.all())
+
+
+async def _create_offer(db, telegram_id: int, is_active: bool = True) -> int:
+    user_id = (await db.execute(insert(User).values(telegram_id=telegram_id).returning(User.id))).scalar()
+    offer_id = (await db.execute(
+        insert(Offer).values(
+            user_id=user_id,
+            is_active=is_active,
+            offer_expiration_date=datetime.now(timezone.utc) + timedelta(days=1)
+        ).returning(Offer.id)
+    )).scalar()
+    await db.commit()
+    return offer_id
+
+
+def test_claim_only_due_reminders_once(session, run):
+    async def scenario():
+        db = session()
+        try:
+            await schedule_reminders(db, [
+                {"telegram_id": TELEGRAM_IDS[0], "kind": "first_fallback", "delay_seconds": -1},
+                {"telegram_id": TELEGRAM_IDS[1], "kind": "first_fallback", "delay_seconds": -1},
+                {"telegram_id": TELEGRAM_IDS[2], "kind": "first_fallback", "delay_seconds": 3600},
+            ])
+        finally:
+            await db.close()
+
+        # Concurrent pollers never claim the same row (FOR UPDATE SKIP LOCKED)
+        sessions = [session(), session()]
+        try:
+            claims = await asyncio.gather(*(claim_due_reminders(db) for db in sessions))
+        finally:
+            for db in sessions:
+                await db.close()
+        claimed = [reminder for claim in claims for reminder in claim if reminder.telegram_id in TELEGRAM_IDS]
+        assert sorted(reminder.telegram_id for reminder in claimed) == TELEGRAM_IDS[:2]
+
+        db = session()
+        try:
+            statuses = await _statuses(db)
+            assert sorted(statuses.values()) == [REMINDER_STATUS_PENDING] + [REMINDER_STATUS_PROCESSING] * 2
+
+            await complete_scheduled_reminders(db, [claimed[0].id], REMINDER_STATUS_SENT)
+            # A process stopped before completing the other one: it is sent again after restart
+            await release_claimed_reminders(db)
+            statuses = await _statuses(db)
+            assert statuses[claimed[0].id] == REMINDER_STATUS_SENT
+            assert statuses[claimed[1].id] == REMINDER_STATUS_PENDING
+            assert [reminder.id for reminder in await claim_due_reminders(db)] == [claimed[1].id]
+        finally:
+            await db.close()
+
+    run(scenario())
+
+
+def test_cancel_only_touches_pending_reminders(session, run):
+    async def scenario():
+        db = session()
+        try:
+            await schedule_reminders(db, [
+                {"telegram_id": TELEGRAM_IDS[0], "kind": "first_fallback", "delay_seconds": -1},
+                {"telegram_id": TELEGRAM_IDS[0], "kind": "second_fallback", "delay_seconds": 3600},
+            ])
+            claimed = await claim_due_reminders(db)
+            assert await cancel_scheduled_reminders(db, TELEGRAM_IDS[0]) == 1
+            statuses = await _statuses(db)
+            assert statuses.pop(claimed[0].id) == REMINDER_STATUS_PROCESSING
+            assert list(statuses.values()) == [REMINDER_STATUS_CANCELLED]
+        finally:
+            await db.close()
+
+    run(scenario())
+
+
+def test_purge_deletes_only_old_finished_reminders(session, run):
+    async def scenario():
+        db = session()
+        try:
+            await schedule_reminders(db, [
+                {"telegram_id": TELEGRAM_IDS[0], "kind": "first_fallback", "delay_seconds": 0}
+                for _ in range(5)
+            ])
+            ids = sorted(await _statuses(db))
+            old = datetime.now(timezone.utc) - timedelta(days=31)
+            for reminder_id, status in zip(ids, [
+                REMINDER_STATUS_SENT, REMINDER_STATUS_FAILED, REMINDER_STATUS_CANCELLED, REMINDER_STATUS_PENDING
+            ]):
+                await db.execute(
+                    update(ScheduledReminder)
+                    .where(ScheduledReminder.id == reminder_id)
+                    .values(status=status, created_at=old)
+                )
+            # Recent finished reminder
+            await db.execute(
+                update(ScheduledReminder).where(ScheduledReminder.id == ids[4]).values(status=REMINDER_STATUS_SENT)
+            )
+            await db.commit()
+
+            created_before = datetime.now(timezone.utc) - timedelta(days=30)
+            assert await purge_finished_reminders(db, created_before, limit=2) == 2
+            assert await purge_finished_reminders(db, created_before, limit=2) == 1
+            assert sorted(await _statuses(db)) == ids[3:]
+        finally:
+            await db.close()
+
+    run(scenario())
+
+
+class FakeBot:
+    def __init__(self, failing_chat_ids=()):
+        self.failing_chat_ids = set(failing_chat_ids)
+        self.sent_to = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.failing_chat_ids:
+            raise BadRequest("Chat not found")
+        self.sent_to.append(chat_id)
+
+
+def test_process_scheduled_reminders_sets_final_status(session, run):
+    async def scenario():
+        db = session()
+        try:
+            offer_ids = [
+                await _create_offer(db, TELEGRAM_IDS[0]),
+                await _create_offer(db, TELEGRAM_IDS[1], is_active=False),
+                await _create_offer(db, TELEGRAM_IDS[2]),
+            ]
+            await schedule_reminders(db, [
+                {"telegram_id": telegram_id, "offer_id": offer_id, "kind": REMINDER_KIND_SPECIAL_OFFER, "delay_seconds": -1}
+                for telegram_id, offer_id in zip(TELEGRAM_IDS, offer_ids)
+            ])
+        finally:
+            await db.close()
+
+        bot = FakeBot(failing_chat_ids=[TELEGRAM_IDS[2]])
+        try:
+            await process_scheduled_reminders(SimpleNamespace(bot=bot))
+        finally:
+            await shutdown_broadcast_engine()
+        assert bot.sent_to == [TELEGRAM_IDS[0]]
+
+        db = session()
+        try:
+            result = await db.execute(
+                select(ScheduledReminder.telegram_id, ScheduledReminder.status)
+                .where(
+                    ScheduledReminder.telegram_id.in_(TELEGRAM_IDS),
+                    ScheduledReminder.kind == REMINDER_KIND_SPECIAL_OFFER
+                )
+            )
+            assert dict(result.all()) == {
+                TELEGRAM_IDS[0]: REMINDER_STATUS_SENT,
+                # Offer was paid or expired after the reminder was scheduled
+                TELEGRAM_IDS[1]: REMINDER_STATUS_CANCELLED,
+                TELEGRAM_IDS[2]: REMINDER_STATUS_FAILED,
+            }
+            reminder_type = await db.scalar(select(Offer.reminder_type).where(Offer.id == offer_ids[0]))
+            assert reminder_type == REMINDER_KIND_SPECIAL_OFFER
+        finally:
+            await db.close()
+
+    run(scenario())
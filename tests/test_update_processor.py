@@ -0,0 +1,64 @@
+import asyncio
+import time
+from telegram import Chat, Message, Update, User
+from shared.utils.update_processor import PerUserUpdateProcessor, WAITING_UPDATES_PER_SLOT
+
+UPDATE_SECONDS = 0.05
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    return Update(
+        update_id,
+        message=Message(update_id, None, Chat(user_id, Chat.PRIVATE), from_user=User(user_id, "user", False))
+    )
+
+
+def test_burst_of_one_user_keeps_order_and_does_not_block_others(run):
+    async def scenario():
+        processor = PerUserUpdateProcessor(2)
+        processed = []
+        finished_at = {}
+        started = time.perf_counter()
+
+        async def handle(user_id: int, number: int):
+            await asyncio.sleep(UPDATE_SECONDS)
+            processed.append((user_id, number))
+            finished_at[user_id, number] = time.perf_counter() - started
+
+        # More updates than processing slots, within PTB's limit
+        burst = 2 * WAITING_UPDATES_PER_SLOT - 1
+        tasks = [
+            asyncio.create_task(processor.process_update(_update(number, 1), handle(1, number)))
+            for number in range(burst)
+        ]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(processor.process_update(_update(burst, 2), handle(2, 0))))
+        await asyncio.gather(*tasks)
+
+        assert [number for user_id, number in processed if user_id == 1] == list(range(burst))
+        # User 2 only waited for its own update, not for user 1's burst
+        assert finished_at[2, 0] < 2 * UPDATE_SECONDS
+        assert processor.get_active_user_count() == 0
+
+    run(scenario())
+
+
+def test_processing_is_limited_to_max_concurrent_updates(run):
+    async def scenario():
+        processor = PerUserUpdateProcessor(2)
+        running = 0
+        max_running = 0
+
+        async def handle():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(
+            processor.process_update(_update(user_id, user_id), handle()) for user_id in range(6)
+        ))
+        assert max_running == 2
+
+    run(scenario())
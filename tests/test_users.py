@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from telegram import User as TelegramUser
+from repository.users import UserCache
+
+
+class FakeUpserts:
+    """UserCache._upsert writing to a dict, telegram_id -> database id"""
+
+    def __init__(self):
+        self.ids: dict[int, int] = {}
+        self.batches: list[list[dict]] = []
+        self.error: Exception | None = None
+
+    async def __call__(self, profiles: list[dict]) -> list:
+        self.batches.append(profiles)
+        if self.error is not None:
+            raise self.error
+        rows = []
+        for profile in profiles:
+            inserted = profile["telegram_id"] not in self.ids
+            user_id = self.ids.setdefault(profile["telegram_id"], len(self.ids) + 1)
+            rows.append(SimpleNamespace(id=user_id, telegram_id=profile["telegram_id"], inserted=inserted))
+        return rows
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = UserCache(flush_interval=0)
+    upserts = FakeUpserts()
+    monkeypatch.setattr(cache, "_upsert", upserts)
+    return cache, upserts
+
+
+def _user(telegram_id: int, first_name: str = "Anna") -> TelegramUser:
+    return TelegramUser(telegram_id, first_name, False)
+
+
+def test_new_users_are_created_by_one_upsert(cache, run):
+    cache, upserts = cache
+
+    async def scenario():
+        return await asyncio.gather(
+            cache.get_user_id(_user(1)), cache.get_user_id(_user(2)), cache.get_user_id(_user(1))
+        )
+
+    assert run(scenario()) == [1, 2, 1]
+    assert len(upserts.batches) == 1
+
+
+def test_known_user_with_unchanged_profile_is_not_written(cache, run):
+    cache, upserts = cache
+
+    async def scenario():
+        await cache.get_user_id(_user(1))
+        assert await cache.get_user_id(_user(1)) == 1
+        assert cache._flush_task is None or cache._flush_task.done()
+
+    run(scenario())
+    assert len(upserts.batches) == 1
+
+
+def test_changed_profile_is_written_behind(cache, run):
+    cache, upserts = cache
+
+    async def scenario():
+        await cache.get_user_id(_user(1))
+        # Returned from the cache before the write
+        assert await cache.get_user_id(_user(1, "Maria")) == 1
+        assert upserts.batches[-1][0]["first_name"] == "Anna"
+        await cache.shutdown()
+
+    run(scenario())
+    assert upserts.batches[-1][0]["first_name"] == "Maria"
+
+
+def test_failed_write_is_retried_on_next_call(cache, run):
+    cache, upserts = cache
+
+    async def scenario():
+        await cache.get_user_id(_user(1))
+
+        upserts.error = RuntimeError("database is not available")
+        with pytest.raises(RuntimeError):
+            await cache.get_user_id(_user(2))
+        await cache.get_user_id(_user(1, "Maria"))
+        await cache.shutdown()
+        assert cache._users[1] == (1, None)
+
+        # The lost profile change is queued again by the user's next update
+        upserts.error = None
+        assert await cache.get_user_id(_user(1, "Maria")) == 1
+        await cache.shutdown()
+        assert upserts.batches[-1][0]["first_name"] == "Maria"
+        assert await cache.get_user_id(_user(2)) == 2
+
+    run(scenario())